@@ -0,0 +1,91 @@
+"""Partition chat_messages by month
+
+Revision ID: 7f3d2b8e6a10
+Revises: e4b7a9c2d153
+Create Date: 2026-10-19 15:45:03.271554
+
+"""
+from datetime import datetime, UTC
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3d2b8e6a10'
+down_revision = 'e4b7a9c2d153'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _month(offset: int) -> datetime:
+    now = datetime.now(UTC)
+    index = now.year * 12 + now.month - 1 + offset
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _create_chat_messages(name: str, *constraints, **kwargs) -> None:
+    op.create_table(name,
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('session_id', sa.String(length=36), nullable=True),
+    sa.Column('role', postgresql.ENUM('SYSTEM', 'ASSISTANT', 'USER', name='messagerole', create_type=False), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('tokens', sa.Integer(), nullable=True),
+    sa.Column('feedback', sa.JSON(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['session_id'], ['sessions.id'], ondelete='CASCADE'),
+    *constraints,
+    **kwargs
+    )
+
+
+def upgrade() -> None:
+    # The existing table becomes the first partition, holding everything up to
+    # the start of next month, so no rows are copied. Monthly partitions follow.
+    boundary = _month(1)
+
+    op.rename_table('chat_messages', 'chat_messages_legacy')
+    op.execute('ALTER TABLE chat_messages_legacy RENAME CONSTRAINT chat_messages_pkey TO chat_messages_legacy_pkey')
+    op.execute('ALTER INDEX ix_chat_messages_session_id_created_at RENAME TO ix_chat_messages_legacy_session_id_created_at')
+    op.execute('ALTER INDEX ix_chat_messages_created_at RENAME TO ix_chat_messages_legacy_created_at')
+    # Partitions need the partition key in their primary key (one index build, no table rewrite)
+    op.execute(
+        'ALTER TABLE chat_messages_legacy DROP CONSTRAINT chat_messages_legacy_pkey, '
+        'ADD CONSTRAINT chat_messages_legacy_pkey PRIMARY KEY (id, created_at)'
+    )
+    # Lets ATTACH PARTITION trust the range instead of scanning the table again
+    op.execute(f"ALTER TABLE chat_messages_legacy ADD CONSTRAINT chat_messages_legacy_range CHECK (created_at < '{boundary:%Y-%m-%d}')")
+
+    _create_chat_messages('chat_messages',
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_chat_messages_session_id_created_at', 'chat_messages', ['session_id', 'created_at'], unique=False)
+    op.create_index('ix_chat_messages_created_at', 'chat_messages', ['created_at'], unique=False)
+
+    # Matching indexes of the legacy table are attached rather than rebuilt
+    op.execute(f"ALTER TABLE chat_messages ATTACH PARTITION chat_messages_legacy FOR VALUES FROM (MINVALUE) TO ('{boundary:%Y-%m-%d}')")
+    op.execute('ALTER TABLE chat_messages_legacy DROP CONSTRAINT chat_messages_legacy_range')
+
+    for offset in range(1, MONTHS_AHEAD + 1):
+        month, next_month = _month(offset), _month(offset + 1)
+        op.execute(
+            f"CREATE TABLE chat_messages_p{month:%Y_%m} PARTITION OF chat_messages "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        )
+    # Catches rows of months nobody created a partition for
+    op.execute('CREATE TABLE chat_messages_default PARTITION OF chat_messages DEFAULT')
+
+
+def downgrade() -> None:
+    # Copies every attached partition back into a plain table; archived partitions are not restored
+    _create_chat_messages('chat_messages_plain', sa.PrimaryKeyConstraint('id', name='chat_messages_plain_pkey'))
+    op.execute('INSERT INTO chat_messages_plain SELECT id, created_at, session_id, role, content, tokens, feedback, updated_at FROM chat_messages')
+    op.drop_table('chat_messages')
+    op.rename_table('chat_messages_plain', 'chat_messages')
+    op.execute('ALTER TABLE chat_messages RENAME CONSTRAINT chat_messages_plain_pkey TO chat_messages_pkey')
+    op.create_index('ix_chat_messages_session_id_created_at', 'chat_messages', ['session_id', 'created_at'], unique=False)
+    op.create_index('ix_chat_messages_created_at', 'chat_messages', ['created_at'], unique=False)
@@ -1,11 +1,14 @@
-from typing import Annotated, Generator
-from fastapi import Depends, HTTPException, status
+from typing import Annotated, AsyncGenerator, Generator
+import asyncio
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from app.core.config import settings
+from app.core import metrics, tracing
 from app.core.security import ALGORITHM
-from app.db.session import SessionLocal
+from app.db.routing import read_your_writes, token_subject
+from app.db.session import SessionLocal, replica_router
 from app.models.user import User, UserRole
 from app.schemas.auth import TokenPayload
 
@@ -19,18 +22,54 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-async def get_current_user(
-    db: Annotated[Session, Depends(get_db)],
-    token: Annotated[str, Depends(oauth2_scheme)]
-) -> User:
-    """Get current user from JWT token."""
+async def get_read_db(request: Request) -> AsyncGenerator[Session, None]:
+    """
+    Dependency for read-only endpoints: a session on a replica when one is
+    configured and caught up, otherwise on the primary. Users who wrote
+    within READ_YOUR_WRITES_SECONDS keep reading from the primary.
+    """
+    engine = None
+    if replica_router.engines:
+        user_id = token_subject(request.headers.get("authorization"))
+        if user_id is not None and await read_your_writes.is_sticky(user_id):
+            reason = "sticky"
+        else:
+            engine = await asyncio.to_thread(replica_router.pick)
+            reason = "healthy" if engine is not None else "lagging"
+        metrics.DB_READ_ROUTES.inc(target="primary" if engine is None else "replica", reason=reason)
+    
+    db = SessionLocal() if engine is None else SessionLocal(bind=engine)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_auth_db() -> Generator:
+    """
+    Dependency for the session that resolves the current user on the primary.
+    get_current_user closes it after the lookup, so authentication holds no
+    connection while the endpoint runs (read endpoints use get_read_db).
+    """
+    try:
+        db = SessionLocal()
+        yield db
+    finally:
+        db.close()
+
+def authenticate(db: Session, token: str) -> User:
+    """
+    Resolve the user of a JWT access token, closing db after the lookup.
+    The user is returned detached with its preferences loaded; add it to the
+    endpoint's session before changing it.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        with tracing.start_span("auth.decode_jwt"):
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
         token_data = TokenPayload(**payload)
         if token_data.sub is None:
             raise credentials_exception
@@ -42,13 +81,28 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == token_data.sub).first()
+    with tracing.start_span("db.user_lookup"):
+        try:
+            user = db.query(User)\
+                .options(joinedload(User.preferences))\
+                .filter(User.id == token_data.sub)\
+                .first()
+        finally:
+            # Return the connection to the pool before the endpoint runs
+            db.close()
     if user is None:
         raise credentials_exception
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
+async def get_current_user(
+    db: Annotated[Session, Depends(get_auth_db)],
+    token: Annotated[str, Depends(oauth2_scheme)]
+) -> User:
+    """Get current user from JWT token (see authenticate)."""
+    return authenticate(db, token)
+
 async def get_current_active_superuser(
     current_user: Annotated[User, Depends(get_current_user)]
 ) -> User:
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, users, topics, sessions, files, chat, agents, invites
+from app.api.v1.endpoints import auth, users, topics, sessions, files, chat, agents, invites, metrics, profiling
 
 api_router = APIRouter()
 
@@ -49,4 +49,16 @@ api_router.include_router(
     invites.router,
     prefix="/invites",
     tags=["invites"]
-)
\ No newline at end of file
+)
+
+api_router.include_router(
+    metrics.router,
+    prefix="/metrics",
+    tags=["metrics"]
+)
+
+api_router.include_router(
+    profiling.router,
+    prefix="/profiling",
+    tags=["profiling"]
+)
@@ -1,18 +1,79 @@
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from typing import Annotated, Any, Awaitable, Callable, List, Optional, Set
+from fastapi import (
+    APIRouter, Depends, HTTPException, BackgroundTasks, Header, Response,
+    WebSocket, WebSocketDisconnect, status
+)
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, and_, or_
 from app.api import deps
+from app.core import tracing
+from app.core.config import settings
+from app.core.pubsub import Subscription, get_pubsub
+from app.db.routing import read_your_writes
 from app.models import User, Session as DBSession, ChatMessage
 from app.schemas.chat import ChatMessageCreate, ChatMessageResponse, ChatHistoryResponse
 from app.services.ai import AIService
+from app.services.ai.exceptions import LLMServiceError
 from app.services.analytics import update_session_analytics
+from app.services.turns import chat_turns, TurnRejectedError
+from app.services.idempotency import (
+    idempotency, fingerprint, IdempotencyConflictError, IdempotencyInProgressError
+)
 from logging import getLogger
+from datetime import datetime, UTC
+import asyncio
+import hashlib
+import json
+import uuid
 
 logger = getLogger(__name__)
 
 router = APIRouter()
 
+def session_channel(session_id: str) -> str:
+    """Pub/sub channel carrying a session's chat events to every worker."""
+    return f"chat:{session_id}"
+
+async def run_chat_turn(
+    db: Session,
+    session: DBSession,
+    content: str,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    turn_id: Optional[str] = None
+) -> List[dict]:
+    """
+    Process one chat turn and publish the stored messages to the session channel.
+    Provider failures are raised as HTTPException.
+    """
+    ai_service = AIService(db)
+    try:
+        # Pick up writes from turns that finished while this one waited
+        db.refresh(session)
+        # Commits its own short transactions; no connection is held during the LLM call
+        messages = await ai_service.process_message(session, content, on_delta=on_delta)
+    except LLMServiceError as e:
+        db.rollback()
+        logger.warning(f"AI service unavailable: {str(e)}")
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to process message: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
+    # WebSocket turns bypass ReadYourWritesMiddleware
+    await read_your_writes.mark(session.user_id)
+    
+    result = [
+        ChatMessageResponse.model_validate(msg).model_dump(mode="json")
+        for msg in messages
+    ]
+    pubsub = get_pubsub()
+    for message in result:
+        await pubsub.publish(
+            session_channel(session.id),
+            {"type": "message", "turn_id": turn_id, "message": message}
+        )
+    return result
+
 @router.post("/sessions/{session_id}/chat", response_model=List[ChatMessageResponse])
 async def send_message(
     *,
@@ -20,45 +81,106 @@ async def send_message(
     db: Annotated[Session, Depends(deps.get_db)],
     session_id: str,
     message: ChatMessageCreate,
-    background_tasks: BackgroundTasks
-) -> List[ChatMessageResponse]:
+    background_tasks: BackgroundTasks,
+    response: Response,
+    idempotency_key: Annotated[Optional[str], Header(alias="Idempotency-Key", max_length=255)] = None
+) -> List[dict]:
     """
     Send a message to the AI agent.
     Returns a list of messages, the first being the user's message 
     and the second being the AI's response.
+    Retries carrying the same Idempotency-Key replay the original result
+    instead of calling the agent again.
     """
-    session = db.query(DBSession).filter(
-        DBSession.id == session_id,
-        DBSession.user_id == current_user.id
-    ).first()
+    with tracing.start_span("db.session_lookup"):
+        session = db.query(DBSession).filter(
+            DBSession.id == session_id,
+            DBSession.user_id == current_user.id
+        ).first()
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    ai_service = AIService(db)
-    try:
-        db.begin_nested()  
-        response = await ai_service.process_message(session, message.content)
-        db.commit()  
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to process message: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
+    async def process(content: str) -> List[dict]:
+        return await run_chat_turn(db, session, content)
+    
+    async def run_turn() -> List[dict]:
+        # Turns of one session run one at a time so each sees the previous reply
+        try:
+            return await chat_turns.submit(session.id, message.content, process)
+        except TurnRejectedError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    
+    if idempotency_key is None:
+        result = await run_turn()
+    else:
+        try:
+            result, replayed = await idempotency.run(
+                scope=f"chat:{current_user.id}:{session.id}",
+                key=idempotency_key,
+                request_fingerprint=fingerprint(message.content),
+                func=run_turn
+            )
+        except IdempotencyConflictError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except IdempotencyInProgressError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+            return result
     
     # Update analytics in background
     background_tasks.add_task(update_session_analytics, db, session.id)
     
-    return response
+    return result
+
+def _history_etag(db: Session, session_id: str, *params) -> str:
+    """Strong ETag from the session's newest message and the request parameters."""
+    last = db.query(ChatMessage.id, ChatMessage.updated_at)\
+        .filter(ChatMessage.session_id == session_id)\
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())\
+        .first()
+    state = f"{session_id}:{last.id if last else ''}:{last.updated_at.isoformat() if last else ''}"
+    digest = hashlib.sha256(":".join([state, *map(str, params)]).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def _since_filter(db: Session, session_id: str, since: str):
+    """Filter for messages after a message id or an ISO 8601 timestamp."""
+    cursor = db.query(ChatMessage.id, ChatMessage.created_at)\
+        .filter(ChatMessage.session_id == session_id, ChatMessage.id == since)\
+        .first()
+    if cursor:
+        return or_(
+            ChatMessage.created_at > cursor.created_at,
+            and_(ChatMessage.created_at == cursor.created_at, ChatMessage.id > cursor.id)
+        )
+    
+    try:
+        timestamp = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be a message ID or an ISO 8601 timestamp")
+    if timestamp.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        timestamp = timestamp.astimezone(UTC).replace(tzinfo=None)
+    return ChatMessage.created_at > timestamp
 
 @router.get("/sessions/{session_id}/chat", response_model=ChatHistoryResponse)
 async def get_chat_history(
     session_id: str,
     current_user: Annotated[User, Depends(deps.get_current_user)],
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
+    response: Response,
     skip: int = 0,
-    limit: int = 50
-) -> dict:
-    """Get chat history for a session."""
+    limit: int = 50,
+    since: Optional[str] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None
+) -> Any:
+    """
+    Get chat history for a session.
+    With since=<message ID or timestamp> only newer messages are returned,
+    oldest first. Responses carry an ETag; polls sending it back in
+    If-None-Match get 304 Not Modified until a message is added or changed.
+    """
     session = db.query(DBSession).filter(
         DBSession.id == session_id,
         DBSession.user_id == current_user.id
@@ -67,6 +189,24 @@ async def get_chat_history(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    etag = _history_etag(db, session_id, skip, limit, since)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    if since is not None:
+        messages = db.query(ChatMessage)\
+            .filter(ChatMessage.session_id == session_id, _since_filter(db, session_id, since))\
+            .order_by(ChatMessage.created_at, ChatMessage.id)\
+            .limit(limit + 1)\
+            .all()
+        return {
+            "messages": messages[:limit],
+            "has_more": len(messages) > limit,
+            "cursor": messages[:limit][-1].id if messages else since
+        }
+    
     total = db.query(func.count(ChatMessage.id))\
         .filter(ChatMessage.session_id == session_id)\
         .scalar()
@@ -81,5 +221,123 @@ async def get_chat_history(
     return {
         "messages": list(reversed(messages)),
         "has_more": total > skip + limit,
-        "total_messages": total
-    } 
\ No newline at end of file
+        "total_messages": total,
+        "cursor": messages[0].id if messages else None
+    }
+
+@router.websocket("/sessions/{session_id}/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    db: Annotated[Session, Depends(deps.get_db)],
+    token: Optional[str] = None
+):
+    """
+    Chat over a WebSocket instead of polling.
+    Authenticate once with ?token=<access token> (or an Authorization header),
+    then send {"type": "message", "content": "..."}. The server pushes
+    "delta" events while a reply is generated, "message" events for stored
+    messages (including turns sent over HTTP or other connections), "error"
+    events for failed turns and a "ping" on idle connections.
+    """
+    if token is None:
+        _, _, token = websocket.headers.get("authorization", "").partition(" ")
+    try:
+        current_user = await deps.get_current_user(db, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    session = db.query(DBSession).filter(
+        DBSession.id == session_id,
+        DBSession.user_id == current_user.id
+    ).first()
+    # Return the connection to the pool; turns check one out while they run
+    db.commit()
+    
+    if not session:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    async with get_pubsub().subscribe(session_channel(session.id)) as subscription:
+        turns: Set[asyncio.Task] = set()
+        sender = asyncio.create_task(_push_events(websocket, subscription))
+        receiver = asyncio.create_task(_receive_turns(websocket, db, session, subscription, turns))
+        try:
+            await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sender.cancel()
+            receiver.cancel()
+            # Turns already accepted still complete and are stored
+            await asyncio.gather(sender, receiver, *turns, return_exceptions=True)
+
+async def _push_events(websocket: WebSocket, subscription: Subscription) -> None:
+    """Forward session events to the client, pinging while idle."""
+    while True:
+        event = await subscription.get(timeout=settings.CHAT_WS_HEARTBEAT_SECONDS)
+        if subscription.overflowed:
+            # The client fell too far behind; it should reconnect and reload history
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        await websocket.send_json(event if event is not None else {"type": "ping"})
+
+async def _receive_turns(
+    websocket: WebSocket,
+    db: Session,
+    session: DBSession,
+    subscription: Subscription,
+    turns: Set[asyncio.Task]
+) -> None:
+    """Start a chat turn for each user message until the client goes away."""
+    channel = session_channel(session.id)
+    
+    async def run_turn(content: str) -> None:
+        turn_id = str(uuid.uuid4())
+        
+        async def on_delta(delta: str) -> None:
+            await get_pubsub().publish(channel, {"type": "delta", "turn_id": turn_id, "content": delta})
+        
+        async def process(content: str) -> List[dict]:
+            result = await run_chat_turn(db, session, content, on_delta, turn_id)
+            # Still under the turn lock: turns share the connection's db session
+            await update_session_analytics(db, session.id)
+            return result
+        
+        try:
+            await chat_turns.submit(session.id, content, process)
+        except HTTPException as e:
+            subscription.put({"type": "error", "turn_id": turn_id, "status": e.status_code, "detail": e.detail})
+        except TurnRejectedError as e:
+            subscription.put({"type": "error", "turn_id": turn_id, "status": 409, "detail": str(e)})
+    
+    while True:
+        try:
+            text = await asyncio.wait_for(
+                websocket.receive_text(),
+                timeout=settings.CHAT_WS_IDLE_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            await websocket.close(code=status.WS_1001_GOING_AWAY)
+            return
+        except WebSocketDisconnect:
+            return
+        
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            subscription.put({"type": "error", "status": 400, "detail": "Expected a JSON object"})
+            continue
+        
+        if data.get("type") == "pong":
+            continue
+        content = data.get("content")
+        if data.get("type") != "message" or not isinstance(content, str) or not content:
+            subscription.put({"type": "error", "status": 400, "detail": "Expected a message with content"})
+            continue
+        
+        task = asyncio.create_task(run_turn(content))
+        turns.add(task)
+        task.add_done_callback(turns.discard)
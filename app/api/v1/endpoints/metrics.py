@@ -0,0 +1,18 @@
+from typing import Annotated, Any, Dict
+from fastapi import APIRouter, Depends
+from app.api import deps
+from app.models import User
+from app.services.ai.scheduler import llm_scheduler
+from app.services.ai.resilience import breaker_snapshots
+
+router = APIRouter()
+
+@router.get("/llm", response_model=Dict[str, Any])
+async def get_llm_metrics(
+    current_user: Annotated[User, Depends(deps.get_current_active_superuser)]
+) -> dict:
+    """Get LLM scheduler and circuit breaker state for this worker (admin only)."""
+    return {
+        "scheduler": llm_scheduler.snapshot(),
+        "circuit_breakers": breaker_snapshots()
+    }
@@ -0,0 +1,45 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.api import deps
+from app.core import profiling
+from app.core.config import settings
+from app.models import User
+
+router = APIRouter()
+
+def require_profiling_enabled() -> None:
+    """Hide the profiling API unless PROFILING_ENABLED is set."""
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+@router.post("/sample", response_class=PlainTextResponse, dependencies=[Depends(require_profiling_enabled)])
+async def sample_worker(
+    current_user: Annotated[User, Depends(deps.get_current_active_superuser)],
+    seconds: float = Query(default=10.0, gt=0, le=settings.PROFILING_MAX_SECONDS),
+    include_idle: bool = False
+) -> PlainTextResponse:
+    """
+    Sample every thread of the worker serving this request for N seconds (admin only).
+    Returns collapsed stacks for flamegraph.pl or speedscope.
+    """
+    try:
+        collapsed = await profiling.profile_for(seconds, include_idle)
+    except profiling.ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(collapsed)
+
+@router.get(
+    "/requests/{profile_id}",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_profiling_enabled)]
+)
+async def get_request_profile(
+    profile_id: str,
+    current_user: Annotated[User, Depends(deps.get_current_active_superuser)]
+) -> PlainTextResponse:
+    """Download the worker profile taken while a request sent with X-Profile ran (admin only)."""
+    collapsed = profiling.get_request_profile(profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(collapsed)
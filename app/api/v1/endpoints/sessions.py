@@ -11,6 +11,23 @@ from app.services.ai import AIService
 
 router = APIRouter()
 
+def _get_active_session(db: Session, session_id: str, user_id: str) -> Optional[DBSession]:
+    """Load one of the user's active sessions with its topic title in a single query."""
+    row = db.query(DBSession, Topic.title)\
+        .outerjoin(Topic, DBSession.topic_id == Topic.id)\
+        .filter(
+            DBSession.id == session_id,
+            DBSession.user_id == user_id,
+            DBSession.is_active == True
+        ).first()
+    
+    if not row:
+        return None
+    
+    session, topic_title = row
+    setattr(session, 'topic_title', topic_title or "")
+    return session
+
 @router.post("", response_model=SessionResponse)
 async def create_session(
     *,
@@ -93,7 +110,7 @@ async def list_user_sessions(
 @router.get("/all", response_model=List[SessionResponse])
 async def list_all_sessions(
     current_user: Annotated[User, Depends(deps.get_current_active_superuser)],
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     user_id: Optional[str] = None,
     topic_id: Optional[str] = None,
     skip: int = 0,
@@ -138,19 +155,10 @@ async def get_session(
     db: Annotated[Session, Depends(deps.get_db)]
 ) -> DBSession:
     """Get specific session by ID."""
-    session = db.query(DBSession).filter(
-        DBSession.id == session_id,
-        DBSession.user_id == current_user.id,
-        DBSession.is_active == True
-    ).first()
-    
+    session = _get_active_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Add topic title
-    topic = db.query(Topic).filter(Topic.id == session.topic_id).first()
-    setattr(session, 'topic_title', topic.title if topic else "")
-    
     return session
 
 @router.put("/{session_id}", response_model=SessionResponse)
@@ -162,14 +170,10 @@ async def update_session(
     session_in: SessionUpdate
 ) -> DBSession:
     """Update session progress and feedback."""
-    session = db.query(DBSession).filter(
-        DBSession.id == session_id,
-        DBSession.user_id == current_user.id,
-        DBSession.is_active == True
-    ).first()
-    
+    session = _get_active_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    topic_title = session.topic_title
     
     # Update session fields
     for key, value in session_in.model_dump(exclude_unset=True).items():
@@ -183,15 +187,14 @@ async def update_session(
     db.refresh(session)
     
     # Add topic title
-    topic = db.query(Topic).filter(Topic.id == session.topic_id).first()
-    setattr(session, 'topic_title', topic.title if topic else "")
+    setattr(session, 'topic_title', topic_title)
     
     return session
 
 @router.get("/stats/summary", response_model=Dict[str, Any])
 async def get_session_stats(
     current_user: Annotated[User, Depends(deps.get_current_user)],
-    db: Annotated[Session, Depends(deps.get_db)]
+    db: Annotated[Session, Depends(deps.get_read_db)]
 ) -> dict:
     """Get user's session statistics summary."""
     from sqlalchemy import func
@@ -250,12 +253,7 @@ async def disable_and_create_session(
     Useful when user wants to restart a session.
     """
     # Get current session
-    current_session = db.query(DBSession).filter(
-        DBSession.id == session_id,
-        DBSession.user_id == current_user.id,
-        DBSession.is_active == True
-    ).first()
-    
+    current_session = _get_active_session(db, session_id, current_user.id)
     if not current_session:
         raise HTTPException(status_code=404, detail="Active session not found")
     
@@ -283,9 +281,8 @@ async def disable_and_create_session(
         ai_service = AIService(db)
         await ai_service.initialize_session(new_session)
         
-        # Add topic title for response
-        topic = db.query(Topic).filter(Topic.id == new_session.topic_id).first()
-        setattr(new_session, 'topic_title', topic.title if topic else "")
+        # Same topic as the disabled session
+        setattr(new_session, 'topic_title', current_session.topic_title)
         
         # Commit the transaction
         db.commit()
@@ -1,16 +1,53 @@
-from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from typing import Annotated, Any, Callable, List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy import func
 from app.api import deps
 from app.models import Topic, Session as DBSession, User, Agent, ChatMessage
-from app.schemas.topic import TopicCreate, TopicUpdate, TopicResponse
+from app.schemas.topic import TopicCreate, TopicUpdate, TopicResponse, TopicTreeNode
 from app.schemas.session import SessionResponse
 from app.services.ai import AIService
+from app.services.response_cache import topic_cache
+from app.services.topic_tree import delete_subtree, topic_index
+from app.services.purge import purge_engine, PurgeJobNotFoundError, PurgeJobBusyError
+import json
 import uuid
 
 router = APIRouter()
 
+topic_list_adapter = TypeAdapter(List[TopicResponse])
+
+def _attach_stats(db: Session, topics: List[Topic]) -> None:
+    """Attach subtopic and session stats with one grouped query each."""
+    topic_ids = [topic.id for topic in topics]
+    if not topic_ids:
+        return
+    
+    subtopic_counts = dict(
+        db.query(Topic.parent_id, func.count(Topic.id))
+        .filter(Topic.parent_id.in_(topic_ids))
+        .group_by(Topic.parent_id)
+        .all()
+    )
+    session_stats = {
+        topic_id: (count, average)
+        for topic_id, count, average in db.query(
+            DBSession.topic_id,
+            func.count(DBSession.id),
+            func.avg(DBSession.completion_rate)
+        )
+        .filter(DBSession.topic_id.in_(topic_ids), DBSession.is_active == True)
+        .group_by(DBSession.topic_id)
+        .all()
+    }
+    
+    for topic in topics:
+        total_sessions, average_completion = session_stats.get(topic.id, (0, 0))
+        setattr(topic, 'subtopic_count', subtopic_counts.get(topic.id, 0))
+        setattr(topic, 'total_sessions', total_sessions or 0)
+        setattr(topic, 'average_completion_rate', float(average_completion or 0))
+
 @router.post("", response_model=TopicResponse)
 async def create_topic(
     *,
@@ -37,70 +74,73 @@ async def create_topic(
     db.add(db_topic)
     db.commit()
     db.refresh(db_topic)
+    topic_index.upsert(db_topic, *await topic_cache.invalidate())
     return db_topic
 
 @router.get("", response_model=List[TopicResponse])
 async def list_topics(
-    db: Annotated[Session, Depends(deps.get_db)],
+    request: Request,
+    db: Annotated[Session, Depends(deps.get_read_db)],
     skip: int = 0,
     limit: int = Query(default=100, le=100),
     parent_id: Optional[str] = None
-) -> List[Topic]:
-    """List topics with optional parent filter."""
-    query = db.query(Topic)
-    
-    if parent_id is not None:
-        query = query.filter(Topic.parent_id == parent_id)
-    else:
-        # Root topics only
-        query = query.filter(Topic.parent_id.is_(None))
-    
-    topics = query.offset(skip).limit(limit).all()
-    
-    # Attach computed stats
-    for topic in topics:
-        # Get subtopic count
-        subtopic_count = db.query(func.count(Topic.id))\
-            .filter(Topic.parent_id == topic.id)\
-            .scalar()
+) -> Response:
+    """
+    List topics with optional parent filter.
+    Served from the topic cache; session stats may lag by up to its TTL.
+    """
+    def load() -> bytes:
+        query = db.query(Topic)
         
-        # Get session stats
-        session_stats = db.query(
-            func.count(DBSession.id),
-            func.avg(DBSession.completion_rate)
-        ).filter(DBSession.topic_id == topic.id, DBSession.is_active == True).first()
+        if parent_id is not None:
+            query = query.filter(Topic.parent_id == parent_id)
+        else:
+            # Root topics only
+            query = query.filter(Topic.parent_id.is_(None))
         
-        setattr(topic, 'subtopic_count', subtopic_count or 0)
-        setattr(topic, 'total_sessions', session_stats[0] or 0)
-        setattr(topic, 'average_completion_rate', float(session_stats[1] or 0))
+        topics = query.offset(skip).limit(limit).all()
+        _attach_stats(db, topics)
+        return topic_list_adapter.dump_json(topics)
+    
+    return await topic_cache.respond(request, f"list:{parent_id}:{skip}:{limit}", load)
+
+@router.get("/tree", response_model=List[TopicTreeNode])
+async def get_topic_tree(
+    request: Request,
+    db: Annotated[Session, Depends(deps.get_read_db)],
+    root_id: Optional[str] = None,
+    depth: Optional[int] = Query(default=None, ge=0)
+) -> Response:
+    """
+    Get the topic hierarchy with stats in one response.
+    Returns every root topic, or only root_id, with children nested down to
+    depth levels (the whole hierarchy when depth is omitted).
+    """
+    await topic_index.ensure(db)
+    if root_id is not None and root_id not in topic_index:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    
+    def load() -> bytes:
+        return json.dumps(topic_index.tree(root_id, depth)).encode()
     
-    return topics
+    return await topic_cache.respond(request, f"tree:{root_id}:{depth}", load)
 
 @router.get("/{topic_id}", response_model=TopicResponse)
 async def get_topic(
+    request: Request,
     topic_id: str,
-    db: Annotated[Session, Depends(deps.get_db)]
-) -> Topic:
+    db: Annotated[Session, Depends(deps.get_read_db)]
+) -> Response:
     """Get topic by ID."""
-    topic = db.query(Topic).filter(Topic.id == topic_id).first()
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    
-    # Attach computed stats
-    subtopic_count = db.query(func.count(Topic.id))\
-        .filter(Topic.parent_id == topic.id)\
-        .scalar()
-    
-    session_stats = db.query(
-        func.count(DBSession.id),
-        func.avg(DBSession.completion_rate)
-    ).filter(DBSession.topic_id == topic.id, DBSession.is_active == True).first()
-    
-    setattr(topic, 'subtopic_count', subtopic_count or 0)
-    setattr(topic, 'total_sessions', session_stats[0] or 0)
-    setattr(topic, 'average_completion_rate', float(session_stats[1] or 0))
+    def load() -> bytes:
+        topic = db.query(Topic).filter(Topic.id == topic_id).first()
+        if not topic:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        
+        _attach_stats(db, [topic])
+        return TopicResponse.model_validate(topic).model_dump_json().encode()
     
-    return topic
+    return await topic_cache.respond(request, f"topic:{topic_id}", load)
 
 @router.put("/{topic_id}", response_model=TopicResponse)
 async def update_topic(
@@ -120,73 +160,89 @@ async def update_topic(
     
     db.commit()
     db.refresh(topic)
+    topic_index.upsert(topic, *await topic_cache.invalidate())
     return topic
 
+async def _run_topic_purge(job_id: str, session_factory: Callable[[], Session]) -> None:
+    """Run a topic purge job, then drop the deleted topics from the caches."""
+    try:
+        job = await purge_engine.run(job_id, session_factory)
+    except Exception:
+        # Recorded on the job; POST /topics/purges/{job_id}/resume continues it
+        return
+    topic_index.remove(job["params"]["topic_id"], *await topic_cache.invalidate())
+
+def _job_session_factory(db: Session) -> Callable[[], Session]:
+    """Sessions on the request's database for work that outlives the request."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+@router.get("/purges/{job_id}")
+async def get_purge_job(
+    job_id: str,
+    current_user: Annotated[User, Depends(deps.get_current_active_superuser)]
+) -> Any:
+    """Get the progress of a background topic deletion (admin only)."""
+    try:
+        return await purge_engine.get(job_id)
+    except PurgeJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/purges/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+async def resume_purge_job(
+    *,
+    current_user: Annotated[User, Depends(deps.get_current_active_superuser)],
+    db: Annotated[Session, Depends(deps.get_db)],
+    job_id: str,
+    background_tasks: BackgroundTasks
+) -> Any:
+    """Resume a failed or interrupted background topic deletion (admin only)."""
+    try:
+        job = await purge_engine.claim(job_id)
+    except PurgeJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PurgeJobBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    background_tasks.add_task(_run_topic_purge, job_id, _job_session_factory(db))
+    return job
+
 @router.delete("/{topic_id}")
 async def delete_topic(
     *,
     current_user: Annotated[User, Depends(deps.get_current_active_superuser)],
     db: Annotated[Session, Depends(deps.get_db)],
-    topic_id: str
+    topic_id: str,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    background: bool = False
 ):
-    """Delete topic and all related data (admin only)."""
+    """
+    Delete topic and all related data (admin only).
+    With background=true the subtree is deleted in small batches by a
+    background job; the 202 response carries its job_id for progress polling.
+    """
+    if background:
+        if not db.query(Topic.id).filter(Topic.id == topic_id).first():
+            raise HTTPException(status_code=404, detail="Topic not found")
+        job = await purge_engine.create("topic", {"topic_id": topic_id})
+        background_tasks.add_task(_run_topic_purge, job["id"], _job_session_factory(db))
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"message": "Topic deletion started", "job_id": job["id"], "status": job["status"]}
+    
     try:
         # Start a nested transaction
         with db.begin_nested():
-            # Get the topic and all its subtopics
+            # Check the topic exists
             topic = db.query(Topic).filter(Topic.id == topic_id).first()
             if not topic:
                 raise HTTPException(status_code=404, detail="Topic not found")
             
-            # Get all subtopic IDs recursively
-            def get_subtopic_ids(topic_id: str, ids=None) -> set:
-                if ids is None:
-                    ids = set()
-                ids.add(topic_id)
-                subtopics = db.query(Topic).filter(Topic.parent_id == topic_id).all()
-                for subtopic in subtopics:
-                    get_subtopic_ids(subtopic.id, ids)
-                return ids
-            
-            topic_ids = get_subtopic_ids(topic_id)
-            
-            # Get all session IDs for these topics
-            session_ids = [
-                id[0] for id in 
-                db.query(DBSession.id)
-                .filter(DBSession.topic_id.in_(topic_ids))
-                .all()
-            ]
-            
-            if not session_ids:
-                session_ids = []  # Ensure it's an empty list for the IN clause
-            
-            # Delete all chat messages for these sessions
-            deleted_messages = db.query(ChatMessage)\
-                .filter(ChatMessage.session_id.in_(session_ids))\
-                .delete(synchronize_session=False)
-            
-            # Delete all sessions
-            deleted_sessions = db.query(DBSession)\
-                .filter(DBSession.topic_id.in_(topic_ids))\
-                .delete(synchronize_session=False)
-            
-            # Delete all topics
-            deleted_topics = db.query(Topic)\
-                .filter(Topic.id.in_(topic_ids))\
-                .delete(synchronize_session=False)
-            
-            result = {
-                "message": "Topic deleted",
-                "deleted_topics": deleted_topics,
-                "deleted_sessions": deleted_sessions,
-                "deleted_messages": deleted_messages
-            }
+            # Delete the whole subtree with one recursive query per table
+            result = {"message": "Topic deleted", **delete_subtree(db, topic_id)}
             
         # If we get here, the nested transaction was successful
         # Commit the outer transaction
         db.commit()
-        return result
         
     except Exception as e:
         # Rollback in case of any error
@@ -195,6 +251,9 @@ async def delete_topic(
             status_code=500,
             detail=f"Failed to delete topic: {str(e)}"
         )
+    
+    topic_index.remove(topic_id, *await topic_cache.invalidate())
+    return result
 
 @router.get("/{topic_id}/session", response_model=SessionResponse)
 async def get_or_create_session(
@@ -42,6 +42,7 @@ async def update_user_preferences(
     preferences: UserPreferenceUpdate
 ) -> UserPreferenceResponse:
     """Update current user preferences."""
+    db.add(current_user)
     if not current_user.preferences:
         # Create new preferences if they don't exist
         db_preferences = UserPreference(
@@ -84,7 +85,7 @@ async def deactivate_user(
 @router.get("/all", response_model=List[UserMeResponse])
 async def list_users(
     current_user: Annotated[User, Depends(deps.get_current_active_superuser)],
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     role: Optional[str] = Query(None, description="User role"),
     is_active: Optional[bool] = Query(None, description="User active status"),
     skip: int = 0,
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 from pydantic import PostgresDsn, field_validator, ConfigDict
 
 class Settings(BaseSettings):
@@ -14,6 +14,23 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     DATABASE_URI: Optional[PostgresDsn] = None
 
+    # Database Pool Settings (per worker process; size pools with benchmarks/db_pool.py)
+    DB_POOL_SIZE: int = 5  # Connections kept open
+    DB_MAX_OVERFLOW: int = 10  # Extra connections opened under load and closed when returned
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # How long a checkout waits for a free connection
+    DB_POOL_RECYCLE_SECONDS: int = 3600  # Replace connections older than this
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # Postgres statement_timeout (not for manage.py), 0 disables
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS: int = 60000  # Postgres idle_in_transaction_session_timeout, 0 disables
+    # Behind PgBouncer in transaction mode: no local pool and no per-connection startup options
+    # (set the timeouts with ALTER ROLE ... SET instead)
+    DB_PGBOUNCER: bool = False
+
+    # Read Replica Settings (read-only endpoints; no replicas sends every read to the primary)
+    DATABASE_REPLICA_URIS: List[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # Replicas further behind are skipped
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0  # How long a measured replica lag is trusted
+    READ_YOUR_WRITES_SECONDS: float = 10.0  # A user's reads stay on the primary this long after a write
+
     # JWT Settings
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
@@ -35,10 +52,111 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_BASE_URL: Optional[str] = None
     OPENAI_MODEL: Optional[str] = None
+    OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+
+    # Anthropic Settings
+    ANTHROPIC_API_KEY: Optional[str] = None
+    ANTHROPIC_BASE_URL: str = "https://api.anthropic.com"
+    ANTHROPIC_MODEL: Optional[str] = None
+
+    # API keys of endpoints selected by agent.config["base_url"], by URL ("" for keyless
+    # local servers); the provider keys are never sent to an overridden endpoint
+    LLM_ENDPOINT_API_KEYS: Dict[str, str] = {}
+
+    # Connection pool size of each provider client
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
     
     # Invite System Settings
     REQUIRE_INVITE: bool = False  # Set to True to enable invite system
 
+    # Shared State Settings (idempotency records, locks, counters)
+    STATE_BACKEND: str = "memory"  # "memory" or "redis"
+    REDIS_URL: Optional[str] = None
+
+    # Idempotency Settings
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60  # How long completed results are replayed
+    IDEMPOTENCY_LOCK_TTL_SECONDS: int = 120  # Lifetime of an in-flight claim, renewed while it runs
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: float = 60.0  # How long duplicates wait for the original
+
+    # Topic Catalog Cache Settings (public GET /topics responses)
+    TOPIC_CACHE_TTL_SECONDS: int = 300  # Server-side lifetime of cached responses, 0 disables
+    TOPIC_CACHE_MAX_AGE_SECONDS: int = 60  # Cache-Control max-age for browsers and CDNs
+
+    # Purge Settings (batched deletes of topic subtrees and stale sessions)
+    PURGE_BATCH_SIZE: int = 1000  # Rows deleted per transaction
+    PURGE_PAUSE_SECONDS: float = 0.05  # Pause between batches to let other traffic through
+    PURGE_LOCK_TIMEOUT_MS: int = 2000  # Postgres lock_timeout per batch; timed out batches are retried
+    PURGE_MAX_RETRIES: int = 5  # Consecutive failed attempts of one batch before the job fails
+    PURGE_JOB_TTL_SECONDS: int = 7 * 24 * 60 * 60  # How long job progress is kept
+    PURGE_STALE_SECONDS: float = 300.0  # A running job without progress for this long may be resumed
+
+    # Archive Settings (manage.py export-archive; needs the "archive" extra)
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_ROW_GROUP_SIZE: int = 100000  # Rows per Parquet row group / Arrow record batch
+    ARCHIVE_BATCH_SIZE: int = 5000  # Rows fetched per server-side cursor round trip
+    ARCHIVE_LAG_SECONDS: float = 60.0  # Newer rows wait for the next run so in-flight writes are not skipped
+
+    # Chat Message Partition Settings (monthly partitions on Postgres)
+    CHAT_PARTITION_MONTHS_AHEAD: int = 3  # Future months that always have a partition
+    CHAT_PARTITION_CHECK_SECONDS: float = 6 * 60 * 60  # How often each worker creates missing partitions, 0 disables
+    CHAT_PARTITION_RETENTION_MONTHS: int = 12  # Months kept attached; older partitions can be archived
+
+    # Chat Turn Settings
+    CHAT_TURN_POLICY: str = "queue"  # "queue", "reject" or "merge" for overlapping sends
+    CHAT_TURN_MAX_QUEUED: int = 5  # Max turns waiting per session in one worker
+    CHAT_TURN_LOCK_TTL_SECONDS: int = 120  # Lifetime of the cross-worker session lock, renewed while a turn runs
+    CHAT_TURN_LOCK_TIMEOUT_SECONDS: float = 60.0  # How long a turn waits for the session lock
+
+    # Chat WebSocket Settings
+    CHAT_WS_HEARTBEAT_SECONDS: float = 20.0  # Ping interval on idle connections
+    CHAT_WS_IDLE_TIMEOUT_SECONDS: float = 60.0  # Close connections silent for this long
+    CHAT_WS_SEND_QUEUE_SIZE: int = 256  # Events buffered per connection before deltas are dropped
+
+    # LLM Scheduler Settings
+    LLM_MAX_CONCURRENCY: int = 32  # Provider calls in flight per worker
+    LLM_QUEUE_MAX_SIZE: int = 200  # Calls allowed to wait per worker before 429s
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 30.0  # Max time a call may wait for a slot
+    LLM_REQUESTS_PER_MINUTE: int = 0  # Shared budget per provider/model, 0 disables
+    LLM_TOKENS_PER_MINUTE: int = 0  # Shared budget per provider/model, 0 disables
+    # Per "provider:model" overrides, e.g. {"openai:gpt-4o": {"rpm": 500, "tpm": 30000}}
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {}
+
+    # LLM Resilience Settings (timeout and max_retries can be overridden in agent.config)
+    LLM_TIMEOUT_SECONDS: float = 60.0  # Per-attempt provider timeout
+    LLM_MAX_RETRIES: int = 2  # Retries after the first attempt on retryable errors
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 8.0  # Longer Retry-After values fail the call with a 503
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open the circuit
+    LLM_BREAKER_RESET_SECONDS: float = 30.0  # How long the circuit stays open before probing
+
+    # Prompt Caching Settings (agent.config["prompt_cache"] overrides PROMPT_CACHE_ENABLED)
+    PROMPT_CACHE_ENABLED: bool = True  # Send cache hints to providers that accept them
+    PROMPT_CACHE_HISTORY_CHUNK: int = 8  # The history window's start moves in steps of this many messages
+
+    # Answer Cache Settings (per worker; agents opt in with agent.config["response_cache"])
+    ANSWER_CACHE_MAX_ENTRIES: int = 10000
+    ANSWER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Answers plus question embeddings
+    ANSWER_CACHE_TTL_SECONDS: float = 86400.0  # Default entry lifetime, agent.config can override it
+    ANSWER_CACHE_MAX_CANDIDATES: int = 256  # Most recent answers per topic compared by similarity
+    ANSWER_CACHE_EMBEDDING_WAIT_SECONDS: float = 1.0  # Max scheduler wait before a lookup falls back to exact
+
+    # Observability Settings
+    METRICS_ENABLED: bool = True  # Expose Prometheus metrics at /metrics
+    DB_SLOW_QUERY_MS: int = 500  # Log statements slower than this, 0 disables
+    DB_N_PLUS_ONE_THRESHOLD: int = 5  # Flag statements repeated this often in one request, 0 disables
+
+    # Tracing Settings (W3C trace context; spans are exported as JSON lines)
+    TRACING_EXPORTER: str = "none"  # "none", "console" or "file"
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_SAMPLE_RATE: float = 1.0  # Share of new traces recorded; incoming traceparent decides otherwise
+
+    # Profiling Settings (admin only; requests opt in with the X-Profile header)
+    PROFILING_ENABLED: bool = False
+    PROFILING_INTERVAL_MS: float = 5.0  # Stack sampling interval
+    PROFILING_MAX_SECONDS: float = 60.0  # Longest on-demand worker profile
+    PROFILING_MAX_STORED: int = 20  # Per-request profiles kept for download
+
     @field_validator("DATABASE_URI", mode="before")
     @classmethod
     def assemble_db_connection(cls, v: Optional[str], info) -> Any:
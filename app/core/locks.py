@@ -0,0 +1,115 @@
+from typing import AsyncIterator, Dict, List, Optional
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import logging
+import uuid
+from app.core.store import KeyValueStore
+
+logger = logging.getLogger(__name__)
+
+class LockTimeoutError(Exception):
+    """Raised when a lock could not be acquired in time."""
+
+class LockManager:
+    """
+    In-process map of asyncio locks keyed by name.
+    Entries are evicted as soon as nobody holds or waits on them, so the map
+    only grows with the number of keys that are busy right now.
+    """
+
+    def __init__(self):
+        # key -> [lock, number of holders and waiters]
+        self._locks: Dict[str, List] = {}
+
+    def users(self, key: str) -> int:
+        """Number of coroutines holding or waiting for the lock."""
+        entry = self._locks.get(key)
+        return entry[1] if entry else 0
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        """Hold the lock for key; waiters are served in arrival order."""
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+@asynccontextmanager
+async def keep_alive(store: KeyValueStore, key: str, value: str, ttl: float) -> AsyncIterator[None]:
+    """
+    Extend key's TTL every ttl / 3 seconds while the block runs, as long as
+    the key still holds value, so a claim outlives work that takes longer
+    than its TTL but still expires if this worker dies.
+    """
+    async def renew() -> None:
+        while True:
+            await asyncio.sleep(ttl / 3)
+            if not await store.extend_if_equals(key, value, ttl):
+                logger.warning(f"{key} expired or changed owner before it could be extended")
+                return
+
+    task = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+class DistributedLock:
+    """
+    Lock shared by all workers through the state store.
+    While held as a context manager its TTL is renewed, so it only expires
+    early if the holding worker dies.
+    """
+
+    def __init__(
+        self,
+        store: KeyValueStore,
+        key: str,
+        ttl: float,
+        timeout: Optional[float] = None,
+        poll_interval: float = 0.05
+    ):
+        self.store = store
+        self.key = f"lock:{key}"
+        self.ttl = ttl
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.token = str(uuid.uuid4())
+
+    async def acquire(self) -> bool:
+        """Try to acquire until timeout (None waits forever, 0 tries once)."""
+        loop = asyncio.get_running_loop()
+        deadline = None if self.timeout is None else loop.time() + self.timeout
+        delay = self.poll_interval
+        while True:
+            if await self.store.set_if_absent(self.key, self.token, ttl=self.ttl):
+                return True
+            if deadline is not None and loop.time() >= deadline:
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def release(self) -> None:
+        """Release the lock if this instance still owns it."""
+        await self.store.delete_if_equals(self.key, self.token)
+
+    async def __aenter__(self) -> "DistributedLock":
+        if not await self.acquire():
+            raise LockTimeoutError(f"Timed out waiting for {self.key}")
+        self._keep_alive = keep_alive(self.store, self.key, self.token, self.ttl)
+        await self._keep_alive.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._keep_alive.__aexit__(None, None, None)
+        await self.release()
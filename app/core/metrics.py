@@ -0,0 +1,252 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric:
+    """Base class for labelled metrics in the Prometheus text format."""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples()
+        ]
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def sum(self, **labels: str) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+class Registry:
+    """Collection of metrics exposed by one worker."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def on_collect(self, callback: Callable[[], None]) -> None:
+        """Run callback before each scrape, e.g. to refresh gauges from live state."""
+        self._collectors.append(callback)
+
+    def render(self) -> str:
+        for callback in self._collectors:
+            callback()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames))
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Optional[Sequence[float]] = None
+) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+# HTTP
+HTTP_REQUESTS = counter(
+    "http_requests_total", "HTTP requests by route template and status", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"]
+)
+HTTP_REQUESTS_IN_FLIGHT = gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ["method"]
+)
+
+# Database
+DB_QUERIES_PER_REQUEST = histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ["route"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+)
+DB_QUERY_TIME_PER_REQUEST = histogram(
+    "db_query_seconds_per_request", "Total SQL time per HTTP request", ["route"]
+)
+DB_QUERY_DURATION = histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements"
+)
+DB_N_PLUS_ONE = counter(
+    "db_n_plus_one_total", "Requests that repeated an identical statement", ["route"]
+)
+DB_READ_ROUTES = counter(
+    "db_read_routes_total", "Read-only sessions by target database and routing reason", ["target", "reason"]
+)
+DB_POOL_CHECKOUT_WAIT = histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+DB_POOL_CHECKOUTS = counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool", ["pool"]
+)
+DB_POOL_TIMEOUTS = counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS", ["pool"]
+)
+DB_POOL_CHECKED_OUT = gauge(
+    "db_pool_checked_out", "Connections currently checked out", ["pool"]
+)
+DB_POOL_OVERFLOW = gauge(
+    "db_pool_overflow", "Connections open beyond DB_POOL_SIZE", ["pool"]
+)
+
+# LLM
+LLM_REQUEST_DURATION = histogram(
+    "llm_request_duration_seconds", "Provider call latency including retries",
+    ["provider", "model", "outcome"]
+)
+LLM_TIME_TO_FIRST_TOKEN = histogram(
+    "llm_time_to_first_token_seconds", "Time until the first token is available",
+    ["provider", "model", "streaming"]
+)
+LLM_TOKENS = counter(
+    "llm_tokens_total", "Tokens sent to and received from providers", ["agent", "model", "direction"]
+)
+LLM_PROMPT_CACHE_TOKENS = counter(
+    "llm_prompt_cache_tokens_total", "Prompt tokens read from or written to provider prompt caches",
+    ["agent", "model", "operation"]
+)
+LLM_ACTIVE_CALLS = gauge(
+    "llm_active_calls", "Provider calls holding a scheduler slot"
+)
+LLM_QUEUE_DEPTH = gauge(
+    "llm_queue_depth", "Provider calls waiting for a scheduler slot", ["priority"]
+)
+LLM_CIRCUIT_OPEN = gauge(
+    "llm_circuit_open", "1 while a provider circuit breaker is not closed", ["breaker"]
+)
+
+# Caches
+CACHE_REQUESTS = counter(
+    "cache_requests_total", "Response cache lookups by outcome", ["cache", "outcome"]
+)
+ANSWER_CACHE_LOOKUPS = counter(
+    "answer_cache_lookups_total", "Agent answer cache lookups by outcome (hit, similar or miss)",
+    ["agent", "outcome"]
+)
+ANSWER_CACHE_EVICTIONS = counter(
+    "answer_cache_evictions_total", "Agent answers dropped from the cache", ["reason"]
+)
+ANSWER_CACHE_ENTRIES = gauge(
+    "answer_cache_entries", "Agent answers cached in this worker"
+)
+ANSWER_CACHE_BYTES = gauge(
+    "answer_cache_bytes", "Approximate size of the agent answer cache"
+)
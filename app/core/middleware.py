@@ -0,0 +1,187 @@
+import time
+import uuid
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.api import deps
+from app.core import metrics, profiling, tracing
+from app.core.config import settings
+from app.db.instrumentation import track_queries
+from app.db.routing import read_your_writes, token_subject
+
+class MetricsMiddleware:
+    """
+    Records latency, status and SQL usage per HTTP request, and logs N+1 patterns.
+    Requests are labelled by route template (e.g. /api/v1/topics/{topic_id})
+    rather than raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.HTTP_REQUESTS_IN_FLIGHT.inc(method=method)
+        started = time.perf_counter()
+        try:
+            with track_queries(f"{method} {scope['path']}") as queries:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.HTTP_REQUESTS_IN_FLIGHT.dec(method=method)
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.HTTP_REQUESTS.inc(method=method, route=route, status=str(status_code))
+            metrics.HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route)
+            metrics.DB_QUERIES_PER_REQUEST.observe(queries.count, route=route)
+            metrics.DB_QUERY_TIME_PER_REQUEST.observe(queries.duration, route=route)
+            if queries.repeated:
+                metrics.DB_N_PLUS_ONE.inc(route=route)
+
+class ReadYourWritesMiddleware:
+    """
+    Marks the user of each successful write request, so their reads through
+    deps.get_read_db stay on the primary until replicas have caught up.
+    """
+
+    safe_methods = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in self.safe_methods:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if status_code < 400:
+            user_id = token_subject(Headers(scope=scope).get("authorization"))
+            if user_id is not None:
+                await read_your_writes.mark(user_id)
+
+class ProfilingMiddleware:
+    """
+    Samples the worker while a request sent by a superuser with an X-Profile
+    header runs. The profile covers every thread of the worker, so other
+    requests served meanwhile show up too; use a quiet worker. The collapsed
+    stacks can be downloaded from the profiling API using the id returned in
+    the X-Profile-Id response header. Other requests only pay for a settings
+    check, or a header scan while profiling is enabled.
+    """
+
+    header = b"x-profile"
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            not settings.PROFILING_ENABLED
+            or scope["type"] != "http"
+            or not any(name == self.header for name, _ in scope["headers"])
+            or not await self._is_superuser(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            sampler = profiling.start_sampler()
+        except profiling.ProfilerBusyError:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = str(uuid.uuid4())
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiling.save_request_profile(profile_id, profiling.stop_sampler(sampler))
+
+    async def _is_superuser(self, scope: Scope) -> bool:
+        scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+
+        # Resolve the session the same way the endpoints do, so overrides apply
+        get_auth_db = scope["app"].dependency_overrides.get(deps.get_auth_db, deps.get_auth_db)
+
+        def load_user():
+            db_generator = get_auth_db()
+            try:
+                return deps.authenticate(next(db_generator), token)
+            finally:
+                db_generator.close()
+
+        try:
+            # The lookup blocks, so it runs off the event loop
+            user = await run_in_threadpool(load_user)
+            await deps.get_current_active_superuser(user)
+        except HTTPException:
+            return False
+        return True
+
+class TracingMiddleware:
+    """
+    Opens a server span per HTTP request, continuing the caller's trace when a
+    W3C traceparent header is present and returning the span's traceparent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracing.tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        parent = tracing.SpanContext.from_traceparent(Headers(scope=scope).get("traceparent"))
+        attributes = {"http.method": method, "http.target": scope["path"]}
+        with tracing.start_span(f"{method} {scope['path']}", attributes, parent=parent) as span:
+            status_code = 500
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    MutableHeaders(scope=message)["traceparent"] = span.context.traceparent
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.name = f"{method} {route}"
+                    span.set_attribute("http.route", route)
+                span.set_attribute("http.status_code", status_code)
+                if status_code >= 500:
+                    span.status = "error"
@@ -0,0 +1,114 @@
+from typing import Optional
+from collections import Counter, OrderedDict
+import asyncio
+import os
+import sys
+import threading
+from app.core.config import settings
+
+# Leaf frames of threads that are parked rather than doing work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get")
+}
+
+class ProfilerBusyError(Exception):
+    """Raised when another profile is already running in this worker."""
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Samples the stacks of every thread in the process from a background thread.
+    Output is in the collapsed format read by flamegraph.pl and speedscope:
+    one "root;...;leaf count" line per distinct stack.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.PROFILING_INTERVAL_MS / 1000,
+        include_idle: bool = False
+    ):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.collapsed()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        """Record the current stack of every thread except the sampler."""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+# One sampler at a time per worker keeps the overhead of profiling bounded
+_profile_lock = threading.Lock()
+_request_profiles: "OrderedDict[str, str]" = OrderedDict()
+
+def start_sampler(include_idle: bool = False) -> StackSampler:
+    """Start sampling, or raise ProfilerBusyError if a profile is already running."""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already running in this worker")
+    try:
+        return StackSampler(include_idle=include_idle).start()
+    except BaseException:
+        _profile_lock.release()
+        raise
+
+def stop_sampler(sampler: StackSampler) -> str:
+    try:
+        return sampler.stop()
+    finally:
+        _profile_lock.release()
+
+async def profile_for(seconds: float, include_idle: bool = False) -> str:
+    """Sample the whole worker for the given number of seconds."""
+    sampler = start_sampler(include_idle)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        result = stop_sampler(sampler)
+    return result
+
+def save_request_profile(profile_id: str, collapsed: str) -> None:
+    """Keep a worker profile taken during one request for later download, dropping the oldest."""
+    _request_profiles[profile_id] = collapsed
+    while len(_request_profiles) > settings.PROFILING_MAX_STORED:
+        _request_profiles.popitem(last=False)
+
+def get_request_profile(profile_id: str) -> Optional[str]:
+    return _request_profiles.get(profile_id)
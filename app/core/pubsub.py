@@ -0,0 +1,121 @@
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import asyncio
+import json
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """
+    Bounded buffer of events for one subscriber.
+    When the subscriber falls behind, events of droppable types (streamed
+    deltas) are discarded; losing any other event marks the subscription
+    overflowed so the subscriber can resynchronize instead of missing data.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.CHAT_WS_SEND_QUEUE_SIZE,
+        droppable: Tuple[str, ...] = ("delta",)
+    ):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.droppable = droppable
+        self.overflowed = False
+        self.dropped = 0
+
+    def put(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if event.get("type") not in self.droppable:
+                self.overflowed = True
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None if none arrives within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class PubSub:
+    """Abstract base class for fan-out of events to subscribers in every worker."""
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        """Deliver an event to all current subscribers of a channel."""
+        raise NotImplementedError
+
+    def subscribe(self, channel: str) -> "AsyncIterator[Subscription]":
+        """Async context manager yielding a Subscription to a channel."""
+        raise NotImplementedError
+
+class InMemoryPubSub(PubSub):
+    """Process-local pub/sub, used for tests and single-worker deployments."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription.put(event)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription()
+        self._subscribers.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+class RedisPubSub(PubSub):
+    """Redis pub/sub, shared by all workers."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url, decode_responses=True)
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        await self.redis.publish(channel, json.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription()
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(channel)
+
+        async def reader() -> None:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    subscription.put(json.loads(message["data"]))
+
+        task = asyncio.create_task(reader())
+        try:
+            yield subscription
+        finally:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.warning(f"Pub/sub reader for {channel} failed: {str(e)}")
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+# Factory function to get the pub/sub backend
+@lru_cache
+def get_pubsub() -> PubSub:
+    """Get pub/sub backend based on configuration."""
+    if settings.STATE_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("REDIS_URL must be set when STATE_BACKEND is 'redis'")
+        return RedisPubSub(settings.REDIS_URL)
+    return InMemoryPubSub()
@@ -5,6 +5,7 @@ import os
 from fastapi import UploadFile
 from botocore.exceptions import ClientError
 from app.core.config import settings
+from app.core.tracing import traced
 import aiofiles
 import mimetypes
 import uuid
@@ -31,6 +32,7 @@ class LocalFileStorage(FileStorage):
         self.upload_dir = Path(settings.UPLOAD_DIR)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
     
+    @traced("storage.upload_file", {"storage.backend": "local"})
     async def upload_file(self, file: UploadFile, folder: str) -> str:
         """Save file to local storage."""
         ext = Path(file.filename).suffix
@@ -45,6 +47,7 @@ class LocalFileStorage(FileStorage):
         
         return str(Path(folder) / filename)
     
+    @traced("storage.get_file", {"storage.backend": "local"})
     async def get_file(self, file_path: str) -> Optional[tuple[BinaryIO, str]]:
         """Get file from local storage."""
         full_path = self.upload_dir / file_path
@@ -54,6 +57,7 @@ class LocalFileStorage(FileStorage):
         mime_type, _ = mimetypes.guess_type(str(full_path))
         return (open(full_path, 'rb'), mime_type or 'application/octet-stream')
     
+    @traced("storage.delete_file", {"storage.backend": "local"})
     async def delete_file(self, file_path: str) -> bool:
         """Delete file from local storage."""
         full_path = self.upload_dir / file_path
@@ -75,6 +79,7 @@ class S3FileStorage(FileStorage):
         )
         self.bucket = settings.S3_BUCKET
     
+    @traced("storage.upload_file", {"storage.backend": "s3"})
     async def upload_file(self, file: UploadFile, folder: str) -> str:
         """Upload file to S3."""
         ext = Path(file.filename).suffix
@@ -91,6 +96,7 @@ class S3FileStorage(FileStorage):
         
         return s3_path
     
+    @traced("storage.get_file", {"storage.backend": "s3"})
     async def get_file(self, file_path: str) -> Optional[tuple[BinaryIO, str]]:
         """Get file from S3."""
         try:
@@ -99,6 +105,7 @@ class S3FileStorage(FileStorage):
         except ClientError:
             return None
     
+    @traced("storage.delete_file", {"storage.backend": "s3"})
     async def delete_file(self, file_path: str) -> bool:
         """Delete file from S3."""
         try:
@@ -0,0 +1,211 @@
+from typing import Optional, Dict, Tuple
+from functools import lru_cache
+import time
+from app.core.config import settings
+
+class KeyValueStore:
+    """Abstract base class for state shared between workers."""
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a value, or None if missing or expired."""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Set a value with an optional TTL in seconds."""
+        raise NotImplementedError
+
+    async def set_if_absent(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value only if the key does not exist. Returns True if set."""
+        raise NotImplementedError
+
+    async def swap(self, key: str, value: str) -> Optional[str]:
+        """Set a value without a TTL and return the previous one, atomically."""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Delete a key."""
+        raise NotImplementedError
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        """Delete a key only if it still holds value. Returns True if deleted."""
+        raise NotImplementedError
+
+    async def extend_if_equals(self, key: str, value: str, ttl: float) -> bool:
+        """Reset a key's TTL only if it still holds value. Returns True if extended."""
+        raise NotImplementedError
+
+    async def take_tokens(
+        self,
+        key: str,
+        cost: float,
+        capacity: float,
+        refill_per_second: float,
+        force: bool = False
+    ) -> float:
+        """
+        Take cost tokens from a token bucket.
+        Returns 0 when granted, otherwise the seconds until enough tokens refill.
+        With force the tokens are taken even if the bucket goes negative.
+        """
+        raise NotImplementedError
+
+class InMemoryStore(KeyValueStore):
+    """Process-local store, used for tests and single-worker deployments."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _get_entry(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _expiry(self, ttl: Optional[float]) -> Optional[float]:
+        return time.monotonic() + ttl if ttl else None
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._get_entry(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._data[key] = (value, self._expiry(ttl))
+
+    async def set_if_absent(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        if self._get_entry(key) is not None:
+            return False
+        self._data[key] = (value, self._expiry(ttl))
+        return True
+
+    async def swap(self, key: str, value: str) -> Optional[str]:
+        previous = self._get_entry(key)
+        self._data[key] = (value, None)
+        return previous
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        if self._get_entry(key) != value:
+            return False
+        del self._data[key]
+        return True
+
+    async def extend_if_equals(self, key: str, value: str, ttl: float) -> bool:
+        if self._get_entry(key) != value:
+            return False
+        self._data[key] = (value, self._expiry(ttl))
+        return True
+
+    async def take_tokens(
+        self,
+        key: str,
+        cost: float,
+        capacity: float,
+        refill_per_second: float,
+        force: bool = False
+    ) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        wait = 0.0
+        if tokens >= cost or force:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / refill_per_second
+        self._buckets[key] = (tokens, now)
+        return wait
+
+class RedisStore(KeyValueStore):
+    """Redis-backed store, shared by all workers."""
+
+    DELETE_IF_EQUALS_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    EXTEND_IF_EQUALS_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    TAKE_TOKENS_SCRIPT = """
+    local cost = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local rate = tonumber(ARGV[3])
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+    local wait = 0
+    if tokens >= cost or ARGV[4] == '1' then
+        tokens = tokens - cost
+    else
+        wait = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url, decode_responses=True)
+        self._delete_if_equals = self.redis.register_script(self.DELETE_IF_EQUALS_SCRIPT)
+        self._extend_if_equals = self.redis.register_script(self.EXTEND_IF_EQUALS_SCRIPT)
+        self._take_tokens = self.redis.register_script(self.TAKE_TOKENS_SCRIPT)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.redis.get(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self.redis.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    async def set_if_absent(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        return bool(await self.redis.set(key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    async def swap(self, key: str, value: str) -> Optional[str]:
+        return await self.redis.getset(key, value)
+
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(key)
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        return bool(await self._delete_if_equals(keys=[key], args=[value]))
+
+    async def extend_if_equals(self, key: str, value: str, ttl: float) -> bool:
+        return bool(await self._extend_if_equals(keys=[key], args=[value, int(ttl * 1000)]))
+
+    async def take_tokens(
+        self,
+        key: str,
+        cost: float,
+        capacity: float,
+        refill_per_second: float,
+        force: bool = False
+    ) -> float:
+        wait = await self._take_tokens(
+            keys=[key],
+            args=[cost, capacity, refill_per_second, "1" if force else "0"]
+        )
+        return float(wait)
+
+# Factory function to get the shared state backend
+@lru_cache
+def get_store() -> KeyValueStore:
+    """Get state backend based on configuration."""
+    if settings.STATE_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("REDIS_URL must be set when STATE_BACKEND is 'redis'")
+        return RedisStore(settings.REDIS_URL)
+    return InMemoryStore()
@@ -0,0 +1,213 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+import inspect
+import json
+import logging
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class SpanContext:
+    """W3C trace context identifying a span."""
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        """Parse a traceparent header, ignoring malformed or all-zero ids."""
+        match = TRACEPARENT_PATTERN.match((header or "").strip().lower())
+        if not match:
+            return None
+        trace_id, span_id, flags = match.groups()
+        if trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, sampled=bool(int(flags, 16) & 1))
+
+class Span:
+    """A timed operation within a trace."""
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_time: Optional[float] = None
+    ):
+        self.name = name
+        self.parent_id = parent.span_id if parent else None
+        self.context = SpanContext(
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            sampled=parent.sampled if parent else random.random() < settings.TRACING_SAMPLE_RATE
+        )
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time() if start_time is None else start_time
+        self.end_time: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self, end_time: Optional[float] = None) -> None:
+        self.end_time = time.time() if end_time is None else end_time
+        if self.context.sampled:
+            get_exporter().export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round(((self.end_time or self.start_time) - self.start_time) * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+class SpanExporter:
+    """Abstract base class for span exporters."""
+
+    enabled = True
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+class NoopExporter(SpanExporter):
+    """Drops spans; tracing is off."""
+
+    enabled = False
+
+    def export(self, span: Span) -> None:
+        pass
+
+class ConsoleExporter(SpanExporter):
+    """Writes one JSON line per span to stderr."""
+
+    def export(self, span: Span) -> None:
+        sys.stderr.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+class FileExporter(SpanExporter):
+    """Appends one JSON line per span to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+class MemoryExporter(SpanExporter):
+    """Keeps finished spans in memory, for tests."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def names(self) -> List[str]:
+        return [span.name for span in self.spans]
+
+@lru_cache()
+def get_exporter() -> SpanExporter:
+    """Get the exporter selected by TRACING_EXPORTER."""
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleExporter()
+    if settings.TRACING_EXPORTER == "file":
+        return FileExporter(settings.TRACING_FILE)
+    return NoopExporter()
+
+def tracing_enabled() -> bool:
+    return get_exporter().enabled
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_traceparent() -> Optional[str]:
+    """traceparent header for outgoing calls made within the current span."""
+    span = _current_span.get()
+    return span.context.traceparent if span else None
+
+@contextmanager
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    parent: Optional[SpanContext] = None
+) -> Iterator[Optional[Span]]:
+    """
+    Run a block inside a child of the current span (or of parent).
+    Yields None without creating a span while tracing is off.
+    """
+    if not tracing_enabled():
+        yield None
+        return
+
+    if parent is None and _current_span.get() is not None:
+        parent = _current_span.get().context
+    span = Span(name, parent, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+def record_span(name: str, start_time: float, end_time: float, attributes: Optional[Dict[str, Any]] = None) -> None:
+    """Record an already finished operation as a child of the current span."""
+    parent = _current_span.get()
+    if parent is None or not tracing_enabled():
+        return
+    span = Span(name, parent.context, attributes, start_time=start_time)
+    span.end(end_time)
+
+def traced(name: str, attributes: Optional[Dict[str, Any]] = None) -> Callable:
+    """Decorator running a sync or async function inside a span."""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(name, attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name, attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,152 @@
+from typing import Dict, Iterator, List, Optional
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import os
+import re
+import time
+import traceback
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from app.core import metrics, tracing
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PLACEHOLDER_LIST = re.compile(r"(\?|%\(\w+\)s|:\w+)(\s*,\s*(\?|%\(\w+\)s|:\w+))+")
+
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace and expanded IN lists so equivalent statements compare equal."""
+    statement = " ".join(statement.split())
+    return _PLACEHOLDER_LIST.sub("?, ...", statement)
+
+def call_site(limit: int = 8) -> List[str]:
+    """Application frames (outside this module and the tests) of the current stack."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_APP_DIR)
+        and frame.filename != __file__
+        and os.sep + "tests" + os.sep not in frame.filename
+    ]
+    return [f"{frame.filename}:{frame.lineno} in {frame.name}" for frame in frames[-limit:]]
+
+class QueryStats:
+    """SQL statements executed on behalf of one request."""
+
+    def __init__(self, n_plus_one_threshold: int = settings.DB_N_PLUS_ONE_THRESHOLD):
+        self.count = 0
+        self.duration = 0.0
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.statements: Counter = Counter()
+        # Normalized statement -> call-site stack where it crossed the threshold
+        self.repeated: Dict[str, List[str]] = {}
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        normalized = normalize_statement(statement)
+        self.statements[normalized] += 1
+        if self.n_plus_one_threshold and self.statements[normalized] == self.n_plus_one_threshold:
+            self.repeated[normalized] = call_site()
+
+    def summary(self) -> str:
+        lines = [f"{self.count} statements in {self.duration * 1000:.1f}ms"]
+        for statement, count in self.statements.most_common():
+            lines.append(f"  {count}x {statement}")
+        return "\n".join(lines)
+
+# Holds a mutable object rather than counters so that statements run in the
+# threadpool (sync endpoints and dependencies) are added to the request's totals
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+@contextmanager
+def track_queries(name: str = "") -> Iterator[QueryStats]:
+    """Count statements executed in this context and report N+1 patterns on exit."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        for statement, stack in stats.repeated.items():
+            logger.warning(
+                f"Possible N+1 in {name or 'request'}: statement ran "
+                f"{stats.statements[statement]} times: {statement}\n"
+                + "\n".join(f"  {line}" for line in stack)
+            )
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    metrics.DB_QUERY_DURATION.observe(elapsed)
+    if tracing.current_span() is not None:
+        end_time = time.time()
+        tracing.record_span(
+            "db.query", end_time - elapsed, end_time, {"db.statement": normalize_statement(statement)}
+        )
+    if settings.DB_SLOW_QUERY_MS and elapsed * 1000 >= settings.DB_SLOW_QUERY_MS:
+        logger.warning(
+            f"Slow statement ({elapsed * 1000:.1f}ms): {normalize_statement(statement)}\n"
+            + "\n".join(f"  {line}" for line in call_site())
+        )
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Record statement counts and latency for an engine."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+@contextmanager
+def capture_queries(engine: Engine) -> Iterator[QueryStats]:
+    """
+    Record every statement run on engine inside the block, from any thread or task.
+    Meant for tests, where the app may run outside the caller's context.
+    """
+    stats = QueryStats(n_plus_one_threshold=0)
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats.record(statement, 0.0)
+
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield stats
+    finally:
+        event.remove(engine, "after_cursor_execute", after_cursor_execute)
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records checkouts, how long they wait for a free
+    connection, timeouts and overflow usage, labelled by pool_logging_name.
+    """
+
+    def _record_usage(self, name: str) -> None:
+        metrics.DB_POOL_CHECKED_OUT.set(self.checkedout(), pool=name)
+        metrics.DB_POOL_OVERFLOW.set(max(self.overflow(), 0), pool=name)
+
+    def _do_get(self):
+        name = self.logging_name or "default"
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            metrics.DB_POOL_TIMEOUTS.inc(pool=name)
+            raise
+        finally:
+            metrics.DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=name)
+        metrics.DB_POOL_CHECKOUTS.inc(pool=name)
+        self._record_usage(name)
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._record_usage(self.logging_name or "default")
@@ -0,0 +1,161 @@
+from typing import Callable, List, NamedTuple, Optional
+from datetime import datetime, UTC
+from pathlib import Path
+import asyncio
+import gzip
+import logging
+import os
+import re
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHAT_TABLE = "chat_messages"
+
+# Detaching briefly locks the parent table; give up rather than queue live traffic behind it
+DETACH_LOCK_TIMEOUT_MS = 5000
+
+class Partition(NamedTuple):
+    """A partition with its [lower, upper) range; None bounds are MINVALUE/MAXVALUE."""
+    name: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+    default: bool = False
+
+    def covers(self, moment: datetime) -> bool:
+        if self.default:
+            return False
+        return (self.lower is None or self.lower <= moment) and (self.upper is None or moment < self.upper)
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+def parse_bound(name: str, bound: str) -> Partition:
+    """Build a Partition from pg_get_expr(relpartbound), e.g. FOR VALUES FROM ('...') TO (MAXVALUE)."""
+    if bound == "DEFAULT":
+        return Partition(name, None, None, default=True)
+    match = re.match(r"FOR VALUES FROM \((.+)\) TO \((.+)\)", bound)
+    if match is None:
+        raise ValueError(f"Unsupported partition bound of {name}: {bound}")
+    lower, upper = (
+        None if value in ("MINVALUE", "MAXVALUE") else datetime.fromisoformat(value.strip("'"))
+        for value in match.groups()
+    )
+    return Partition(name, lower, upper)
+
+def is_partitioned(db: Session, table: str = CHAT_TABLE) -> bool:
+    """Whether table is a partitioned Postgres table (plain tables and SQLite need no upkeep)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.scalar(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    ))
+
+def list_partitions(db: Session, table: str = CHAT_TABLE) -> List[Partition]:
+    """Attached partitions of table, oldest first, the default partition last."""
+    rows = db.execute(
+        text("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(:table)
+        """),
+        {"table": table}
+    ).all()
+    partitions = [parse_bound(name, bound) for name, bound in rows]
+    return sorted(partitions, key=lambda p: (p.default, p.lower or datetime.min))
+
+def ensure_partitions(
+    db: Session,
+    table: str = CHAT_TABLE,
+    ahead: int = settings.CHAT_PARTITION_MONTHS_AHEAD,
+    now: Optional[datetime] = None
+) -> List[str]:
+    """
+    Create the monthly partitions of the current month and the next ahead
+    months that are not covered yet. Returns the names of created partitions.
+    Rows outside every partition land in the default partition; a month with
+    such rows cannot get its own partition until they are moved out of it.
+    """
+    if not is_partitioned(db, table):
+        return []
+    current = month_start(now or datetime.now(UTC).replace(tzinfo=None))
+    partitions = list_partitions(db, table)
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if any(partition.covers(month) for partition in partitions):
+            continue
+        name = partition_name(table, month)
+        try:
+            db.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+            ))
+            db.commit()
+            created.append(name)
+            logger.info(f"Created partition {name}")
+        except SQLAlchemyError as e:
+            # Another worker created it first, or rows of that month are in the default partition
+            db.rollback()
+            logger.error(f"Could not create partition {name}: {str(e)}")
+    return created
+
+def archivable_partitions(partitions: List[Partition], cutoff: datetime) -> List[Partition]:
+    """Partitions whose rows are all older than cutoff."""
+    return [p for p in partitions if not p.default and p.upper is not None and p.upper <= cutoff]
+
+def archive_partition(db: Session, partition: Partition, directory: Path, table: str = CHAT_TABLE) -> Path:
+    """
+    Detach a partition, copy it to a gzipped CSV file and drop it.
+    Readers stop seeing its rows at the detach; the table is only dropped
+    once the file is complete. Restore with CREATE TABLE ... (LIKE table),
+    COPY ... FROM and ALTER TABLE ... ATTACH PARTITION.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{partition.name}.csv.gz"
+    temporary = Path(f"{path}.tmp")
+
+    db.execute(text(f"SET LOCAL lock_timeout = {DETACH_LOCK_TIMEOUT_MS}"))
+    db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{partition.name}"'))
+    db.commit()
+
+    connection = db.connection().connection.driver_connection
+    with gzip.open(temporary, "wt") as f, connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY "{partition.name}" TO STDOUT WITH (FORMAT csv, HEADER)', f)
+    os.replace(temporary, path)
+
+    db.execute(text(f'DROP TABLE "{partition.name}"'))
+    db.commit()
+    logger.info(f"Archived partition {partition.name} to {path}")
+    return path
+
+async def maintain_partitions(
+    session_factory: Callable[[], Session],
+    interval: float = settings.CHAT_PARTITION_CHECK_SECONDS
+) -> None:
+    """Keep partitions created ahead of time, checking every interval seconds."""
+    def check() -> None:
+        db = session_factory()
+        try:
+            ensure_partitions(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            await asyncio.to_thread(check)
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {str(e)}")
+        await asyncio.sleep(interval)
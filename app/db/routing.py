@@ -0,0 +1,102 @@
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+from jose import jwt, JWTError
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.security import ALGORITHM
+from app.core.store import KeyValueStore, get_store
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction, 0 while the replica has replayed everything it received
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+class ReplicaRouter:
+    """
+    Picks a replica for read-only sessions, round robin over the replicas
+    whose replication lag is within max_lag. Lags are measured at most every
+    check_interval seconds per replica; unreachable replicas count as lagging.
+    """
+
+    def __init__(
+        self,
+        engines: List[Engine],
+        max_lag: float = settings.REPLICA_MAX_LAG_SECONDS,
+        check_interval: float = settings.REPLICA_LAG_CHECK_SECONDS
+    ):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lags: Dict[int, Tuple[Optional[float], float]] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def measure_lag(self, engine: Engine) -> Optional[float]:
+        """Replication lag in seconds, or None if the replica cannot be reached."""
+        try:
+            with engine.connect() as connection:
+                return float(connection.execute(LAG_QUERY).scalar() or 0)
+        except Exception as e:
+            logger.warning(f"Replica {engine.url.host} unavailable: {str(e)}")
+            return None
+
+    def lag(self, index: int) -> Optional[float]:
+        lag, measured_at = self._lags.get(index, (None, 0.0))
+        if time.monotonic() - measured_at > self.check_interval:
+            lag = self.measure_lag(self.engines[index])
+            self._lags[index] = (lag, time.monotonic())
+        return lag
+
+    def pick(self) -> Optional[Engine]:
+        """A replica within the lag budget, or None to use the primary. May block on a lag check."""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % max(len(self.engines), 1)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            lag = self.lag(index)
+            if lag is not None and lag <= self.max_lag:
+                return self.engines[index]
+        return None
+
+class ReadYourWrites:
+    """
+    Remembers users who just wrote, so their reads go to the primary until
+    replicas have caught up with the write. Shared between workers through
+    the state store.
+    """
+
+    def __init__(self, store: KeyValueStore, ttl: float = settings.READ_YOUR_WRITES_SECONDS):
+        self.store = store
+        self.ttl = ttl
+
+    def _key(self, user_id: str) -> str:
+        return f"db:wrote:{user_id}"
+
+    async def mark(self, user_id: str) -> None:
+        if self.ttl:
+            await self.store.set(self._key(user_id), "1", ttl=self.ttl)
+
+    async def is_sticky(self, user_id: str) -> bool:
+        return bool(self.ttl) and await self.store.get(self._key(user_id)) is not None
+
+def token_subject(authorization: Optional[str]) -> Optional[str]:
+    """User id of a valid bearer access token, without touching the database."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub") if payload.get("type") == "access" else None
+
+read_your_writes = ReadYourWrites(get_store())
@@ -1,20 +1,68 @@
+from typing import Any, Dict
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.core.config import settings
+from app.db.instrumentation import InstrumentedQueuePool, instrument_engine
+from app.db.routing import ReplicaRouter
 
-# Create SQLAlchemy engine with proper connection pool settings
-engine = create_engine(
-    str(settings.DATABASE_URI),
-    # These pool settings are good for most web applications
-    pool_pre_ping=True,  # Enable connection health checks
-    pool_size=5,  # Number of connections to maintain
-    max_overflow=10,  # Maximum number of connections to create beyond pool_size
-    pool_recycle=3600,  # Recycle connections after 1 hour
-)
+def create_db_engine(
+    url: str,
+    name: str = "primary",
+    server_timeouts: bool = True,
+    **pool_options: Any
+) -> Engine:
+    """
+    Create an instrumented engine with the pool settings from Settings.
+    pool_options override pool_size, max_overflow and the other pool arguments.
+    Without server_timeouts, Postgres statement and idle transaction timeouts are left off.
+    """
+    options: Dict[str, Any] = {"pool_logging_name": name}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer pools connections across workers; psycopg2 never uses server-side
+        # prepared statements, so transaction pooling only needs the local pool gone
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_pre_ping=True,  # Enable connection health checks
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            poolclass=InstrumentedQueuePool,  # Records checkouts, waits, timeouts and overflow
+        )
+        server_options = []
+        if server_timeouts and settings.DB_STATEMENT_TIMEOUT_MS:
+            server_options.append(f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}")
+        if server_timeouts and settings.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS:
+            server_options.append(
+                f"-c idle_in_transaction_session_timeout={settings.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS}"
+            )
+        if server_options and url.startswith("postgresql"):
+            options["connect_args"] = {"options": " ".join(server_options)}
+    options.update(pool_options)
+    return instrument_engine(create_engine(url, **options))
+
+engine = create_db_engine(str(settings.DATABASE_URI))
+
+# Read-only endpoints use a replica through deps.get_read_db when one is healthy
+replica_router = ReplicaRouter([
+    create_db_engine(url, name=f"replica{i}") for i, url in enumerate(settings.DATABASE_REPLICA_URIS)
+])
 
 # Create session factory
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
-) 
\ No newline at end of file
+)
+
+# Management commands run long statements (archive COPYs, exports, imports) that
+# the web timeouts would cancel; connections are only opened when a command runs
+maintenance_engine = create_db_engine(str(settings.DATABASE_URI), name="maintenance", server_timeouts=False)
+MaintenanceSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=maintenance_engine,
+)
@@ -1,7 +1,14 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.core import metrics
+from app.core.middleware import MetricsMiddleware, ProfilingMiddleware, ReadYourWritesMiddleware, TracingMiddleware
+from app.db.partitions import maintain_partitions
+from app.db.session import SessionLocal
+from app.services.ai.providers import close_providers
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -18,13 +25,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profile requests sent by superusers with X-Profile (when PROFILING_ENABLED)
+app.add_middleware(ProfilingMiddleware)
+
+# Trace requests (when TRACING_EXPORTER is set)
+app.add_middleware(TracingMiddleware)
+
+# Keep reads of users who just wrote on the primary (when replicas are configured)
+if settings.DATABASE_REPLICA_URIS:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Record request metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+async def startup():
+    """Keep chat message partitions created ahead of time."""
+    if settings.CHAT_PARTITION_CHECK_SECONDS:
+        app.state.partition_maintenance = asyncio.create_task(maintain_partitions(SessionLocal))
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop partition maintenance and close provider connection pools."""
+    task = getattr(app.state, "partition_maintenance", None)
+    if task is not None:
+        task.cancel()
+    await close_providers()
+
 @app.get("/")
 async def root():
     """Root endpoint for health checks."""
     return {
         "status": "healthy",
         "version": settings.VERSION,
-    } 
\ No newline at end of file
+    }
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus scrape endpoint."""
+        return PlainTextResponse(
+            metrics.registry.render(),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
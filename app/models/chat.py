@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Text, ForeignKey, Enum as SQLEnum, JSON, Integer
+from sqlalchemy import Column, String, Text, ForeignKey, Enum as SQLEnum, JSON, Integer, Index, DateTime
 from sqlalchemy.orm import relationship
+from datetime import datetime, UTC
 
 import enum
 from app.models.base import BaseModel
@@ -13,8 +14,19 @@ class ChatMessage(BaseModel):
     """Model for storing chat messages."""
     
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # History pages, since-cursors and ETags all walk a session's messages by time
+        Index("ix_chat_messages_session_id_created_at", "session_id", "created_at"),
+        # Incremental archive exports continue from a created_at watermark
+        Index("ix_chat_messages_created_at", "created_at"),
+        # Monthly partitions on Postgres, managed by app.db.partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     id = Column(String(36), primary_key=True)
+    # Postgres requires the partition key in the primary key; ids are still unique on their own
+    created_at = Column(DateTime, primary_key=True, nullable=False, default=lambda: datetime.now(UTC))
+    __mapper_args__ = {"primary_key": [id]}
     session_id = Column(String(36), ForeignKey("sessions.id", ondelete="CASCADE"))
     role = Column(SQLEnum(MessageRole), nullable=False)
     content = Column(Text, nullable=False)
@@ -8,7 +8,7 @@ class Session(BaseModel):
     __tablename__ = "sessions"
     
     id = Column(String(36), primary_key=True, index=True)
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
     topic_id = Column(String(36), ForeignKey("topics.id"), nullable=False)
     is_active = Column(Boolean, default=True)
     
@@ -12,7 +12,7 @@ class Topic(BaseModel):
     description = Column(String)
     content = Column(JSON)  # Structured content data
     difficulty_level = Column(Integer, nullable=False, default=1)
-    parent_id = Column(String(36), ForeignKey("topics.id"), nullable=True)
+    parent_id = Column(String(36), ForeignKey("topics.id"), nullable=True, index=True)
     engagement_score = Column(Float, default=0.0)  # Calculated based on user interactions
     
     # Self-referential relationship for topic hierarchy
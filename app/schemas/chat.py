@@ -18,4 +18,5 @@ class ChatMessageResponse(BaseModel):
 class ChatHistoryResponse(BaseModel):
     messages: List[ChatMessageResponse]
     has_more: bool
-    total_messages: int 
\ No newline at end of file
+    total_messages: Optional[int] = None  # Not counted for since= requests
+    cursor: Optional[str] = None  # Pass as since= to get only newer messages 
\ No newline at end of file
@@ -51,4 +51,7 @@ class TopicResponse(BaseModel):
     duration: int = 0
     average_completion_rate: float = 0.0
 
-    model_config = ConfigDict(from_attributes=True) 
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class TopicTreeNode(TopicResponse):
+    children: List["TopicTreeNode"] = []
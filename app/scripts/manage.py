@@ -2,14 +2,28 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+import asyncio
 import click
 import json
+import time
+from typing import Iterator
 from datetime import datetime, UTC, timedelta
-from sqlalchemy import func
+from pathlib import Path
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import sessionmaker
 from app.scripts.create_superuser import create_superuser
-from app.db.session import SessionLocal
-from app.models import User, Topic, Session, UserAnalytics
+from app.db.session import MaintenanceSessionLocal
+from app.models import User, Topic, Session
 from app.core.security import get_password_hash
+from app.core.config import settings
+from app.core.store import get_store
+from app.services.purge import PurgeEngine
+from app.services.topic_transfer import TopicImporter, copy_topics, iter_topics
+from app.services.archive import DATASETS, PARTITIONINGS, export_dataset
+from app.db.partitions import (
+    add_months, archivable_partitions, archive_partition, ensure_partitions,
+    is_partitioned, list_partitions, month_start
+)
 
 @click.group()
 def cli():
@@ -19,7 +33,7 @@ def cli():
 @cli.command()
 def createsuperuser():
     """Create a superuser if it doesn't exist."""
-    db = SessionLocal()
+    db = MaintenanceSessionLocal()
     try:
         create_superuser(db)
     finally:
@@ -30,7 +44,7 @@ def createsuperuser():
 @click.option('--active/--inactive', default=True, help="Set user active status")
 def manage_user(email: str, active: bool):
     """Manage user status (activate/deactivate)."""
-    db = SessionLocal()
+    db = MaintenanceSessionLocal()
     try:
         user = db.query(User).filter(User.email == email).first()
         if not user:
@@ -46,59 +60,95 @@ def manage_user(email: str, active: bool):
 
 @cli.command()
 @click.argument('days', type=int, default=30)
-def cleanup_inactive(days: int):
+@click.option('--batch-size', default=settings.PURGE_BATCH_SIZE, show_default=True,
+              help="Rows deleted per transaction")
+@click.option('--sleep', 'pause', default=settings.PURGE_PAUSE_SECONDS, show_default=True,
+              help="Seconds to pause between batches")
+@click.option('--parallel/--sequential', default=True,
+              help="Clean independent tables concurrently")
+@click.option('--dry-run', is_flag=True, help="Only report how many rows would be deleted")
+def cleanup_inactive(days: int, batch_size: int, pause: float, parallel: bool, dry_run: bool):
     """Clean up inactive sessions older than specified days."""
-    db = SessionLocal()
-    try:
-        cutoff_date = datetime.now(UTC) - timedelta(days=days)
-        
-        # Delete old sessions
-        deleted_sessions = db.query(Session).filter(
-            Session.created_at < cutoff_date,
-            Session.completion_rate == 0
-        ).delete()
-        
-        # Clean up analytics
-        deleted_analytics = db.query(UserAnalytics).filter(
-            UserAnalytics.created_at < cutoff_date,
-            ~UserAnalytics.user_id.in_(
-                db.query(Session.user_id).distinct()
-            )
-        ).delete()
-        
-        db.commit()
-        click.echo(f"✅ Cleaned up {deleted_sessions} inactive sessions")
-        click.echo(f"✅ Cleaned up {deleted_analytics} stale analytics records")
-    finally:
-        db.close()
+    cutoff_date = datetime.now(UTC) - timedelta(days=days)
+    params = {"cutoff": cutoff_date.replace(tzinfo=None).isoformat()}
+    engine = PurgeEngine(get_store(), batch_size=batch_size, pause=pause, parallel=parallel)
+    
+    if dry_run:
+        estimate = asyncio.run(engine.estimate("inactive_sessions", params, MaintenanceSessionLocal))
+        click.echo(f"ℹ️  Dry run, nothing deleted. Rows older than {days} days:")
+        for table, count in estimate.items():
+            click.echo(f"  {table}: {count} ({-(-count // batch_size)} batches)")
+        return
+    
+    def show_progress(job: dict) -> None:
+        deleted = ", ".join(f"{table} {count}" for table, count in job["deleted"].items())
+        click.echo(f"\r  Deleted {deleted}", nl=False)
+    
+    # Delete in short batched transactions so live traffic is never blocked for long
+    async def purge() -> dict:
+        job = await engine.create("inactive_sessions", params)
+        click.echo(f"Purge job {job['id']}")
+        return await engine.run(job["id"], MaintenanceSessionLocal, on_progress=show_progress)
+    
+    job = asyncio.run(purge())
+    click.echo()
+    click.echo(f"✅ Cleaned up {job['deleted']['sessions']} inactive sessions")
+    click.echo(f"✅ Cleaned up {job['deleted']['chat_messages']} chat messages")
+    click.echo(f"✅ Cleaned up {job['deleted']['user_analytics']} stale analytics records")
+
+def _is_ndjson(path: str, format: str) -> bool:
+    if format != "auto":
+        return format == "ndjson"
+    return Path(path).suffix in (".ndjson", ".jsonl")
+
+def _read_records(path: str, ndjson: bool) -> Iterator[dict]:
+    """Stream NDJSON records one line at a time; JSON arrays are loaded whole."""
+    with open(path, 'r') as f:
+        if not ndjson:
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
 
 @cli.command()
 @click.argument('output_file', type=click.Path())
-def export_topics(output_file: str):
-    """Export all topics to a JSON file."""
-    db = SessionLocal()
+@click.option('--format', 'format', type=click.Choice(["auto", "json", "ndjson"]), default="auto",
+              help="Output format (auto: ndjson for .ndjson/.jsonl files, else a JSON array)")
+@click.option('--batch-size', default=1000, show_default=True, help="Rows fetched per round trip")
+@click.option('--copy', 'use_copy', is_flag=True, help="Stream NDJSON straight from Postgres with COPY")
+def export_topics(output_file: str, format: str, batch_size: int, use_copy: bool):
+    """Export all topics to a JSON or NDJSON file, parents before children."""
+    ndjson = _is_ndjson(output_file, format)
+    db = MaintenanceSessionLocal()
+    started = time.perf_counter()
     try:
-        topics = db.query(Topic).all()
-        
-        # Convert topics to dict
-        topics_data = []
-        for topic in topics:
-            topic_dict = {
-                "id": topic.id,
-                "title": topic.title,
-                "description": topic.description,
-                "content": topic.content,
-                "difficulty_level": topic.difficulty_level,
-                "parent_id": topic.parent_id,
-                "engagement_score": topic.engagement_score
-            }
-            topics_data.append(topic_dict)
-        
-        # Write to file
         with open(output_file, 'w') as f:
-            json.dump(topics_data, f, indent=2)
+            if use_copy:
+                if not ndjson:
+                    raise click.UsageError("--copy writes NDJSON; use an .ndjson file or --format ndjson")
+                copy_topics(db, f)
+                exported = None
+            else:
+                exported = 0
+                f.write("" if ndjson else "[\n")
+                for topic in iter_topics(db, batch_size):
+                    if not ndjson and exported:
+                        f.write(",\n")
+                    f.write(json.dumps(topic, default=str))
+                    if ndjson:
+                        f.write("\n")
+                    exported += 1
+                    if exported % 10000 == 0:
+                        click.echo(f"\r  {exported} topics ({exported / (time.perf_counter() - started):.0f}/s)", nl=False)
+                f.write("" if ndjson else "\n]\n")
         
-        click.echo(f"✅ Exported {len(topics_data)} topics to {output_file}")
+        elapsed = time.perf_counter() - started
+        if exported is None:
+            click.echo(f"✅ Exported topics to {output_file} with COPY in {elapsed:.1f}s")
+        else:
+            click.echo(f"\r✅ Exported {exported} topics to {output_file} in {elapsed:.1f}s "
+                       f"({exported / max(elapsed, 1e-6):.0f}/s)")
     finally:
         db.close()
 
@@ -106,44 +156,150 @@ def export_topics(output_file: str):
 @click.argument('input_file', type=click.Path(exists=True))
 @click.option('--update/--no-update', default=False, 
               help="Update existing topics if they exist")
-def import_topics(input_file: str, update: bool):
-    """Import topics from a JSON file."""
-    db = SessionLocal()
+@click.option('--format', 'format', type=click.Choice(["auto", "json", "ndjson"]), default="auto",
+              help="Input format (auto: ndjson for .ndjson/.jsonl files, else a JSON array)")
+@click.option('--batch-size', default=1000, show_default=True, help="Rows upserted per statement")
+def import_topics(input_file: str, update: bool, format: str, batch_size: int):
+    """Import topics from a JSON or NDJSON file in batches."""
+    db = MaintenanceSessionLocal()
+    started = time.perf_counter()
+    
+    def show_progress(stats: dict) -> None:
+        processed = stats["created"] + stats["updated"] + stats["skipped"]
+        click.echo(f"\r  {processed} topics ({processed / (time.perf_counter() - started):.0f}/s)", nl=False)
+    
     try:
-        with open(input_file, 'r') as f:
-            topics_data = json.load(f)
+        importer = TopicImporter(db, update=update, batch_size=batch_size, on_progress=show_progress)
+        stats = importer.run(_read_records(input_file, _is_ndjson(input_file, format)))
         
-        created = 0
-        updated = 0
-        skipped = 0
-        
-        for topic_data in topics_data:
-            existing = db.query(Topic).filter(Topic.id == topic_data['id']).first()
+        elapsed = time.perf_counter() - started
+        processed = stats["created"] + stats["updated"] + stats["skipped"]
+        click.echo(f"\r⏱️  Processed {processed} topics in {elapsed:.1f}s ({processed / max(elapsed, 1e-6):.0f}/s)")
+        click.echo(f"✅ Created {stats['created']} topics")
+        click.echo(f"✅ Updated {stats['updated']} topics")
+        click.echo(f"ℹ️  Skipped {stats['skipped']} existing topics")
+        if stats["orphaned"]:
+            click.echo(f"⚠️  Skipped {stats['orphaned']} topics whose parent does not exist")
+    finally:
+        db.close()
+
+@cli.command()
+@click.argument('datasets', nargs=-1, type=click.Choice(sorted(DATASETS)))
+@click.option('--output-dir', default=settings.ARCHIVE_DIR, show_default=True, type=click.Path(file_okay=False))
+@click.option('--format', 'format', type=click.Choice(["parquet", "arrow"]), default="parquet", show_default=True)
+@click.option('--partition-by', type=click.Choice(list(PARTITIONINGS)), default="day", show_default=True)
+@click.option('--row-group-size', default=settings.ARCHIVE_ROW_GROUP_SIZE, show_default=True,
+              help="Rows per row group; also bounds the rows held in memory")
+@click.option('--batch-size', default=settings.ARCHIVE_BATCH_SIZE, show_default=True,
+              help="Rows fetched per round trip")
+@click.option('--lag', default=settings.ARCHIVE_LAG_SECONDS, show_default=True,
+              help="Leave rows newer than this many seconds for the next run")
+@click.option('--database-url', default=None, help="Read from this database, e.g. a replica (default: primary)")
+def export_archive(datasets, output_dir: str, format: str, partition_by: str, row_group_size: int,
+                   batch_size: int, lag: float, database_url: str):
+    """
+    Export sessions, messages and token usage to partitioned columnar files.
+    Each run continues from the watermark of the previous one.
+    """
+    if database_url:
+        db = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(database_url))()
+    else:
+        db = MaintenanceSessionLocal()
+    try:
+        for name in datasets or sorted(DATASETS):
+            started = time.perf_counter()
             
-            if existing and not update:
-                skipped += 1
-                continue
+            def show_progress(rows: int) -> None:
+                click.echo(f"\r  {name}: {rows} rows ({rows / (time.perf_counter() - started):.0f}/s)", nl=False)
             
-            if existing and update:
-                for key, value in topic_data.items():
-                    setattr(existing, key, value)
-                updated += 1
+            try:
+                result = export_dataset(
+                    db, DATASETS[name], Path(output_dir),
+                    format=format,
+                    partition_by=PARTITIONINGS[partition_by],
+                    row_group_size=row_group_size,
+                    batch_size=batch_size,
+                    lag=lag,
+                    on_progress=show_progress
+                )
+            except ImportError as e:
+                raise click.ClickException(str(e))
+            
+            elapsed = time.perf_counter() - started
+            since = result["since"].isoformat() if result["since"] else "the beginning"
+            click.echo(f"\r✅ Exported {result['rows']} {name} rows into {len(result['files'])} files "
+                       f"in {elapsed:.1f}s ({since} → {result['until'].isoformat()})")
+    finally:
+        db.close()
+
+@cli.group()
+def partitions():
+    """Manage the monthly partitions of chat_messages (Postgres)."""
+    pass
+
+def _partitioned_session():
+    db = MaintenanceSessionLocal()
+    if not is_partitioned(db):
+        db.close()
+        raise click.ClickException("chat_messages is not a partitioned table; run the migrations on Postgres first")
+    return db
+
+@partitions.command('list')
+def list_chat_partitions():
+    """List chat_messages partitions with their ranges and sizes."""
+    db = _partitioned_session()
+    try:
+        for partition in list_partitions(db):
+            size = db.scalar(text("SELECT pg_size_pretty(pg_total_relation_size(to_regclass(:name)))"),
+                             {"name": partition.name})
+            if partition.default:
+                bounds = "DEFAULT"
             else:
-                topic = Topic(**topic_data)
-                db.add(topic)
-                created += 1
-        
-        db.commit()
-        click.echo(f"✅ Created {created} topics")
-        click.echo(f"✅ Updated {updated} topics")
-        click.echo(f"ℹ️  Skipped {skipped} existing topics")
+                bounds = f"{partition.lower or 'MINVALUE'} → {partition.upper or 'MAXVALUE'}"
+            click.echo(f"{partition.name:<32}{bounds:<48}{size:>10}")
+    finally:
+        db.close()
+
+@partitions.command('ensure')
+@click.option('--ahead', default=settings.CHAT_PARTITION_MONTHS_AHEAD, show_default=True,
+              help="Future months to create partitions for")
+def ensure_chat_partitions(ahead: int):
+    """Create missing partitions for this month and the coming months."""
+    db = _partitioned_session()
+    try:
+        created = ensure_partitions(db, ahead=ahead)
+        click.echo(f"✅ Created {len(created)} partitions{': ' + ', '.join(created) if created else ''}")
+    finally:
+        db.close()
+
+@partitions.command('archive')
+@click.option('--retention-months', default=settings.CHAT_PARTITION_RETENTION_MONTHS, show_default=True,
+              help="Months of messages to keep attached")
+@click.option('--output-dir', default=str(Path(settings.ARCHIVE_DIR) / "partitions"), show_default=True,
+              type=click.Path(file_okay=False))
+@click.option('--dry-run', is_flag=True, help="Only list the partitions that would be archived")
+def archive_chat_partitions(retention_months: int, output_dir: str, dry_run: bool):
+    """Detach partitions older than the retention period, save them as gzipped CSV and drop them."""
+    db = _partitioned_session()
+    try:
+        cutoff = add_months(month_start(datetime.now(UTC).replace(tzinfo=None)), -retention_months)
+        old = archivable_partitions(list_partitions(db), cutoff)
+        if not old:
+            click.echo(f"ℹ️  No partitions end before {cutoff:%Y-%m-%d}")
+            return
+        for partition in old:
+            if dry_run:
+                click.echo(f"Would archive {partition.name} (up to {partition.upper:%Y-%m-%d})")
+                continue
+            path = archive_partition(db, partition, Path(output_dir))
+            click.echo(f"✅ Archived {partition.name} to {path}")
     finally:
         db.close()
 
 @cli.command()
 def show_stats():
     """Show system statistics."""
-    db = SessionLocal()
+    db = MaintenanceSessionLocal()
     try:
         total_users = db.query(func.count(User.id)).scalar()
         active_users = db.query(func.count(User.id)).filter(User.is_active == True).scalar()
@@ -1,29 +1,55 @@
-from typing import List, Dict, Any, Tuple
-import openai
+from typing import List, Dict, Any, Tuple, Optional, Callable, Awaitable, Union
+from dataclasses import dataclass, field
+import logging
+import time
 import uuid
 import pystache
 from datetime import datetime, UTC
 from app.core.config import settings
-from app.models import Agent, Session, ChatMessage, MessageRole, User, Topic
+from app.core import metrics, tracing
+from app.models import Agent, AgentType, Session, ChatMessage, MessageRole, User, Topic
+from app.services.ai.providers import ChatRequest, ChatCompletion, LLMProvider, get_agent_provider, get_agent_model
+from app.services.ai.answer_cache import AnswerCachePolicy, AnswerKey, answer_cache
+from app.services.ai.scheduler import llm_scheduler, estimate_tokens, Priority
+from app.services.ai.resilience import RetryPolicy, call_with_retries, get_breaker
+from app.services.ai.exceptions import LLMProviderError
+from sqlalchemy import func
 from sqlalchemy.orm import Session as DBSession
 
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class AgentSnapshot:
+    """
+    The agent fields a provider call reads, copied so the call needs no
+    database connection (committing expires the Agent instance).
+    """
+    id: str
+    name: str
+    type: Optional[AgentType]
+    ai_service: Optional[str]
+    config: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, agent: Agent) -> "AgentSnapshot":
+        return cls(
+            id=agent.id,
+            name=agent.name,
+            type=agent.type,
+            ai_service=agent.ai_service,
+            config=dict(agent.config or {})
+        )
+
 class AIService:
     """Service for handling AI agent interactions."""
     
     def __init__(self, db: DBSession):
         self.db = db
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
         self.renderer = pystache.Renderer()
 
-    def get_client(self, ai_service: str):
-        if ai_service in ["openai", "", None]:
-            # default to openai
-            return openai.OpenAI(
-                api_key=settings.OPENAI_API_KEY,
-                base_url=settings.OPENAI_BASE_URL or None
-            )
-        else:
-            raise ValueError(f"Invalid AI service: {ai_service}")
+    def get_provider(self, agent: Agent) -> LLMProvider:
+        """Get the backend selected by the agent's ai_service and config."""
+        return get_agent_provider(agent)
         
     def _prepare_template_data(self, session: Session) -> Dict[str, Any]:
         """Prepare data for template rendering."""
@@ -88,21 +114,109 @@ class AIService:
         
         return welcome_msg
     
-    async def client_send_message(self, agent: Agent, messages: List[Dict[str, Any]]) -> Tuple[str, int, float]:
-        client = self.get_client(agent.ai_service)
-        print(messages)
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            # model='gpt-3.5-turbo-0125',
-            # model='chatgpt-4o-latest',
-            # model=agent.config["model"],
+    async def client_send_message(
+        self,
+        agent: Union[Agent, AgentSnapshot],
+        messages: List[Dict[str, Any]],
+        priority: Priority = Priority.INTERACTIVE,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        cache_breakpoints: Optional[List[int]] = None
+    ) -> Tuple[str, int, float]:
+        """
+        Get the agent's reply. With on_delta the response is streamed and
+        each piece of content is passed to on_delta as it arrives.
+        cache_breakpoints mark the messages ending stable prompt prefixes.
+        """
+        provider = self.get_provider(agent)
+        config = agent.config or {}
+        policy = RetryPolicy.for_agent(config)
+        request = ChatRequest(
+            model=get_agent_model(agent, provider),
             messages=messages,
-            # temperature=agent.config.get("temperature", 0.7),
-            max_tokens=agent.config.get("max_tokens", 4096)
+            max_tokens=config.get("max_tokens", 4096),
+            temperature=config.get("temperature"),
+            timeout=policy.timeout
+        )
+        if cache_breakpoints and config.get("prompt_cache", settings.PROMPT_CACHE_ENABLED):
+            request.cache_breakpoints = cache_breakpoints
+        estimated_tokens = estimate_tokens(messages)
+        breaker = get_breaker(f"{provider.name}:{provider.base_url or 'default'}")
+
+        first_token_at = None
+
+        async def record_delta(content: str) -> None:
+            nonlocal first_token_at
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            await on_delta(content)
+
+        async def attempt():
+            # Wait for a slot within the shared provider budget
+            async with llm_scheduler.slot(provider.name, request.model, priority, estimated_tokens):
+                if on_delta is None:
+                    return await provider.complete(request)
+                return await self._stream_completion(provider, request, record_delta)
+
+        attributes = {
+            "gen_ai.system": provider.name,
+            "gen_ai.request.model": request.model,
+            "gen_ai.request.max_tokens": request.max_tokens,
+            "llm.streaming": on_delta is not None,
+            "agent.id": agent.id
+        }
+        with tracing.start_span("llm.chat", attributes) as span:
+            traceparent = tracing.current_traceparent()
+            if traceparent:
+                # Let providers and proxies that speak W3C trace context join the trace
+                request.extra_headers["traceparent"] = traceparent
+            started = time.perf_counter()
+            try:
+                completion = await call_with_retries(attempt, policy, breaker)
+            except Exception:
+                metrics.LLM_REQUEST_DURATION.observe(
+                    time.perf_counter() - started,
+                    provider=provider.name, model=request.model, outcome="error"
+                )
+                raise
+            if span:
+                span.set_attributes({
+                    "gen_ai.response.model": completion.model,
+                    "gen_ai.usage.input_tokens": completion.prompt_tokens,
+                    "gen_ai.usage.output_tokens": completion.completion_tokens,
+                    "gen_ai.usage.cache_read_input_tokens": completion.cached_tokens,
+                    "gen_ai.usage.cache_creation_input_tokens": completion.cache_write_tokens
+                })
+        elapsed = time.perf_counter() - started
+        metrics.LLM_REQUEST_DURATION.observe(
+            elapsed, provider=provider.name, model=request.model, outcome="success"
+        )
+        if on_delta is None:
+            # Without streaming the first token arrives with the full response
+            metrics.LLM_TIME_TO_FIRST_TOKEN.observe(
+                elapsed, provider=provider.name, model=request.model, streaming="false"
+            )
+        elif first_token_at is not None:
+            metrics.LLM_TIME_TO_FIRST_TOKEN.observe(
+                first_token_at - started, provider=provider.name, model=request.model, streaming="true"
+            )
+        metrics.LLM_TOKENS.inc(
+            completion.prompt_tokens, agent=agent.name, model=request.model, direction="in"
+        )
+        metrics.LLM_TOKENS.inc(
+            completion.completion_tokens, agent=agent.name, model=request.model, direction="out"
+        )
+        metrics.LLM_PROMPT_CACHE_TOKENS.inc(
+            completion.cached_tokens, agent=agent.name, model=request.model, operation="read"
+        )
+        metrics.LLM_PROMPT_CACHE_TOKENS.inc(
+            completion.cache_write_tokens, agent=agent.name, model=request.model, operation="write"
+        )
+        logger.info(
+            f"Prompt cache for agent {agent.name} ({request.model}): {completion.cached_tokens} of "
+            f"{completion.prompt_tokens} prompt tokens read, {completion.cache_write_tokens} written"
         )
 
-        message = response.choices[0].message
-        content=message.content
+        content = completion.content
         # tool_calls = message.tool_calls
         # for tool_call in tool_calls:
         #     print(
@@ -110,20 +224,85 @@ class AIService:
         #         "  function_call", tool_call.function.name, # The name of the function to call.
         #         "  arguments", tool_call.function.arguments # The arguments to pass to the function.
         #     )
-        tokens=response.usage.total_tokens
+        tokens = completion.total_tokens
+        await llm_scheduler.record_usage(provider.name, request.model, tokens - estimated_tokens)
         # if message.tool_calls and "completion_rate" in message.tool_calls:
         #     completion_rate=message.tool_calls["completion_rate"]
         # else:
         completion_rate=0.0
         return content, tokens, completion_rate
     
+    async def _stream_completion(
+        self,
+        provider: LLMProvider,
+        request: ChatRequest,
+        on_delta: Callable[[str], Awaitable[None]]
+    ) -> ChatCompletion:
+        """Stream a completion through on_delta and assemble the full result."""
+        completion = ChatCompletion(content="", model=request.model)
+        parts = []
+        try:
+            async for chunk in provider.stream(request):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    await on_delta(chunk.content)
+                if chunk.prompt_tokens is not None:
+                    completion.prompt_tokens = chunk.prompt_tokens
+                if chunk.completion_tokens is not None:
+                    completion.completion_tokens = chunk.completion_tokens
+                if chunk.cached_tokens is not None:
+                    completion.cached_tokens = chunk.cached_tokens
+                if chunk.cache_write_tokens is not None:
+                    completion.cache_write_tokens = chunk.cache_write_tokens
+        except Exception as e:
+            if not parts:
+                raise
+            # Deltas were already delivered, so the call cannot be retried transparently
+            raise LLMProviderError(f"AI response stream failed: {str(e)}") from e
+        completion.content = "".join(parts)
+        return completion
+    
+    @tracing.traced("chat.process_message")
     async def process_message(
         self,
         session: Session,
         user_message: str,
-        context_window: int = 10
+        context_window: int = 10,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> List[ChatMessage]:
-        """Process a user message and return the agent's response."""
+        """
+        Process a user message and return the agent's response.
+        With on_delta the response is streamed to it while it is generated.
+
+        The turn runs in three phases so no database connection is held while
+        the provider works: a short transaction stores the user message and
+        reads the context, the completion runs without a connection, and a
+        second short transaction stores the reply and session metrics. If the
+        completion fails, the user message is removed again.
+        """
+        # Get recent context
+        with tracing.start_span("db.history_query", {"chat.context_window": context_window}):
+            system_messages = (
+                self.db.query(ChatMessage)
+                .filter(ChatMessage.session_id == session.id, ChatMessage.role == MessageRole.SYSTEM)
+                .order_by(ChatMessage.created_at)
+                .all()
+            )
+            history, history_count = self._history_window(session.id, context_window)
+        
+        messages, cache_breakpoints = self._build_messages(
+            session, system_messages, history, history_count, user_message
+        )
+        agent = AgentSnapshot.of(session.agent)
+        answer_key = None
+        # Both templates shape the reply: the welcome message is part of the history
+        templates = [session.agent.system_prompt, session.agent.welcome_message]
+        cache_policy = AnswerCachePolicy.for_agent(agent.config, templates)
+        if cache_policy:
+            questions = [msg.content for msg in history if msg.role == MessageRole.USER]
+            previous = questions[-cache_policy.context_turns:] if cache_policy.context_turns > 0 else []
+            answer_key = AnswerKey.for_question(agent.id, session.topic_id, user_message, previous, templates)
+        
         # Create user message
         user_msg = ChatMessage(
             id=str(uuid.uuid4()),
@@ -132,35 +311,30 @@ class AIService:
             content=user_message
         )
         self.db.add(user_msg)
+        # Ends the transaction and returns the connection to the pool
+        with tracing.start_span("db.commit"):
+            self.db.commit()
         
-        # Get recent context
-        recent_messages = (
-            self.db.query(ChatMessage)
-            .filter(ChatMessage.session_id == session.id)
-            .order_by(ChatMessage.created_at.desc())
-            .limit(context_window)
-            .all()
-        )
-        
-        # Prepare messages for API
-        messages = [
-            {"role": msg.role, "content": msg.content}
-            for msg in reversed(recent_messages)
-        ]
-
-        # Add reminder message if it exists
-        if len(messages) > 20 and session.agent.reminder_message:
-            user_message = f"""Things to Keep in mind for you: {session.agent.reminder_message}
-            ---
-            My message below:
-
-            {user_message}
-            """
-        
-        messages.append({"role": "user", "content": user_message})
-        
-        # Get agent response
-        content, tokens, completion_rate = await self.client_send_message(session.agent, messages)
+        # Get agent response, from the answer cache if the agent opted in
+        try:
+            cached, embedding = (None, None)
+            if answer_key:
+                cached, embedding = await answer_cache.get(answer_key, cache_policy, agent.name)
+            if cached is not None:
+                content, tokens, completion_rate = cached, 0, 0.0
+                if on_delta:
+                    await on_delta(content)
+            else:
+                content, tokens, completion_rate = await self.client_send_message(
+                    agent, messages, on_delta=on_delta, cache_breakpoints=cache_breakpoints
+                )
+                if answer_key:
+                    answer_cache.put(answer_key, content, cache_policy, embedding)
+        except BaseException:
+            # Also on cancellation, so an abandoned turn leaves no unanswered message
+            self.db.delete(user_msg)
+            self.db.commit()
+            raise
         
         # Create response message
         assistant_msg = ChatMessage(
@@ -178,9 +352,67 @@ class AIService:
         # Update interaction data
         self._update_interaction_data(session, tokens)
         
-        self.db.commit()
+        with tracing.start_span("db.commit"):
+            self.db.commit()
         return [user_msg, assistant_msg]
     
+    def _history_window(self, session_id: str, context_window: int) -> Tuple[List[ChatMessage], int]:
+        """
+        At least the last context_window conversation messages, oldest first,
+        and the number of messages in the session. The window starts at a
+        multiple of PROMPT_CACHE_HISTORY_CHUNK, so its start (and with it the
+        prompt prefix) only moves once every chunk messages instead of every turn.
+        """
+        chunk = max(settings.PROMPT_CACHE_HISTORY_CHUNK, 1)
+        rows = (
+            self.db.query(ChatMessage, func.count().over().label("total"))
+            .filter(ChatMessage.session_id == session_id, ChatMessage.role != MessageRole.SYSTEM)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(context_window + chunk - 1)
+            .all()
+        )
+        if not rows:
+            return [], 0
+        count = rows[0].total
+        start = max(count - context_window, 0) // chunk * chunk
+        # rows[i] is message number count - 1 - i
+        return [row.ChatMessage for row in reversed(rows[:count - start])], count
+
+    @tracing.traced("chat.prompt_assembly")
+    def _build_messages(
+        self,
+        session: Session,
+        system_messages: List[ChatMessage],
+        history: List[ChatMessage],
+        history_count: int,
+        user_message: str
+    ) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Build the provider messages and their cache breakpoints. The layout
+        keeps the prompt prefix byte-identical between turns: the system
+        prompt (with the topic material rendered into it) first, then the
+        history window, and last the parts that change every turn, the
+        reminder and the new user message.
+        """
+        messages = [{"role": msg.role, "content": msg.content} for msg in system_messages]
+        cache_breakpoints = [len(messages) - 1] if messages else []
+        messages.extend({"role": msg.role, "content": msg.content} for msg in history)
+        if history:
+            # Cached now, read back by the following turns of the same window
+            cache_breakpoints.append(len(messages) - 1)
+
+        # Add reminder message if it exists
+        if history_count > 20 and session.agent.reminder_message:
+            user_message = f"""Things to Keep in mind for you: {session.agent.reminder_message}
+            ---
+            My message below:
+
+            {user_message}
+            """
+        
+        messages.append({"role": "user", "content": user_message})
+        return messages, cache_breakpoints
+    
     def _update_session_metrics(
         self,
         session: Session,
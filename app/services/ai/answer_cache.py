@@ -0,0 +1,296 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import asyncio
+import hashlib
+import logging
+import math
+import operator
+import re
+import time
+from app.core import metrics
+from app.core.config import settings
+from app.services.ai.providers import get_provider
+from app.services.ai.resilience import RetryPolicy, call_with_retries, get_breaker
+from app.services.ai.scheduler import Priority, estimate_tokens, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# Mustache tags rendering user or session fields, e.g. {{user.full_name}} or {{#session}}
+_PERSONAL_TAG = re.compile(r"\{\{[{&#^]?\s*(user|session)\b")
+
+def normalize_question(text: str) -> str:
+    """Lowercase and drop punctuation and extra whitespace, so trivial variations match."""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+def is_personalized(template: Optional[str]) -> bool:
+    """Whether a prompt template renders fields of the student or their session."""
+    return bool(template) and _PERSONAL_TAG.search(template) is not None
+
+class AnswerCachePolicy:
+    """
+    Answer cache settings of one agent, from agent.config["response_cache"]:
+    true for the defaults, or a dict with ttl, similarity (a cosine threshold
+    that enables matching by question embeddings), embedding_model and
+    context_turns (earlier questions of the student that are part of the key).
+    Agents whose prompt templates render user or session fields never share
+    answers, since their replies may address one student.
+    """
+
+    def __init__(
+        self,
+        ttl: float = settings.ANSWER_CACHE_TTL_SECONDS,
+        similarity: Optional[float] = None,
+        embedding_model: Optional[str] = None,
+        context_turns: int = 1
+    ):
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embedding_model = embedding_model
+        self.context_turns = context_turns
+
+    @classmethod
+    def for_agent(
+        cls,
+        config: Optional[Dict[str, Any]],
+        templates: Sequence[Optional[str]] = ()
+    ) -> Optional["AnswerCachePolicy"]:
+        """The agent's policy, or None unless it opted in and its templates are not personalized."""
+        option = (config or {}).get("response_cache")
+        if not option or any(is_personalized(template) for template in templates):
+            return None
+        if not isinstance(option, dict):
+            return cls()
+        similarity = option.get("similarity")
+        return cls(
+            ttl=float(option.get("ttl", settings.ANSWER_CACHE_TTL_SECONDS)),
+            similarity=float(similarity) if similarity is not None else None,
+            embedding_model=option.get("embedding_model"),
+            context_turns=int(option.get("context_turns", 1))
+        )
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """
+    Identifies a question: the agent and topic, the question and hashes of
+    the agent's prompt templates and of the question's context.
+    """
+
+    agent_id: str
+    topic_id: str
+    question: str
+    prompt: str
+    context: str
+
+    @classmethod
+    def for_question(
+        cls,
+        agent_id: str,
+        topic_id: str,
+        question: str,
+        previous_questions: Sequence[str],
+        templates: Sequence[Optional[str]]
+    ) -> "AnswerKey":
+        # The templates rather than the rendered prompts, so students share answers;
+        # editing a template starts over. Of the history, only the student's own
+        # questions: replies may be personalized
+        prompt = "\x1f".join(template or "" for template in templates)
+        context = "\x1f".join(normalize_question(q) for q in previous_questions)
+        return cls(
+            agent_id=agent_id,
+            topic_id=topic_id,
+            question=normalize_question(question),
+            prompt=hashlib.sha256(prompt.encode()).hexdigest()[:16],
+            context=hashlib.sha256(context.encode()).hexdigest()[:16]
+        )
+
+    @property
+    def scope(self) -> Tuple[str, str, str, str]:
+        """Answers within one scope are compared by similarity."""
+        return self.agent_id, self.topic_id, self.prompt, self.context
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256("\x1f".join([*self.scope, self.question]).encode()).hexdigest()
+
+@dataclass
+class CachedAnswer:
+    key: AnswerKey
+    content: str
+    expires_at: float
+    embedding: Optional[List[float]] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.content.encode()) + len(self.key.question) + 8 * len(self.embedding or ())
+
+def _unit(vector: List[float]) -> Optional[List[float]]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else None
+
+def _best_match(
+    embedding: List[float],
+    candidates: List[Tuple[str, List[float]]],
+    threshold: float
+) -> Optional[str]:
+    """Digest of the most similar candidate at or above threshold (vectors are unit length)."""
+    best, best_score = None, threshold
+    for digest, candidate in candidates:
+        score = sum(map(operator.mul, embedding, candidate))
+        if score >= best_score:
+            best, best_score = digest, score
+    return best
+
+class AnswerCache:
+    """
+    Per-worker cache of agent answers, so students asking the same question
+    in the same topic and context share one provider call. Exact matches
+    are found by the normalized question; agents with a similarity threshold
+    also match paraphrases by the cosine similarity of question embeddings.
+    Entries expire after their policy's TTL, and the least recently used
+    ones are evicted beyond max_entries or max_bytes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.ANSWER_CACHE_MAX_BYTES,
+        max_candidates: int = settings.ANSWER_CACHE_MAX_CANDIDATES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_candidates = max_candidates
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        # Digests of each scope's answers with embeddings, oldest first
+        self._scopes: Dict[Tuple[str, str, str, str], Dict[str, None]] = {}
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    async def embed(self, question: str, policy: AnswerCachePolicy) -> Optional[List[float]]:
+        """Unit-length embedding of a normalized question, or None if it cannot be computed in time."""
+        model = policy.embedding_model or settings.OPENAI_EMBEDDING_MODEL
+        wait = settings.ANSWER_CACHE_EMBEDDING_WAIT_SECONDS
+        try:
+            provider = get_provider("openai")
+            breaker = get_breaker(f"{provider.name}:{provider.base_url or 'default'}")
+
+            async def attempt() -> List[List[float]]:
+                # A lookup only saves a call, so it queues behind replies and gives up quickly
+                async with llm_scheduler.slot(
+                    provider.name,
+                    model,
+                    Priority.BACKGROUND,
+                    estimate_tokens([{"content": question}]),
+                    timeout=wait
+                ):
+                    return await asyncio.wait_for(provider.embed([question], model), wait)
+
+            vectors = await call_with_retries(attempt, RetryPolicy(timeout=wait, max_retries=0), breaker)
+        except Exception as e:
+            logger.warning(f"Question embedding failed, answer cache lookup is exact only: {str(e)}")
+            return None
+        return _unit(vectors[0]) if vectors else None
+
+    async def get(
+        self,
+        key: AnswerKey,
+        policy: AnswerCachePolicy,
+        agent_name: str
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        The cached answer for key, or None, and the question's embedding when
+        the policy compares by similarity (pass it on to put).
+        """
+        entry = self._live(key.digest)
+        if entry is not None:
+            metrics.ANSWER_CACHE_LOOKUPS.inc(agent=agent_name, outcome="hit")
+            return entry.content, entry.embedding
+
+        embedding = None
+        if policy.similarity is not None:
+            embedding = await self.embed(key.question, policy)
+        if embedding is not None:
+            candidates = [
+                (digest, self._entries[digest].embedding)
+                for digest in list(self._scopes.get(key.scope, ()))[-self.max_candidates:]
+            ]
+            # Keep the event loop free while comparing against many vectors
+            digest = await asyncio.to_thread(_best_match, embedding, candidates, policy.similarity)
+            entry = self._live(digest) if digest else None
+            if entry is not None:
+                metrics.ANSWER_CACHE_LOOKUPS.inc(agent=agent_name, outcome="similar")
+                return entry.content, embedding
+
+        metrics.ANSWER_CACHE_LOOKUPS.inc(agent=agent_name, outcome="miss")
+        return None, embedding
+
+    def put(
+        self,
+        key: AnswerKey,
+        content: str,
+        policy: AnswerCachePolicy,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """Cache an answer, evicting expired and then least recently used answers beyond the bounds."""
+        if not content:
+            return
+        entry = CachedAnswer(key, content, time.monotonic() + policy.ttl, embedding)
+        if entry.size > self.max_bytes:
+            return
+        self._remove(key.digest)
+        self._entries[key.digest] = entry
+        self._bytes += entry.size
+        if embedding is not None:
+            self._scopes.setdefault(key.scope, {})[key.digest] = None
+
+        if len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            now = time.monotonic()
+            for digest in [d for d, e in self._entries.items() if e.expires_at <= now]:
+                self._remove(digest)
+                metrics.ANSWER_CACHE_EVICTIONS.inc(reason="expired")
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            metrics.ANSWER_CACHE_EVICTIONS.inc(reason="lru")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._scopes.clear()
+        self._bytes = 0
+
+    def _live(self, digest: str) -> Optional[CachedAnswer]:
+        """The entry under digest unless it expired; marks it recently used."""
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(digest)
+            metrics.ANSWER_CACHE_EVICTIONS.inc(reason="expired")
+            return None
+        self._entries.move_to_end(digest)
+        return entry
+
+    def _remove(self, digest: str) -> None:
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        scope = self._scopes.get(entry.key.scope)
+        if scope is not None:
+            scope.pop(digest, None)
+            if not scope:
+                del self._scopes[entry.key.scope]
+
+answer_cache = AnswerCache()
+
+def _collect_metrics() -> None:
+    metrics.ANSWER_CACHE_ENTRIES.set(len(answer_cache))
+    metrics.ANSWER_CACHE_BYTES.set(answer_cache.size)
+
+metrics.registry.on_collect(_collect_metrics)
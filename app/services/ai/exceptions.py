@@ -0,0 +1,54 @@
+from typing import Optional
+
+class LLMServiceError(Exception):
+    """Base error for provider calls that should surface as a fast HTTP error."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Optional[dict]:
+        """Response headers telling the client when to retry."""
+        if self.retry_after is None:
+            return None
+        return {"Retry-After": str(max(1, int(round(self.retry_after))))}
+
+class LLMOverloadedError(LLMServiceError):
+    """Raised when the scheduler queue is full."""
+
+    status_code = 429
+
+class LLMQueueTimeoutError(LLMServiceError):
+    """Raised when a call cannot be scheduled before its queue deadline."""
+
+    status_code = 503
+
+class LLMUnavailableError(LLMServiceError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+    status_code = 503
+
+class LLMRateLimitedError(LLMServiceError):
+    """Raised when the provider asks for a longer pause than the retry policy allows."""
+
+    status_code = 503
+
+class LLMProviderError(LLMServiceError):
+    """Raised when the provider keeps failing after all retries."""
+
+    status_code = 502
+
+class LLMStreamError(LLMProviderError):
+    """Raised when a provider reports an error event in the middle of a stream."""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message, retry_after=retry_after)
+        self.retryable = retryable
+
+class LLMTimeoutError(LLMServiceError):
+    """Raised when the provider keeps timing out after all retries."""
+
+    status_code = 504
@@ -0,0 +1,24 @@
+from app.services.ai.providers.base import ChatChunk, ChatCompletion, ChatRequest, LLMProvider
+from app.services.ai.providers.registry import (
+    register_provider,
+    resolve_provider_name,
+    get_provider,
+    get_agent_provider,
+    get_agent_model,
+    close_providers,
+    clear_providers,
+)
+
+__all__ = [
+    "ChatChunk",
+    "ChatCompletion",
+    "ChatRequest",
+    "LLMProvider",
+    "register_provider",
+    "resolve_provider_name",
+    "get_provider",
+    "get_agent_provider",
+    "get_agent_model",
+    "close_providers",
+    "clear_providers",
+]
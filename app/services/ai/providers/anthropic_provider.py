@@ -0,0 +1,127 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import json
+from app.core.config import settings
+from app.services.ai.exceptions import LLMStreamError
+from app.services.ai.providers.base import ChatChunk, ChatCompletion, ChatRequest, LLMProvider
+
+ANTHROPIC_VERSION = "2023-06-01"
+# The Messages API accepts at most this many cache_control blocks per request
+MAX_CACHE_BREAKPOINTS = 4
+CACHE_CONTROL = {"type": "ephemeral"}
+# Stream error types that are worth retrying
+RETRYABLE_STREAM_ERRORS = {"overloaded_error", "api_error", "rate_limit_error"}
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic Messages API."""
+
+    name = "anthropic"
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str]):
+        super().__init__(api_key, base_url or settings.ANTHROPIC_BASE_URL)
+        self.default_model = settings.ANTHROPIC_MODEL
+        self.client = self._http_client()
+
+    @staticmethod
+    def _split_system(
+        messages: List[Dict[str, Any]],
+        cache_breakpoints: Sequence[int] = ()
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Move system messages into the separate system parameter, marking the
+        messages at cache_breakpoints with cache_control.
+        """
+        cached = set(sorted(cache_breakpoints)[-MAX_CACHE_BREAKPOINTS:])
+        system, chat = [], []
+        for index, m in enumerate(messages):
+            if m["role"] == "system":
+                block = {"type": "text", "text": m["content"]}
+                if index in cached:
+                    block["cache_control"] = CACHE_CONTROL
+                system.append(block)
+            elif index in cached:
+                content = [{"type": "text", "text": m["content"], "cache_control": CACHE_CONTROL}]
+                chat.append({"role": m["role"], "content": content})
+            else:
+                chat.append({"role": m["role"], "content": m["content"]})
+        return system, chat
+
+    @staticmethod
+    def _usage(usage: Dict[str, Any]) -> Dict[str, int]:
+        """Token counts; input_tokens leaves out tokens read from or written to the cache."""
+        cached = usage.get("cache_read_input_tokens") or 0
+        written = usage.get("cache_creation_input_tokens") or 0
+        return {
+            "prompt_tokens": usage.get("input_tokens", 0) + cached + written,
+            "cached_tokens": cached,
+            "cache_write_tokens": written
+        }
+
+    def _payload(self, request: ChatRequest) -> Dict[str, Any]:
+        system, messages = self._split_system(request.messages, request.cache_breakpoints)
+        payload = {
+            "model": request.model,
+            "messages": messages,
+            "max_tokens": request.max_tokens,
+        }
+        if system:
+            payload["system"] = system
+        if request.temperature is not None:
+            payload["temperature"] = request.temperature
+        return payload
+
+    def _headers(self, request: ChatRequest) -> Dict[str, str]:
+        return {
+            "x-api-key": self.api_key or "",
+            "anthropic-version": ANTHROPIC_VERSION,
+            **request.extra_headers
+        }
+
+    async def complete(self, request: ChatRequest) -> ChatCompletion:
+        response = await self.client.post(
+            f"{self.base_url.rstrip('/')}/v1/messages",
+            json=self._payload(request),
+            headers=self._headers(request),
+            timeout=request.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage", {})
+        return ChatCompletion(
+            content="".join(b.get("text", "") for b in data.get("content", []) if b.get("type") == "text"),
+            model=request.model,
+            completion_tokens=usage.get("output_tokens", 0),
+            **self._usage(usage)
+        )
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[ChatChunk]:
+        prompt_usage = self._usage({})
+        async with self.client.stream(
+            "POST",
+            f"{self.base_url.rstrip('/')}/v1/messages",
+            json={**self._payload(request), "stream": True},
+            headers=self._headers(request),
+            timeout=request.timeout
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event["type"] == "message_start":
+                    prompt_usage = self._usage(event["message"].get("usage", {}))
+                elif event["type"] == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    yield ChatChunk(content=event["delta"]["text"])
+                elif event["type"] == "error":
+                    error = event.get("error", {})
+                    raise LLMStreamError(
+                        f"Anthropic stream failed: {error.get('type')}: {error.get('message')}",
+                        retryable=error.get("type") in RETRYABLE_STREAM_ERRORS
+                    )
+                elif event["type"] == "message_delta":
+                    yield ChatChunk(
+                        completion_tokens=event.get("usage", {}).get("output_tokens", 0),
+                        **prompt_usage
+                    )
+
+    async def close(self) -> None:
+        await self.client.aclose()
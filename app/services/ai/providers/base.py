@@ -0,0 +1,79 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+from dataclasses import dataclass, field
+import httpx
+from app.core.config import settings
+
+@dataclass
+class ChatRequest:
+    """Provider-independent chat completion request."""
+
+    model: str
+    messages: List[Dict[str, Any]]
+    max_tokens: int = 4096
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None
+    extra_headers: Dict[str, str] = field(default_factory=dict)
+    # Indexes of messages ending a prompt prefix worth caching, for providers that take hints
+    cache_breakpoints: List[int] = field(default_factory=list)
+
+@dataclass
+class ChatCompletion:
+    """Provider-independent chat completion result."""
+
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Parts of prompt_tokens read from and written to the provider's prompt cache
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+@dataclass
+class ChatChunk:
+    """A streamed piece of a completion; usage is set on the final chunk when known."""
+
+    content: str = ""
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    cache_write_tokens: Optional[int] = None
+
+class LLMProvider:
+    """Abstract base class for LLM backends."""
+
+    name = ""
+    default_model: Optional[str] = None
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str]):
+        self.api_key = api_key
+        self.base_url = base_url
+
+    @staticmethod
+    def _http_client() -> httpx.AsyncClient:
+        """Connection pool owned by one provider instance."""
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=settings.LLM_TIMEOUT_SECONDS
+        )
+
+    async def complete(self, request: ChatRequest) -> ChatCompletion:
+        """Run a chat completion and return the whole response."""
+        raise NotImplementedError
+
+    def stream(self, request: ChatRequest) -> AsyncIterator[ChatChunk]:
+        """Run a chat completion and yield content as it is generated."""
+        raise NotImplementedError
+
+    async def embed(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """Embedding vectors of texts, for backends that offer embeddings."""
+        raise NotImplementedError(f"{self.name} does not provide embeddings")
+
+    async def close(self) -> None:
+        """Close the provider's connection pool."""
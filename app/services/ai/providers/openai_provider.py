@@ -0,0 +1,78 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+import openai
+from app.core.config import settings
+from app.services.ai.providers.base import ChatChunk, ChatCompletion, ChatRequest, LLMProvider
+
+def _cached_tokens(usage: Any) -> int:
+    """Prompt tokens served from OpenAI's automatic prompt cache, 0 when not reported."""
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    return cached if isinstance(cached, int) else 0
+
+class OpenAIProvider(LLMProvider):
+    """
+    OpenAI and OpenAI-compatible chat completion APIs. OpenAI caches long
+    prompt prefixes automatically, so cache_breakpoints are not sent.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str]):
+        super().__init__(api_key, base_url)
+        self.default_model = settings.OPENAI_MODEL
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            max_retries=0,  # Retries are handled by call_with_retries
+            http_client=self._http_client()
+        )
+
+    def _params(self, request: ChatRequest) -> Dict[str, Any]:
+        params = {
+            "model": request.model,
+            "messages": request.messages,
+            "max_tokens": request.max_tokens,
+        }
+        if request.temperature is not None:
+            params["temperature"] = request.temperature
+        if request.timeout is not None:
+            params["timeout"] = request.timeout
+        if request.extra_headers:
+            params["extra_headers"] = request.extra_headers
+        return params
+
+    async def complete(self, request: ChatRequest) -> ChatCompletion:
+        response = await self.client.chat.completions.create(**self._params(request))
+        usage = response.usage
+        return ChatCompletion(
+            content=response.choices[0].message.content or "",
+            model=request.model,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=_cached_tokens(usage)
+        )
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[ChatChunk]:
+        response = await self.client.chat.completions.create(
+            **self._params(request),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield ChatChunk(content=chunk.choices[0].delta.content)
+            if chunk.usage:
+                yield ChatChunk(
+                    prompt_tokens=chunk.usage.prompt_tokens,
+                    completion_tokens=chunk.usage.completion_tokens,
+                    cached_tokens=_cached_tokens(chunk.usage)
+                )
+
+    async def embed(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        response = await self.client.embeddings.create(
+            model=model or settings.OPENAI_EMBEDDING_MODEL,
+            input=texts
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def close(self) -> None:
+        await self.client.close()
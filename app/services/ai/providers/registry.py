@@ -0,0 +1,89 @@
+from typing import Callable, Dict, Optional, Tuple, Type
+from app.core.config import settings
+from app.models import Agent, AgentType
+from app.services.ai.providers.base import LLMProvider
+from app.services.ai.providers.openai_provider import OpenAIProvider
+from app.services.ai.providers.anthropic_provider import AnthropicProvider
+
+_registry: Dict[str, Tuple[Type[LLMProvider], Callable[[], Optional[str]], Callable[[], Optional[str]]]] = {}
+_instances: Dict[Tuple[str, Optional[str]], LLMProvider] = {}
+
+# Agent.ai_service aliases and the default backend for each AgentType
+ALIASES = {"": "openai", "chatgpt": "openai", "claude": "anthropic", "custom": "openai"}
+TYPE_DEFAULTS = {
+    AgentType.CHATGPT: "openai",
+    AgentType.CLAUDE: "anthropic",
+    AgentType.CUSTOM: "openai",
+}
+
+def register_provider(
+    name: str,
+    provider_class: Type[LLMProvider],
+    api_key: Callable[[], Optional[str]] = lambda: None,
+    base_url: Callable[[], Optional[str]] = lambda: None
+) -> None:
+    """Register a backend under a name usable in Agent.ai_service."""
+    _registry[name] = (provider_class, api_key, base_url)
+
+register_provider(
+    "openai",
+    OpenAIProvider,
+    api_key=lambda: settings.OPENAI_API_KEY,
+    base_url=lambda: settings.OPENAI_BASE_URL
+)
+register_provider(
+    "anthropic",
+    AnthropicProvider,
+    api_key=lambda: settings.ANTHROPIC_API_KEY,
+    base_url=lambda: settings.ANTHROPIC_BASE_URL
+)
+
+def resolve_provider_name(agent: Agent) -> str:
+    """Pick the backend from Agent.ai_service, falling back to the agent type."""
+    name = (agent.ai_service or "").lower()
+    if not name and agent.type in TYPE_DEFAULTS:
+        return TYPE_DEFAULTS[agent.type]
+    name = ALIASES.get(name, name)
+    if name not in _registry:
+        raise ValueError(f"Invalid AI service: {agent.ai_service}")
+    return name
+
+def get_provider(name: str, base_url: Optional[str] = None) -> LLMProvider:
+    """
+    Get the shared provider instance for a backend and endpoint.
+    Each instance owns its own connection pool.
+    """
+    if name not in _registry:
+        raise ValueError(f"Invalid AI service: {name}")
+    provider_class, api_key, default_base_url = _registry[name]
+    if base_url and base_url != default_base_url():
+        if base_url not in settings.LLM_ENDPOINT_API_KEYS:
+            raise ValueError(f"No API key configured for endpoint {base_url}")
+        api_key = lambda: settings.LLM_ENDPOINT_API_KEYS[base_url]
+    base_url = base_url or default_base_url()
+    key = (name, base_url)
+    if key not in _instances:
+        _instances[key] = provider_class(api_key=api_key(), base_url=base_url)
+    return _instances[key]
+
+def get_agent_provider(agent: Agent) -> LLMProvider:
+    """
+    Get the provider for an agent; agent.config["base_url"] selects a custom
+    endpoint, which needs its own key in LLM_ENDPOINT_API_KEYS.
+    """
+    return get_provider(resolve_provider_name(agent), (agent.config or {}).get("base_url"))
+
+def get_agent_model(agent: Agent, provider: LLMProvider) -> Optional[str]:
+    """Model from agent.config, or the provider's configured default."""
+    return (agent.config or {}).get("model") or provider.default_model
+
+async def close_providers() -> None:
+    """Close every provider connection pool."""
+    instances = list(_instances.values())
+    _instances.clear()
+    for provider in instances:
+        await provider.close()
+
+def clear_providers() -> None:
+    """Forget provider instances without closing them (used by tests)."""
+    _instances.clear()
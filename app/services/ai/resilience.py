@@ -0,0 +1,226 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+import asyncio
+import enum
+import logging
+import random
+import time
+import httpx
+import openai
+from app.core.config import settings
+from app.core import metrics
+from app.services.ai.exceptions import (
+    LLMProviderError, LLMRateLimitedError, LLMStreamError, LLMTimeoutError, LLMUnavailableError
+)
+
+logger = logging.getLogger(__name__)
+
+# 529 is Anthropic's "overloaded"
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class CircuitState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated provider failures.
+    Opens after failure_threshold consecutive failures, lets one probe through
+    after reset_timeout, and closes again once a probe succeeds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = settings.LLM_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = settings.LLM_BREAKER_RESET_SECONDS
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """Raise LLMUnavailableError instead of calling an unhealthy provider."""
+        if self.state == CircuitState.OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise LLMUnavailableError(
+                    "AI service is temporarily unavailable, please retry shortly",
+                    retry_after=remaining
+                )
+            self.state = CircuitState.HALF_OPEN
+        if self.state == CircuitState.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise LLMUnavailableError(
+                    "AI service is recovering, please retry shortly",
+                    retry_after=1
+                )
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(f"Circuit breaker {self.name} opened after {self.failures} failures")
+                self.times_opened += 1
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_ignored(self) -> None:
+        """Finish a call whose error says nothing about provider health."""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected
+        }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the circuit breaker for a provider endpoint, creating it on first use."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+def breaker_snapshots() -> Dict[str, Dict[str, Any]]:
+    """State of every circuit breaker in this worker."""
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+def _collect_metrics() -> None:
+    for name, breaker in _breakers.items():
+        metrics.LLM_CIRCUIT_OPEN.set(int(breaker.state != CircuitState.CLOSED), breaker=name)
+
+metrics.registry.on_collect(_collect_metrics)
+
+class RetryPolicy:
+    """Timeout and retry settings for provider calls."""
+
+    def __init__(
+        self,
+        timeout: float = settings.LLM_TIMEOUT_SECONDS,
+        max_retries: int = settings.LLM_MAX_RETRIES,
+        base_delay: float = settings.LLM_RETRY_BASE_DELAY_SECONDS,
+        max_delay: float = settings.LLM_RETRY_MAX_DELAY_SECONDS
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def for_agent(cls, config: Optional[Dict[str, Any]]) -> "RetryPolicy":
+        """Build a policy from agent.config, falling back to settings."""
+        config = config or {}
+        return cls(
+            timeout=float(config.get("timeout", settings.LLM_TIMEOUT_SECONDS)),
+            max_retries=int(config.get("max_retries", settings.LLM_MAX_RETRIES))
+        )
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before the given retry: full-jitter exponential, or Retry-After if longer."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+def is_timeout(exc: BaseException) -> bool:
+    return isinstance(exc, (openai.APITimeoutError, httpx.TimeoutException, asyncio.TimeoutError))
+
+def is_retryable(exc: BaseException) -> bool:
+    """Timeouts, connection errors, 429s and 5xx responses are worth retrying."""
+    if is_timeout(exc) or isinstance(exc, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(exc, LLMStreamError):
+        return exc.retryable
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """Read Retry-After (seconds or HTTP date) from a provider error response."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+async def call_with_retries(
+    func: Callable[[], Awaitable[Any]],
+    policy: RetryPolicy,
+    breaker: CircuitBreaker
+) -> Any:
+    """Call func with retries on retryable errors, guarded by the circuit breaker."""
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await func()
+        except Exception as e:
+            if not is_retryable(e):
+                breaker.record_ignored()
+                raise
+            breaker.record_failure()
+            retry_after = get_retry_after(e)
+            if attempt >= policy.max_retries:
+                error_class = LLMTimeoutError if is_timeout(e) else LLMProviderError
+                raise error_class(
+                    f"AI service failed after {attempt + 1} attempts: {str(e)}",
+                    retry_after=retry_after
+                ) from e
+            if retry_after is not None and retry_after > policy.max_delay:
+                # Waiting would hold the turn lock and scheduler slot; let the client retry later
+                raise LLMRateLimitedError(
+                    f"AI service asked to retry in {retry_after:.0f}s: {str(e)}",
+                    retry_after=retry_after
+                ) from e
+            delay = policy.backoff(attempt, retry_after)
+            logger.warning(
+                f"Provider call to {breaker.name} failed ({str(e)}), "
+                f"retrying in {delay:.2f}s (attempt {attempt + 1}/{policy.max_retries})"
+            )
+            attempt += 1
+            await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled, e.g. the client went away: release a half-open probe
+            breaker.record_ignored()
+            raise
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,224 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
+import asyncio
+import enum
+import heapq
+import itertools
+from app.core.config import settings
+from app.core import metrics
+from app.core.store import KeyValueStore, get_store
+from app.services.ai.exceptions import LLMOverloadedError, LLMQueueTimeoutError
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0  # A learner is waiting on the reply
+    BACKGROUND = 1  # Optional work such as answer cache embeddings
+
+class _Waiter:
+    """A call waiting in the queue, ordered by priority then arrival."""
+
+    def __init__(self, priority: Priority, seq: int):
+        self.priority = priority
+        self.seq = seq
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class _WaitStats:
+    """Queue wait statistics for one priority."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "average_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max
+        }
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough prompt token estimate (about four characters per token)."""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 1
+
+class LLMScheduler:
+    """
+    Admits provider calls in priority order.
+    Each worker bounds its own queue and in-flight calls; requests/min and
+    tokens/min budgets per provider and model are token buckets in the shared
+    store, so all workers draw from the same budget.
+    """
+
+    def __init__(
+        self,
+        store: KeyValueStore,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        max_queue_size: int = settings.LLM_QUEUE_MAX_SIZE,
+        queue_timeout: float = settings.LLM_QUEUE_TIMEOUT_SECONDS,
+        requests_per_minute: int = settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = settings.LLM_TOKENS_PER_MINUTE,
+        rate_limits: Optional[Dict[str, Dict[str, int]]] = None
+    ):
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.rate_limits = settings.LLM_RATE_LIMITS if rate_limits is None else rate_limits
+        self.active = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._listeners: List[asyncio.Future] = []
+        self.wait_stats = {p: _WaitStats() for p in Priority}
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _limits(self, provider: str, model: str) -> Tuple[int, int]:
+        override = self.rate_limits.get(f"{provider}:{model}", {})
+        return (
+            override.get("rpm", self.requests_per_minute),
+            override.get("tpm", self.tokens_per_minute)
+        )
+
+    async def _take(self, key: str, cost: float, per_minute: int, force: bool = False) -> float:
+        if per_minute <= 0:
+            return 0.0
+        return await self.store.take_tokens(
+            f"llm-budget:{key}",
+            min(cost, per_minute),
+            capacity=per_minute,
+            refill_per_second=per_minute / 60,
+            force=force
+        )
+
+    async def _take_budget(self, provider: str, model: str, tokens: int) -> float:
+        """Take one request and the estimated tokens; returns seconds to wait if denied."""
+        rpm, tpm = self._limits(provider, model)
+        wait = await self._take(f"{provider}:{model}:requests", 1, rpm)
+        if wait:
+            return wait
+        wait = await self._take(f"{provider}:{model}:tokens", tokens, tpm)
+        if wait:
+            # Give the request back so it is not lost while we wait for tokens
+            await self._take(f"{provider}:{model}:requests", -1, rpm, force=True)
+        return wait
+
+    async def record_usage(self, provider: str, model: str, extra_tokens: int) -> None:
+        """Charge tokens used beyond the estimate taken at admission."""
+        _, tpm = self._limits(provider, model)
+        if extra_tokens > 0:
+            await self._take(f"{provider}:{model}:tokens", extra_tokens, tpm, force=True)
+
+    def _notify(self) -> None:
+        listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            if not listener.done():
+                listener.set_result(None)
+
+    async def _wait_for_change(self, timeout: float) -> None:
+        listener = asyncio.get_running_loop().create_future()
+        self._listeners.append(listener)
+        try:
+            await asyncio.wait_for(listener, timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def acquire(
+        self,
+        provider: str,
+        model: str,
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 0,
+        timeout: Optional[float] = None
+    ) -> None:
+        """Wait for a concurrency slot and rate budget, in priority order."""
+        if len(self._queue) >= self.max_queue_size:
+            self.rejected += 1
+            raise LLMOverloadedError("Too many AI requests queued, please retry shortly", retry_after=1)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + (self.queue_timeout if timeout is None else timeout)
+        waiter = _Waiter(priority, next(self._seq))
+        heapq.heappush(self._queue, waiter)
+        try:
+            while True:
+                wait = None
+                # Only the head of the queue draws from the budget, so lower
+                # priorities cannot take tokens ahead of interactive calls
+                if self._queue[0] is waiter and self.active < self.max_concurrency:
+                    wait = await self._take_budget(provider, model, tokens)
+                    if not wait:
+                        heapq.heappop(self._queue)
+                        self.active += 1
+                        self.wait_stats[priority].observe(loop.time() - started)
+                        self._notify()
+                        return
+
+                remaining = deadline - loop.time()
+                if remaining <= 0 or (wait and wait > remaining):
+                    self.timed_out += 1
+                    raise LLMQueueTimeoutError(
+                        "AI service is busy, please retry shortly",
+                        retry_after=wait or self.queue_timeout
+                    )
+                await self._wait_for_change(min(wait or remaining, remaining))
+        except BaseException:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                self._notify()
+            raise
+
+    def release(self) -> None:
+        """Free the slot taken by acquire."""
+        self.active -= 1
+        self._notify()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        provider: str,
+        model: str,
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 0,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """Hold a scheduler slot for the duration of a provider call."""
+        await self.acquire(provider, model, priority, tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, object]:
+        """Current queue depth and wait time statistics for this worker."""
+        depth = {p.name.lower(): 0 for p in Priority}
+        for waiter in self._queue:
+            depth[waiter.priority.name.lower()] += 1
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": depth,
+            "max_queue_size": self.max_queue_size,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_time": {p.name.lower(): s.as_dict() for p, s in self.wait_stats.items()}
+        }
+
+llm_scheduler = LLMScheduler(get_store())
+
+def _collect_metrics() -> None:
+    snapshot = llm_scheduler.snapshot()
+    metrics.LLM_ACTIVE_CALLS.set(snapshot["active"])
+    for priority, depth in snapshot["queue_depth"].items():
+        metrics.LLM_QUEUE_DEPTH.set(depth, priority=priority)
+
+metrics.registry.on_collect(_collect_metrics)
@@ -0,0 +1,317 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import date, datetime, timedelta, UTC
+from pathlib import Path
+import json
+import logging
+import os
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Select
+from app.models import Session as DBSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Column types understood by ArchiveWriter
+STRING, INT, FLOAT, BOOL, TIMESTAMP, DATE = "string", "int", "float", "bool", "timestamp", "date"
+
+PARTITIONINGS = {
+    "none": (),
+    "day": ("day",),
+    "topic": ("topic_id",),
+    "day-topic": ("day", "topic_id")
+}
+
+# Hive convention for NULL partition values
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+WATERMARK_FILE = "_watermark.json"
+
+class ArchiveDataset:
+    """
+    One exported table: its columns, the query producing them and the
+    column incremental runs continue from.
+    The query must select every column plus "topic_id"; rows are exported
+    where since < watermark <= until and partitioned by the date of day.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        columns: List[Tuple[str, str]],
+        query: Callable[[], Select],
+        watermark: Any,
+        day: Any,
+        order: Any = None
+    ):
+        self.name = name
+        self.columns = columns
+        self.query = query
+        self.watermark = watermark
+        self.day = day
+        self.order = watermark if order is None else order
+
+    def select(self, since: Optional[datetime], until: datetime, partition_by: Tuple[str, ...]) -> Select:
+        query = self.query().where(self.watermark <= until)
+        if since is not None:
+            query = query.where(self.watermark > since)
+        # Rows of one partition arrive together, so only one file is open at a time
+        partitions = {"day": func.date(self.day), "topic_id": query.selected_columns.topic_id}
+        return query.order_by(*(partitions[key] for key in partition_by), self.order)
+
+def _sessions_query() -> Select:
+    return select(
+        DBSession.id, DBSession.user_id, DBSession.topic_id, DBSession.agent_id,
+        DBSession.is_active, DBSession.duration, DBSession.completion_rate,
+        DBSession.feedback_score, DBSession.interaction_data,
+        DBSession.created_at, DBSession.updated_at
+    )
+
+def _messages_query() -> Select:
+    return select(
+        ChatMessage.id, ChatMessage.session_id, DBSession.topic_id, DBSession.user_id,
+        DBSession.agent_id, ChatMessage.role, ChatMessage.content, ChatMessage.tokens,
+        ChatMessage.feedback, ChatMessage.created_at
+    ).outerjoin(DBSession, ChatMessage.session_id == DBSession.id)
+
+def _token_usage_query() -> Select:
+    day = func.date(ChatMessage.created_at)
+    return select(
+        day.label("day"), DBSession.topic_id, ChatMessage.session_id, DBSession.user_id,
+        DBSession.agent_id, ChatMessage.role,
+        func.count(ChatMessage.id).label("messages"),
+        func.coalesce(func.sum(ChatMessage.tokens), 0).label("tokens")
+    ).outerjoin(DBSession, ChatMessage.session_id == DBSession.id)\
+        .group_by(day, DBSession.topic_id, ChatMessage.session_id, DBSession.user_id, DBSession.agent_id, ChatMessage.role)
+
+DATASETS: Dict[str, ArchiveDataset] = {
+    # Sessions change as learners progress; later runs re-export them, the newest updated_at wins
+    "sessions": ArchiveDataset(
+        "sessions",
+        [
+            ("id", STRING), ("user_id", STRING), ("topic_id", STRING), ("agent_id", STRING),
+            ("is_active", BOOL), ("duration", INT), ("completion_rate", FLOAT),
+            ("feedback_score", INT), ("interaction_data", STRING),
+            ("created_at", TIMESTAMP), ("updated_at", TIMESTAMP)
+        ],
+        _sessions_query,
+        watermark=DBSession.updated_at,
+        day=DBSession.created_at
+    ),
+    # Messages are append-only; feedback is exported as it was at export time
+    "messages": ArchiveDataset(
+        "messages",
+        [
+            ("id", STRING), ("session_id", STRING), ("topic_id", STRING), ("user_id", STRING),
+            ("agent_id", STRING), ("role", STRING), ("content", STRING), ("tokens", INT),
+            ("feedback", STRING), ("created_at", TIMESTAMP)
+        ],
+        _messages_query,
+        watermark=ChatMessage.created_at,
+        day=ChatMessage.created_at
+    ),
+    # Daily message and token totals per session and role; rows are additive across runs
+    "token_usage": ArchiveDataset(
+        "token_usage",
+        [
+            ("day", DATE), ("topic_id", STRING), ("session_id", STRING), ("user_id", STRING),
+            ("agent_id", STRING), ("role", STRING), ("messages", INT), ("tokens", INT)
+        ],
+        _token_usage_query,
+        watermark=ChatMessage.created_at,
+        day=ChatMessage.created_at,
+        order=ChatMessage.session_id
+    )
+}
+
+def _value(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == STRING:
+        if hasattr(value, "value"):  # Enums
+            return value.value
+        return value if isinstance(value, str) else json.dumps(value, default=str)
+    if kind == DATE and isinstance(value, str):
+        return date.fromisoformat(value)
+    if kind == INT:
+        return int(value)
+    if kind == FLOAT:
+        return float(value)
+    return value
+
+def _day(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    return str(value)[:10]
+
+def iter_chunks(
+    db: Session,
+    dataset: ArchiveDataset,
+    since: Optional[datetime],
+    until: datetime,
+    partition_by: Tuple[str, ...] = (),
+    chunk_size: int = 100000,
+    batch_size: int = 5000
+) -> Iterator[Tuple[Dict[str, Optional[str]], List[Dict[str, Any]]]]:
+    """
+    Stream (partition, rows) chunks of at most chunk_size rows of one partition.
+    Rows are fetched through a server-side cursor batch_size at a time, so
+    memory stays bounded by chunk_size whatever the size of the export.
+    """
+    query = dataset.select(since, until, partition_by).execution_options(yield_per=batch_size)
+    partition: Optional[Dict[str, Optional[str]]] = None
+    chunk: List[Dict[str, Any]] = []
+    for row in db.execute(query):
+        mapping = row._mapping
+        key = {
+            name: _day(mapping[dataset.day.key] if dataset.day.key in mapping else mapping["day"])
+            if name == "day" else mapping[name]
+            for name in partition_by
+        }
+        if chunk and (key != partition or len(chunk) >= chunk_size):
+            yield partition, chunk
+            chunk = []
+        partition = key
+        chunk.append({name: _value(mapping[name], kind) for name, kind in dataset.columns})
+    if chunk:
+        yield partition, chunk
+
+def read_watermark(directory: Path) -> Optional[datetime]:
+    path = directory / WATERMARK_FILE
+    if not path.exists():
+        return None
+    return datetime.fromisoformat(json.loads(path.read_text())["watermark"])
+
+def write_watermark(directory: Path, watermark: datetime, rows: int) -> None:
+    path = directory / WATERMARK_FILE
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps({
+        "watermark": watermark.isoformat(),
+        "rows": rows,
+        "exported_at": datetime.now(UTC).isoformat()
+    }))
+    os.replace(temporary, path)
+
+class ArchiveWriter:
+    """
+    Writes chunks to Parquet or Arrow IPC files under Hive-style partition
+    directories (day=2026-10-19/topic_id=...), one row group per chunk.
+    Files are written under a temporary name and renamed when closed, so
+    readers never see partial files. Needs the optional pyarrow dependency.
+    """
+
+    def __init__(self, directory: Path, columns: List[Tuple[str, str]], format: str = "parquet", run_id: str = "0"):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("Archive exports need pyarrow; install the app with the 'archive' extra") from e
+        self.pa = pyarrow
+        types = {
+            STRING: pyarrow.string(),
+            INT: pyarrow.int64(),
+            FLOAT: pyarrow.float64(),
+            BOOL: pyarrow.bool_(),
+            TIMESTAMP: pyarrow.timestamp("us"),
+            DATE: pyarrow.date32()
+        }
+        self.schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        self.directory = directory
+        self.format = format
+        self.run_id = run_id
+        self.files: List[Path] = []
+        self._partition: Optional[Dict[str, Optional[str]]] = None
+        self._writer = None
+        self._path: Optional[Path] = None
+
+    def write(self, partition: Dict[str, Optional[str]], rows: List[Dict[str, Any]]) -> None:
+        if partition != self._partition or self._writer is None:
+            self._close_file()
+            self._open_file(partition)
+        batch = self.pa.RecordBatch.from_pylist(rows, schema=self.schema)
+        if self.format == "parquet":
+            self._writer.write_table(self.pa.Table.from_batches([batch]), row_group_size=len(rows))
+        else:
+            self._writer.write_batch(batch)
+
+    def _open_file(self, partition: Dict[str, Optional[str]]) -> None:
+        directory = self.directory.joinpath(*(
+            f"{name}={NULL_PARTITION if value is None else value}" for name, value in partition.items()
+        ))
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = "parquet" if self.format == "parquet" else "arrow"
+        self._path = directory / f"part-{self.run_id}-{len(self.files):05d}.{suffix}"
+        temporary = str(self._path) + ".tmp"
+        if self.format == "parquet":
+            import pyarrow.parquet
+            self._writer = pyarrow.parquet.ParquetWriter(temporary, self.schema, compression="zstd")
+        else:
+            self._writer = self.pa.ipc.new_file(temporary, self.schema)
+        self._partition = partition
+
+    def _close_file(self) -> None:
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(str(self._path) + ".tmp", self._path)
+        self.files.append(self._path)
+        self._writer = None
+
+    def close(self) -> List[Path]:
+        self._close_file()
+        return self.files
+
+    def abort(self) -> None:
+        """Delete the open temporary file and every file this run published."""
+        if self._writer is not None:
+            self._writer.close()
+            os.remove(str(self._path) + ".tmp")
+            self._writer = None
+        for path in self.files:
+            path.unlink(missing_ok=True)
+        self.files = []
+
+def export_dataset(
+    db: Session,
+    dataset: ArchiveDataset,
+    output_dir: Path,
+    format: str = "parquet",
+    partition_by: Tuple[str, ...] = ("day",),
+    row_group_size: int = 100000,
+    batch_size: int = 5000,
+    lag: float = 60.0,
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Export the rows of dataset added since the last run into output_dir/<name>.
+    Rows newer than lag seconds are left for the next run, so transactions
+    still in flight are not skipped. The watermark only moves once every file
+    is in place: an interrupted run is repeated in full by the next one.
+    """
+    directory = output_dir / dataset.name
+    directory.mkdir(parents=True, exist_ok=True)
+    since = read_watermark(directory)
+    # Timestamps are stored as naive UTC
+    until = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=lag)
+    if since is not None and since >= until:
+        return {"rows": 0, "files": [], "since": since, "until": since}
+
+    writer = ArchiveWriter(directory, dataset.columns, format, run_id=until.strftime("%Y%m%dT%H%M%S"))
+    rows = 0
+    try:
+        for partition, chunk in iter_chunks(db, dataset, since, until, partition_by, row_group_size, batch_size):
+            writer.write(partition, chunk)
+            rows += len(chunk)
+            if on_progress is not None:
+                on_progress(rows)
+    except BaseException:
+        # The watermark has not moved, so the next run exports these rows again
+        writer.abort()
+        db.rollback()
+        raise
+    files = writer.close()
+    db.rollback()  # End the long read transaction
+
+    write_watermark(directory, until, rows)
+    logger.info(f"Archived {rows} {dataset.name} rows into {len(files)} files up to {until.isoformat()}")
+    return {"rows": rows, "files": files, "since": since, "until": until}
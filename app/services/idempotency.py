@@ -0,0 +1,136 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import uuid
+from app.core.config import settings
+from app.core.locks import keep_alive
+from app.core.store import KeyValueStore, get_store
+
+STATUS_PENDING = "pending"
+STATUS_COMPLETED = "completed"
+
+class IdempotencyConflictError(Exception):
+    """Raised when an idempotency key is reused with a different request."""
+
+class IdempotencyInProgressError(Exception):
+    """Raised when the original request is still running after the wait timeout."""
+
+def fingerprint(*parts: str) -> str:
+    """Hash the request parts that must match for a key to be replayed."""
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+class IdempotencyManager:
+    """
+    Runs a request at most once per idempotency key.
+    Duplicates in the same worker await the in-flight future; duplicates in
+    other workers poll the shared store until the result is recorded.
+    The in-flight claim expires after lock_ttl unless its worker is still
+    running the request, which keeps extending it.
+    """
+
+    def __init__(
+        self,
+        store: KeyValueStore,
+        ttl: float = settings.IDEMPOTENCY_TTL_SECONDS,
+        lock_ttl: float = settings.IDEMPOTENCY_LOCK_TTL_SECONDS,
+        wait_timeout: float = settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS,
+        poll_interval: float = 0.1
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        request_fingerprint: str,
+        func: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Run func once for (scope, key) and return (result, replayed).
+        The result must be JSON serializable.
+        """
+        store_key = f"idempotency:{scope}:{key}"
+
+        # Coalesce onto a request already running in this worker
+        inflight = self._inflight.get(store_key)
+        if inflight is not None:
+            self._check_fingerprint(inflight[0], request_fingerprint)
+            return await asyncio.shield(inflight[1]), True
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        # The claim id tells this worker's claim apart from a later one after it expired
+        pending = json.dumps({
+            "status": STATUS_PENDING,
+            "fingerprint": request_fingerprint,
+            "claim": str(uuid.uuid4())
+        })
+        while True:
+            record = await self._load(store_key)
+            if record is None:
+                if await self.store.set_if_absent(store_key, pending, ttl=self.lock_ttl):
+                    return await self._execute(store_key, pending, request_fingerprint, func), False
+                continue
+
+            self._check_fingerprint(record["fingerprint"], request_fingerprint)
+            if record["status"] == STATUS_COMPLETED:
+                return record["result"], True
+
+            # Another worker owns the key; wait for it to record the result
+            if loop.time() >= deadline:
+                raise IdempotencyInProgressError("A request with this idempotency key is still in progress")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _execute(
+        self,
+        store_key: str,
+        pending: str,
+        request_fingerprint: str,
+        func: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[store_key] = (request_fingerprint, future)
+        try:
+            async with keep_alive(self.store, store_key, pending, self.lock_ttl):
+                result = await func()
+        except asyncio.CancelledError:
+            await self.store.delete_if_equals(store_key, pending)
+            future.cancel()
+            raise
+        except Exception as e:
+            # Release the key so the client can retry a failed request
+            await self.store.delete_if_equals(store_key, pending)
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else is waiting
+            raise
+        else:
+            await self.store.set(
+                store_key,
+                json.dumps({
+                    "status": STATUS_COMPLETED,
+                    "fingerprint": request_fingerprint,
+                    "result": result
+                }),
+                ttl=self.ttl
+            )
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(store_key, None)
+
+    async def _load(self, store_key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.store.get(store_key)
+        return json.loads(raw) if raw else None
+
+    @staticmethod
+    def _check_fingerprint(stored: str, received: str) -> None:
+        if stored != received:
+            raise IdempotencyConflictError("Idempotency key was already used with a different request")
+
+idempotency = IdempotencyManager(get_store())
@@ -0,0 +1,336 @@
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime, UTC
+import asyncio
+import json
+import logging
+import time
+import uuid
+from sqlalchemy import delete, exists, func, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Select
+from app.core.config import settings
+from app.core.store import KeyValueStore, get_store
+from app.models import Topic, Session as DBSession, ChatMessage, SessionAnalytics, TopicAnalytics, UserAnalytics
+from app.services.topic_tree import subtree_cte, subtree_ids
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+class PurgeJobNotFoundError(Exception):
+    """Raised for an unknown or expired purge job id."""
+
+class PurgeJobBusyError(Exception):
+    """Raised when resuming a job that is running or already completed."""
+
+class PurgeStep:
+    """
+    Rows of one table to delete, selected by primary key in batches.
+    With keyset each batch continues after the last deleted id; without it
+    the ids query must order rows itself (e.g. children before parents).
+    """
+
+    def __init__(self, name: str, model: Any, ids: Callable[[], Select], keyset: bool = True):
+        self.name = name
+        self.model = model
+        self.ids = ids
+        self.keyset = keyset
+
+    def next_batch(self, db: Session, size: int, after: Optional[str]) -> List[str]:
+        query = self.ids()
+        if self.keyset:
+            if after is not None:
+                query = query.where(self.model.id > after)
+            query = query.order_by(self.model.id)
+        return list(db.scalars(query.limit(size)))
+
+    def count(self, db: Session) -> int:
+        return db.scalar(select(func.count()).select_from(self.ids().order_by(None).subquery()))
+
+def topic_purge_plan(topic_id: str) -> List[List[PurgeStep]]:
+    """Stages deleting a topic subtree with its sessions, messages and analytics."""
+    session_ids = lambda: select(DBSession.id).where(DBSession.topic_id.in_(subtree_ids(topic_id)))
+
+    def topics_deepest_first() -> Select:
+        tree = subtree_cte(topic_id)
+        return select(tree.c.id).order_by(tree.c.depth.desc(), tree.c.id)
+
+    return [
+        [
+            PurgeStep(
+                "chat_messages", ChatMessage,
+                lambda: select(ChatMessage.id).where(ChatMessage.session_id.in_(session_ids()))
+            ),
+            PurgeStep(
+                "session_analytics", SessionAnalytics,
+                lambda: select(SessionAnalytics.id).where(SessionAnalytics.session_id.in_(session_ids()))
+            )
+        ],
+        [
+            PurgeStep("sessions", DBSession, session_ids),
+            PurgeStep(
+                "topic_analytics", TopicAnalytics,
+                lambda: select(TopicAnalytics.id).where(TopicAnalytics.topic_id.in_(subtree_ids(topic_id)))
+            )
+        ],
+        [PurgeStep("topics", Topic, topics_deepest_first, keyset=False)]
+    ]
+
+def inactive_sessions_plan(cutoff: datetime) -> List[List[PurgeStep]]:
+    """
+    Stages deleting never-progressed sessions created before cutoff with their
+    messages, then analytics of users left without any session.
+    """
+    session_ids = lambda: select(DBSession.id).where(
+        DBSession.created_at < cutoff,
+        DBSession.completion_rate == 0
+    )
+    return [
+        [
+            PurgeStep(
+                "chat_messages", ChatMessage,
+                lambda: select(ChatMessage.id).where(ChatMessage.session_id.in_(session_ids()))
+            ),
+            PurgeStep(
+                "session_analytics", SessionAnalytics,
+                lambda: select(SessionAnalytics.id).where(SessionAnalytics.session_id.in_(session_ids()))
+            )
+        ],
+        [PurgeStep("sessions", DBSession, session_ids)],
+        [
+            PurgeStep(
+                "user_analytics", UserAnalytics,
+                lambda: select(UserAnalytics.id).where(
+                    UserAnalytics.created_at < cutoff,
+                    ~exists().where(DBSession.user_id == UserAnalytics.user_id)
+                )
+            )
+        ]
+    ]
+
+# Plans by job kind, rebuilt from the stored params when a job is resumed.
+# Steps of one stage touch independent tables; stages run in order.
+PLANS: Dict[str, Callable[[Dict[str, Any]], List[List[PurgeStep]]]] = {
+    "topic": lambda params: topic_purge_plan(params["topic_id"]),
+    "inactive_sessions": lambda params: inactive_sessions_plan(datetime.fromisoformat(params["cutoff"]))
+}
+
+class PurgeEngine:
+    """
+    Deletes large row sets in bounded batches, one short transaction each.
+    Progress is recorded in the state store after every batch, so a job can
+    be polled from any worker and resumed after a crash. A resumed job runs
+    every step again, since rows may have been added behind finished steps
+    (the purged rows stay writable while the job runs); batches over rows
+    that are already gone are empty. For the same reason a step failing on a
+    foreign key starts the plan over, up to max_retries times.
+    On Postgres each batch gives up on row locks after lock_timeout_ms and is
+    retried, so a purge waits behind live traffic instead of blocking it.
+    """
+
+    def __init__(
+        self,
+        store: KeyValueStore,
+        batch_size: int = settings.PURGE_BATCH_SIZE,
+        pause: float = settings.PURGE_PAUSE_SECONDS,
+        parallel: bool = False,
+        lock_timeout_ms: int = settings.PURGE_LOCK_TIMEOUT_MS,
+        max_retries: int = settings.PURGE_MAX_RETRIES,
+        job_ttl: float = settings.PURGE_JOB_TTL_SECONDS,
+        stale_after: float = settings.PURGE_STALE_SECONDS
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.pause = pause
+        self.parallel = parallel
+        self.lock_timeout_ms = lock_timeout_ms
+        self.max_retries = max_retries
+        self.job_ttl = job_ttl
+        self.stale_after = stale_after
+
+    def _key(self, job_id: str) -> str:
+        return f"purge:{job_id}"
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        record = await self.store.get(self._key(job_id))
+        if record is None:
+            raise PurgeJobNotFoundError(f"Purge job {job_id} not found")
+        return json.loads(record)
+
+    async def _save(self, job: Dict[str, Any]) -> None:
+        job["updated_at"] = time.time()
+        await self.store.set(self._key(job["id"]), json.dumps(job), ttl=self.job_ttl)
+
+    async def estimate(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        session_factory: Callable[[], Session]
+    ) -> Dict[str, int]:
+        """
+        Rows each step would delete right now, without deleting anything.
+        Later stages only count rows that exist before earlier stages run.
+        """
+        db = session_factory()
+        try:
+            return {
+                step.name: await asyncio.to_thread(step.count, db)
+                for stage in PLANS[kind](params)
+                for step in stage
+            }
+        finally:
+            db.close()
+
+    async def create(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a new pending job; run it with run()."""
+        steps = [step for stage in PLANS[kind](params) for step in stage]
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "params": params,
+            "status": STATUS_PENDING,
+            "steps": [step.name for step in steps],
+            "completed_steps": [],
+            "running_steps": [],
+            "deleted": {step.name: 0 for step in steps},
+            "error": None,
+            "created_at": datetime.now(UTC).isoformat()
+        }
+        await self._save(job)
+        return job
+
+    async def claim(self, job_id: str) -> Dict[str, Any]:
+        """Mark a pending, failed or abandoned job as running before resuming it."""
+        job = await self.get(job_id)
+        abandoned = job["status"] == STATUS_RUNNING and time.time() - job["updated_at"] > self.stale_after
+        if job["status"] == STATUS_COMPLETED or (job["status"] == STATUS_RUNNING and not abandoned):
+            raise PurgeJobBusyError(f"Purge job {job_id} is {job['status']}")
+        job["status"] = STATUS_RUNNING
+        job["completed_steps"] = []
+        job["running_steps"] = []
+        job["error"] = None
+        await self._save(job)
+        return job
+
+    async def run(
+        self,
+        job_id: str,
+        session_factory: Callable[[], Session],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run or resume a job to completion and return its final record.
+        With parallel the steps of a stage run concurrently, each on its own
+        connection. Failures are recorded on the job and re-raised.
+        """
+        job = await self.get(job_id)
+        if job["status"] != STATUS_RUNNING:
+            job = await self.claim(job_id)
+
+        try:
+            stages = PLANS[job["kind"]](job["params"])
+            index = restarts = 0
+            while index < len(stages):
+                try:
+                    await self._run_stage(job, stages[index], session_factory, on_progress)
+                except IntegrityError as e:
+                    # Rows were added behind an earlier stage, e.g. analytics of a live session
+                    restarts += 1
+                    if restarts > self.max_retries:
+                        raise
+                    logger.warning(f"Purge job {job_id} hit rows added while it ran, starting over: {str(e)}")
+                    job["completed_steps"], job["running_steps"] = [], []
+                    index = 0
+                    continue
+                index += 1
+
+            job["status"] = STATUS_COMPLETED
+            await self._save(job)
+            logger.info(f"Purge job {job_id} completed: {job['deleted']}")
+            return job
+        except Exception as e:
+            job["status"] = STATUS_FAILED
+            job["error"] = str(e)
+            await self._save(job)
+            logger.error(f"Purge job {job_id} failed at {job['running_steps']}: {str(e)}")
+            raise
+
+    async def _run_stage(
+        self,
+        job: Dict[str, Any],
+        stage: List[PurgeStep],
+        session_factory: Callable[[], Session],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        if self.parallel:
+            results = await asyncio.gather(
+                *(self._run_step(job, step, session_factory, on_progress) for step in stage),
+                return_exceptions=True
+            )
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                raise errors[0]
+        else:
+            for step in stage:
+                await self._run_step(job, step, session_factory, on_progress)
+
+    async def _run_step(
+        self,
+        job: Dict[str, Any],
+        step: PurgeStep,
+        session_factory: Callable[[], Session],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        job["running_steps"].append(step.name)
+        db = session_factory()
+        try:
+            after = None
+            retries = 0
+            while True:
+                try:
+                    ids = await asyncio.to_thread(step.next_batch, db, self.batch_size, after)
+                    deleted = await asyncio.to_thread(self._delete, db, step, ids)
+                except OperationalError as e:
+                    # Typically a lock timeout behind live traffic; back off and retry the batch
+                    db.rollback()
+                    retries += 1
+                    if retries > self.max_retries:
+                        raise
+                    logger.warning(f"Purge batch of {step.name} failed, retrying: {str(e)}")
+                    await asyncio.sleep(max(self.pause, 0.1) * 2 ** retries)
+                    continue
+                retries = 0
+                job["deleted"][step.name] += deleted
+                await self._save(job)
+                if on_progress is not None:
+                    on_progress(job)
+                if len(ids) < self.batch_size:
+                    break
+                after = ids[-1]
+                if self.pause:
+                    await asyncio.sleep(self.pause)
+            job["running_steps"].remove(step.name)
+            job["completed_steps"].append(step.name)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _delete(self, db: Session, step: PurgeStep, ids: List[str]) -> int:
+        if not ids:
+            db.rollback()  # End the read transaction
+            return 0
+        if self.lock_timeout_ms and db.get_bind().dialect.name == "postgresql":
+            db.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}"))
+        deleted = db.execute(
+            delete(step.model).where(step.model.id.in_(ids)).execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return deleted
+
+purge_engine = PurgeEngine(get_store())
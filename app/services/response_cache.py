@@ -0,0 +1,110 @@
+from typing import Callable, Tuple
+import hashlib
+import logging
+import time
+import uuid
+from fastapi import Request, Response
+from app.core import metrics
+from app.core.config import settings
+from app.core.store import KeyValueStore, get_store
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Caches serialized JSON responses in the shared store.
+    Entries are keyed under the namespace's current version, so invalidating
+    bumps the version and orphans every entry at once; orphans expire by TTL.
+    Bodies loaded within settle seconds of an invalidation are served but not
+    cached, since a lagging read replica may not have the change yet.
+    """
+
+    def __init__(
+        self,
+        store: KeyValueStore,
+        namespace: str,
+        ttl: float,
+        max_age: int,
+        settle: float = 0.0
+    ):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_age = max_age
+        self.settle = settle
+
+    @property
+    def _version_key(self) -> str:
+        return f"cache:{self.namespace}:version"
+
+    async def version(self) -> str:
+        """Current version of the namespace; changes on every invalidation."""
+        return await self.store.get(self._version_key) or "0"
+
+    async def invalidate(self) -> Tuple[str, str]:
+        """
+        Drop every cached response of the namespace.
+        Returns the version it replaced and the new version.
+        """
+        version = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:12]}"
+        previous = await self.store.swap(self._version_key, version)
+        return previous or "0", version
+
+    def settling(self, version: str) -> bool:
+        """Whether version was created too recently for replica reads to include the change."""
+        if not self.settle:
+            return False
+        try:
+            invalidated_at = int(version.split("-")[0]) / 1000
+        except ValueError:
+            return False
+        return time.time() - invalidated_at < self.settle
+
+    async def get_or_load(self, key: str, load: Callable[[], bytes]) -> bytes:
+        """Cached body for key, calling load on a miss."""
+        if not self.ttl:
+            return load()
+
+        try:
+            # Read the version before loading so a concurrent invalidation is never cached over
+            version = await self.version()
+            cache_key = f"cache:{self.namespace}:{version}:{key}"
+            cached = await self.store.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Response cache {self.namespace} unavailable: {str(e)}")
+            metrics.CACHE_REQUESTS.inc(cache=self.namespace, outcome="error")
+            return load()
+        if cached is not None:
+            metrics.CACHE_REQUESTS.inc(cache=self.namespace, outcome="hit")
+            return cached.encode()
+
+        metrics.CACHE_REQUESTS.inc(cache=self.namespace, outcome="miss")
+        body = load()
+        if self.settling(version):
+            return body
+        try:
+            await self.store.set(cache_key, body.decode(), ttl=self.ttl)
+        except Exception as e:
+            logger.warning(f"Response cache {self.namespace} unavailable: {str(e)}")
+        return body
+
+    async def respond(self, request: Request, key: str, load: Callable[[], bytes]) -> Response:
+        """
+        JSON response for key with ETag and Cache-Control headers.
+        Answers 304 when the client already holds the current body.
+        """
+        body = await self.get_or_load(key, load)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+topic_cache = ResponseCache(
+    get_store(),
+    namespace="topics",
+    ttl=settings.TOPIC_CACHE_TTL_SECONDS,
+    max_age=settings.TOPIC_CACHE_MAX_AGE_SECONDS,
+    settle=settings.REPLICA_MAX_LAG_SECONDS if settings.DATABASE_REPLICA_URIS else 0.0
+)
@@ -0,0 +1,157 @@
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Set
+from collections import defaultdict
+from datetime import datetime, UTC
+import logging
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models import Topic
+from app.services.topic_tree import subtree_cte
+
+logger = logging.getLogger(__name__)
+
+# Fields carried by exports; agents differ between deployments and are not exported
+EXPORT_FIELDS = ("id", "title", "description", "content", "difficulty_level", "parent_id", "engagement_score")
+
+FIELD_DEFAULTS = {"description": None, "content": None, "difficulty_level": 1, "parent_id": None, "engagement_score": 0.0}
+
+def iter_topics(db: Session, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every topic as a dict, parents before children.
+    Rows are fetched through a server-side cursor batch_size at a time.
+    """
+    tree = subtree_cte(None)
+    query = select(*(getattr(Topic, field) for field in EXPORT_FIELDS))\
+        .join(tree, Topic.id == tree.c.id)\
+        .order_by(tree.c.depth, Topic.id)\
+        .execution_options(yield_per=batch_size)
+    for row in db.execute(query):
+        yield dict(row._mapping)
+
+def copy_topics(db: Session, out: IO[str]) -> None:
+    """
+    Write every topic as one JSON line, parents first, with Postgres COPY.
+    Rows are built and streamed by the server without per-row round trips.
+    """
+    columns = ", ".join(f"'{field}', t.{field}" for field in EXPORT_FIELDS)
+    # CSV with delimiter and quote characters that never occur in JSON keeps COPY from escaping it
+    sql = f"""
+        COPY (
+            WITH RECURSIVE tree AS (
+                SELECT id, 0 AS depth FROM topics WHERE parent_id IS NULL
+                UNION ALL
+                SELECT topics.id, tree.depth + 1 FROM topics JOIN tree ON topics.parent_id = tree.id
+            )
+            SELECT json_build_object({columns})
+            FROM topics t JOIN tree ON t.id = tree.id
+            ORDER BY tree.depth, t.id
+        ) TO STDOUT WITH (FORMAT csv, DELIMITER E'\\x02', QUOTE E'\\x01')
+    """
+    connection = db.connection().connection.driver_connection
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, out)
+
+class TopicImporter:
+    """
+    Imports topic records in batches with INSERT ... ON CONFLICT.
+    Records may arrive in any order: children wait in memory until their
+    parent has been imported, so only out-of-order subtrees are buffered.
+    Each batch is committed on its own, which makes re-running an
+    interrupted import safe.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        update: bool = False,
+        batch_size: int = 1000,
+        on_progress: Optional[Callable[[Dict[str, int]], None]] = None
+    ):
+        self.db = db
+        self.update = update
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.stats = {"created": 0, "updated": 0, "skipped": 0, "orphaned": 0}
+
+    def run(self, records: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        batch: List[Dict[str, Any]] = []
+        for record in self.topological_order(records):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+        return self.stats
+
+    def topological_order(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield records parents first; children of unknown parents wait for them."""
+        seen: Set[str] = set()
+        waiting: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+        def release(record: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+            stack = [record]
+            while stack:
+                current = stack.pop()
+                seen.add(current["id"])
+                yield current
+                stack.extend(waiting.pop(current["id"], []))
+
+        for record in records:
+            record = self._normalize(record)
+            parent_id = record["parent_id"]
+            if parent_id is None or parent_id in seen:
+                yield from release(record)
+            else:
+                waiting[parent_id].append(record)
+
+        # Remaining parents are not in the input; they may already exist in the database
+        if waiting:
+            missing = list(waiting)
+            existing: Set[str] = set()
+            for i in range(0, len(missing), self.batch_size):
+                chunk = missing[i:i + self.batch_size]
+                existing.update(self.db.scalars(select(Topic.id).where(Topic.id.in_(chunk))))
+            for parent_id in existing:
+                for record in waiting.pop(parent_id):
+                    yield from release(record)
+        for parent_id, records in waiting.items():
+            self.stats["orphaned"] += len(records)
+            logger.warning(f"Skipping {len(records)} topics whose parent {parent_id} does not exist")
+
+    def _normalize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        if not record.get("id") or not record.get("title"):
+            raise ValueError(f"Topic records need an id and a title: {record}")
+        return {field: record.get(field, FIELD_DEFAULTS.get(field)) for field in EXPORT_FIELDS}
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        ids = [record["id"] for record in batch]
+        existing = set(self.db.scalars(select(Topic.id).where(Topic.id.in_(ids))))
+
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            raise ValueError(f"Bulk upsert is not supported on {dialect}")
+
+        now = datetime.now(UTC)
+        statement = insert(Topic).values([{**record, "created_at": now, "updated_at": now} for record in batch])
+        if self.update:
+            statement = statement.on_conflict_do_update(
+                index_elements=["id"],
+                set_={
+                    **{field: statement.excluded[field] for field in EXPORT_FIELDS if field != "id"},
+                    "updated_at": now
+                }
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=["id"])
+        self.db.execute(statement)
+        self.db.commit()
+
+        self.stats["created"] += len(batch) - len(existing)
+        self.stats["updated" if self.update else "skipped"] += len(existing)
+        if self.on_progress is not None:
+            self.on_progress(self.stats)
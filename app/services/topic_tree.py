@@ -0,0 +1,202 @@
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import time
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import CTE, Select
+from app.core.config import settings
+from app.models import Topic, Session as DBSession, ChatMessage
+from app.schemas.topic import TopicResponse
+from app.services.response_cache import ResponseCache, topic_cache
+
+logger = logging.getLogger(__name__)
+
+STATS_FIELDS = {"subtopic_count", "total_sessions", "average_completion_rate"}
+
+def subtree_cte(root_id: Optional[str], max_depth: Optional[int] = None) -> CTE:
+    """
+    Recursive CTE of (id, depth) for root_id and its descendants, or for the
+    whole hierarchy when root_id is None.
+    Roots have depth 0; max_depth stops the walk below that depth.
+    Topics cannot be re-parented through the API, so the walk always ends.
+    The CTE is nested so it can be used inside IN subqueries of DELETEs.
+    """
+    roots = Topic.parent_id.is_(None) if root_id is None else Topic.id == root_id
+    tree = select(Topic.id, literal(0).label("depth"))\
+        .where(roots)\
+        .cte("subtree", recursive=True, nesting=True)
+    children = select(Topic.id, (tree.c.depth + 1).label("depth"))\
+        .join(tree, Topic.parent_id == tree.c.id)
+    if max_depth is not None:
+        children = children.where(tree.c.depth < max_depth)
+    return tree.union_all(children)
+
+def subtree_ids(root_id: str) -> Select:
+    """Subquery of the ids in a subtree, for use in IN filters."""
+    return select(subtree_cte(root_id).c.id)
+
+def get_subtree_ids(db: Session, root_id: str) -> List[str]:
+    """Ids of root_id and all its descendants."""
+    return list(db.scalars(subtree_ids(root_id)))
+
+def count_subtree(db: Session, root_id: str) -> int:
+    """Number of topics in a subtree, including its root (0 if it does not exist)."""
+    tree = subtree_cte(root_id)
+    return db.scalar(select(func.count()).select_from(tree))
+
+def get_subtree(db: Session, root_id: str, max_depth: Optional[int] = None) -> List[Tuple[Topic, int]]:
+    """(topic, depth) pairs of a subtree down to max_depth, parents before children."""
+    tree = subtree_cte(root_id, max_depth)
+    return [
+        (topic, depth) for topic, depth in
+        db.query(Topic, tree.c.depth)
+        .join(tree, Topic.id == tree.c.id)
+        .order_by(tree.c.depth, Topic.title, Topic.id)
+        .all()
+    ]
+
+def delete_subtree(db: Session, root_id: str) -> Dict[str, int]:
+    """
+    Delete a subtree with its sessions and chat messages in three statements.
+    Runs in the caller's transaction; returns the number of deleted rows.
+    """
+    session_ids = select(DBSession.id).where(DBSession.topic_id.in_(subtree_ids(root_id)))
+
+    deleted_messages = db.query(ChatMessage)\
+        .filter(ChatMessage.session_id.in_(session_ids))\
+        .delete(synchronize_session=False)
+
+    deleted_sessions = db.query(DBSession)\
+        .filter(DBSession.topic_id.in_(subtree_ids(root_id)))\
+        .delete(synchronize_session=False)
+
+    deleted_topics = db.query(Topic)\
+        .filter(Topic.id.in_(subtree_ids(root_id)))\
+        .delete(synchronize_session=False)
+
+    return {
+        "deleted_topics": deleted_topics,
+        "deleted_sessions": deleted_sessions,
+        "deleted_messages": deleted_messages
+    }
+
+class TopicHierarchyIndex:
+    """
+    Process-local adjacency index of the whole topic hierarchy with stats.
+    Built with two queries and patched in place when this worker edits topics.
+    It is rebuilt when the shared topic cache version moves (an edit in another
+    worker) or after max_age seconds, which also refreshes session stats.
+    """
+
+    def __init__(self, cache: ResponseCache, max_age: float = settings.TOPIC_CACHE_TTL_SECONDS):
+        self.cache = cache
+        self.max_age = max_age
+        self._topics: Dict[str, Dict[str, Any]] = {}
+        self._children: Dict[Optional[str], List[str]] = {}
+        self._stats: Dict[str, Tuple[int, float]] = {}
+        self._version: Optional[str] = None
+        self._built_at = 0.0
+        # Built from a read replica that may not have the latest edit yet
+        self._settling = False
+
+    def clear(self) -> None:
+        self._topics, self._children, self._stats = {}, {}, {}
+        self._version = None
+        self._settling = False
+
+    async def ensure(self, db: Session) -> None:
+        """Rebuild the index if it is missing, stale or behind the shared version."""
+        version = await self.cache.version()
+        if version != self._version or time.monotonic() - self._built_at > self.max_age or self._settling:
+            self.rebuild(db, version)
+
+    def rebuild(self, db: Session, version: Optional[str]) -> None:
+        started = time.perf_counter()
+        topics: Dict[str, Dict[str, Any]] = {}
+        children: Dict[Optional[str], List[str]] = {}
+        for topic in db.query(Topic).order_by(Topic.created_at, Topic.id).all():
+            topics[topic.id] = self._node(topic)
+            children.setdefault(topic.parent_id, []).append(topic.id)
+
+        self._stats = {
+            topic_id: (count, float(average or 0))
+            for topic_id, count, average in db.query(
+                DBSession.topic_id,
+                func.count(DBSession.id),
+                func.avg(DBSession.completion_rate)
+            )
+            .filter(DBSession.is_active == True)
+            .group_by(DBSession.topic_id)
+            .all()
+        }
+        self._topics, self._children = topics, children
+        self._version, self._built_at = version, time.monotonic()
+        self._settling = version is not None and self.cache.settling(version)
+        logger.info(f"Built topic index of {len(topics)} topics in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def _node(self, topic: Topic) -> Dict[str, Any]:
+        return TopicResponse.model_validate(topic).model_dump(mode="json", exclude=STATS_FIELDS)
+
+    def _patch(self, previous: str, version: str) -> bool:
+        """
+        Whether an edit made in this worker can be applied in place: only if
+        the index was at the version the edit's invalidation replaced.
+        Otherwise another worker's edit came in between, and the index is
+        marked stale so ensure() rebuilds it.
+        """
+        if self._version != previous:
+            self._version = None
+            return False
+        self._version = version
+        return True
+
+    def upsert(self, topic: Topic, previous: str, version: str) -> None:
+        """Apply a created or updated topic; previous and version come from invalidating the cache."""
+        if not self._patch(previous, version):
+            return
+        previous = self._topics.get(topic.id)
+        if previous is not None and previous["parent_id"] != topic.parent_id:
+            self._children[previous["parent_id"]].remove(topic.id)
+        if previous is None or previous["parent_id"] != topic.parent_id:
+            self._children.setdefault(topic.parent_id, []).append(topic.id)
+        self._topics[topic.id] = self._node(topic)
+
+    def remove(self, topic_id: str, previous: str, version: str) -> None:
+        """Apply the deletion of a topic and its subtree."""
+        if not self._patch(previous, version) or topic_id not in self._topics:
+            return
+        self._children[self._topics[topic_id]["parent_id"]].remove(topic_id)
+        stack = [topic_id]
+        while stack:
+            current = stack.pop()
+            stack.extend(self._children.pop(current, []))
+            self._topics.pop(current, None)
+            self._stats.pop(current, None)
+
+    def __contains__(self, topic_id: str) -> bool:
+        return topic_id in self._topics
+
+    def tree(self, root_id: Optional[str] = None, max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Nested nodes of one subtree, or of every root topic when root_id is None.
+        max_depth limits the levels below the roots; nodes keep their subtopic_count.
+        """
+        roots = [root_id] if root_id is not None else self._children.get(None, [])
+        return [self._render(topic_id, max_depth) for topic_id in roots]
+
+    def _render(self, topic_id: str, depth_left: Optional[int]) -> Dict[str, Any]:
+        children = self._children.get(topic_id, [])
+        total_sessions, average_completion = self._stats.get(topic_id, (0, 0.0))
+        node = {
+            **self._topics[topic_id],
+            "subtopic_count": len(children),
+            "total_sessions": total_sessions,
+            "average_completion_rate": average_completion,
+            "children": []
+        }
+        if depth_left is None or depth_left > 0:
+            next_depth = None if depth_left is None else depth_left - 1
+            node["children"] = [self._render(child_id, next_depth) for child_id in children]
+        return node
+
+topic_index = TopicHierarchyIndex(topic_cache)
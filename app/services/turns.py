@@ -0,0 +1,110 @@
+from typing import Any, Awaitable, Callable, Dict, List
+import asyncio
+import enum
+from app.core.config import settings
+from app.core.locks import DistributedLock, LockManager, LockTimeoutError
+from app.core.store import KeyValueStore, get_store
+
+class TurnPolicy(str, enum.Enum):
+    QUEUE = "queue"    # Run overlapping turns one after another
+    REJECT = "reject"  # Refuse a turn while another one is running
+    MERGE = "merge"    # Fold turns waiting behind a running one into a single turn
+
+class TurnRejectedError(Exception):
+    """Raised when a turn cannot be accepted for a busy session."""
+
+class _PendingTurn:
+    """A turn waiting for its session lock; merged callers share its future."""
+
+    def __init__(self, content: str):
+        self.contents: List[str] = [content]
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+class SessionTurnQueue:
+    """
+    Serializes chat turns per session.
+    Turns in one worker are ordered by an in-process lock map; turns across
+    workers are ordered by a distributed lock in the shared store.
+    """
+
+    def __init__(
+        self,
+        store: KeyValueStore,
+        policy: TurnPolicy = TurnPolicy(settings.CHAT_TURN_POLICY),
+        max_queued: int = settings.CHAT_TURN_MAX_QUEUED,
+        lock_ttl: float = settings.CHAT_TURN_LOCK_TTL_SECONDS,
+        lock_timeout: float = settings.CHAT_TURN_LOCK_TIMEOUT_SECONDS
+    ):
+        self.store = store
+        self.policy = policy
+        self.max_queued = max_queued
+        self.lock_ttl = lock_ttl
+        self.lock_timeout = lock_timeout
+        self.locks = LockManager()
+        self._waiting: Dict[str, _PendingTurn] = {}
+
+    async def submit(
+        self,
+        session_id: str,
+        content: str,
+        run: Callable[[str], Awaitable[Any]]
+    ) -> Any:
+        """
+        Run a turn for the session once all earlier turns have finished.
+        run receives the turn content (several contents joined when merged).
+        """
+        busy = self.locks.users(session_id)
+        if self.policy == TurnPolicy.REJECT and busy:
+            raise TurnRejectedError("Another message is still being processed for this session")
+
+        if self.policy == TurnPolicy.MERGE and session_id in self._waiting:
+            turn = self._waiting[session_id]
+            turn.contents.append(content)
+            return await asyncio.shield(turn.future)
+
+        # busy counts the running turn as well as the waiting ones
+        if busy and busy - 1 >= self.max_queued:
+            raise TurnRejectedError("Too many messages queued for this session")
+
+        turn = _PendingTurn(content)
+        if self.policy == TurnPolicy.MERGE and busy:
+            self._waiting[session_id] = turn
+        try:
+            async with self.locks.hold(session_id):
+                if self._waiting.get(session_id) is turn:
+                    del self._waiting[session_id]
+                result = await self._run_locked(session_id, "\n\n".join(turn.contents), run)
+        except Exception as e:
+            if self._waiting.get(session_id) is turn:
+                del self._waiting[session_id]
+            turn.future.set_exception(e)
+            turn.future.exception()  # Mark as retrieved when nothing was merged
+            raise
+        except asyncio.CancelledError:
+            # Later messages must start a new turn rather than merge into this one
+            if self._waiting.get(session_id) is turn:
+                del self._waiting[session_id]
+            turn.future.cancel()
+            raise
+        turn.future.set_result(result)
+        return result
+
+    async def _run_locked(
+        self,
+        session_id: str,
+        content: str,
+        run: Callable[[str], Awaitable[Any]]
+    ) -> Any:
+        lock = DistributedLock(
+            self.store,
+            f"chat-turn:{session_id}",
+            ttl=self.lock_ttl,
+            timeout=0 if self.policy == TurnPolicy.REJECT else self.lock_timeout
+        )
+        try:
+            async with lock:
+                return await run(content)
+        except LockTimeoutError:
+            raise TurnRejectedError("Another message is still being processed for this session")
+
+chat_turns = SessionTurnQueue(get_store())
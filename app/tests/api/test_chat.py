@@ -1,7 +1,9 @@
 import pytest
 import uuid
+from unittest.mock import MagicMock
+from starlette.websockets import WebSocketDisconnect
 from app.core.config import settings
-from app.models import Session as DBSession, Agent, AgentType, Topic
+from app.models import Session as DBSession, Agent, AgentType, Topic, ChatMessage, MessageRole
 
 @pytest.fixture
 def test_topic_with_agent(db):
@@ -62,7 +64,7 @@ def test_send_message(client, normal_user_token_headers, test_session, mock_open
     call_args = mock_openai.call_args[1]
     assert "messages" in call_args
     assert "model" in call_args
-    # assert call_args["model"] == "gpt-4"
+    assert call_args["model"] == "gpt-4"
 
 def test_get_chat_history(client, normal_user_token_headers, test_session, db, mock_openai):
     """Test retrieving chat history."""
@@ -86,6 +88,44 @@ def test_get_chat_history(client, normal_user_token_headers, test_session, db, m
     assert data["total_messages"] > 0
     assert len(data["messages"]) > 0
 
+def test_get_chat_history_since(client, normal_user_token_headers, test_session, mock_openai, assert_max_queries):
+    """Test polling chat history with a since cursor and ETag."""
+    url = f"{settings.API_V1_STR}/chat/sessions/{test_session['id']}/chat"
+    client.post(url, headers=normal_user_token_headers, json={"content": "First message"})
+
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == 200
+    cursor = response.json()["cursor"]
+    assert cursor == response.json()["messages"][-1]["id"]
+
+    # Nothing new: the poll is answered without the count and page queries
+    response = client.get(url, headers=normal_user_token_headers, params={"since": cursor})
+    assert response.status_code == 200
+    assert response.json()["messages"] == []
+    assert response.json()["total_messages"] is None
+    etag = response.headers["ETag"]
+    with assert_max_queries(3):
+        response = client.get(
+            url, headers={**normal_user_token_headers, "If-None-Match": etag}, params={"since": cursor}
+        )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # A new turn changes the ETag and only the new messages are returned
+    client.post(url, headers=normal_user_token_headers, json={"content": "Second message"})
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}, params={"since": cursor}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    data = response.json()
+    assert [m["content"] for m in data["messages"]] == ["Second message", "Mocked AI response"]
+    assert data["has_more"] is False
+    assert data["cursor"] == data["messages"][-1]["id"]
+
+    response = client.get(url, headers=normal_user_token_headers, params={"since": "not-a-cursor"})
+    assert response.status_code == 400
+
 def test_send_message_invalid_session(client, normal_user_token_headers):
     """Test sending message to invalid session."""
     message = {"content": "Test message"}
@@ -95,4 +135,115 @@ def test_send_message_invalid_session(client, normal_user_token_headers):
         json=message
     )
     
-    assert response.status_code == 404 
\ No newline at end of file
+    assert response.status_code == 404 
+
+def test_send_message_idempotent_retry(client, normal_user_token_headers, mock_openai, test_session, db):
+    """Test that a retried send with the same Idempotency-Key is replayed."""
+    headers = {**normal_user_token_headers, "Idempotency-Key": "retry-1"}
+    message = {"content": "Hello again"}
+    url = f"{settings.API_V1_STR}/chat/sessions/{test_session['id']}/chat"
+    
+    first = client.post(url, headers=headers, json=message)
+    second = client.post(url, headers=headers, json=message)
+    
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert [m["id"] for m in second.json()] == [m["id"] for m in first.json()]
+    
+    # Only one provider call and one user/assistant pair were made
+    mock_openai.assert_called_once()
+    user_messages = db.query(ChatMessage).filter(
+        ChatMessage.session_id == test_session["id"],
+        ChatMessage.role == MessageRole.USER
+    ).count()
+    assert user_messages == 1
+
+def test_send_message_idempotency_key_reuse(client, normal_user_token_headers, mock_openai, test_session):
+    """Test that reusing an Idempotency-Key with a different body is rejected."""
+    headers = {**normal_user_token_headers, "Idempotency-Key": "reuse-1"}
+    url = f"{settings.API_V1_STR}/chat/sessions/{test_session['id']}/chat"
+    
+    assert client.post(url, headers=headers, json={"content": "First"}).status_code == 200
+    response = client.post(url, headers=headers, json={"content": "Second"})
+    
+    assert response.status_code == 422
+
+def test_send_message_traced(client, normal_user_token_headers, test_session, mock_openai, span_exporter):
+    """Test a chat turn is traced end to end within the caller's trace."""
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = client.post(
+        f"{settings.API_V1_STR}/chat/sessions/{test_session['id']}/chat",
+        headers={
+            **normal_user_token_headers,
+            "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"
+        },
+        json={"content": "Hello"}
+    )
+    assert response.status_code == 200
+    assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+    
+    spans = {span.name: span for span in span_exporter.spans}
+    for name in (
+        "auth.decode_jwt", "db.user_lookup", "db.session_lookup", "chat.process_message",
+        "db.history_query", "chat.prompt_assembly", "llm.chat", "db.commit", "db.query",
+        "POST /api/v1/chat/sessions/{session_id}/chat"
+    ):
+        assert name in spans
+    assert all(span.context.trace_id == trace_id for span in span_exporter.spans)
+    
+    llm_span = spans["llm.chat"]
+    assert llm_span.parent_id == spans["chat.process_message"].context.span_id
+    assert llm_span.attributes["gen_ai.request.model"] == "gpt-4"
+    assert llm_span.attributes["gen_ai.usage.input_tokens"] == 6
+    assert llm_span.attributes["gen_ai.usage.output_tokens"] == 4
+    
+    # The provider call carries the trace context
+    traceparent = mock_openai.call_args[1]["extra_headers"]["traceparent"]
+    assert traceparent == llm_span.context.traceparent
+
+def mock_stream(mock_openai, *pieces: str):
+    """Make the mocked client stream pieces followed by a usage chunk."""
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        async def chunks():
+            for piece in pieces:
+                yield MagicMock(choices=[MagicMock(delta=MagicMock(content=piece))], usage=None)
+            yield MagicMock(choices=[], usage=MagicMock(prompt_tokens=6, completion_tokens=len(pieces)))
+        return chunks()
+    mock_openai.side_effect = create
+
+def test_chat_websocket(client, normal_user_token_headers, test_session, mock_openai, db):
+    """Test chatting over a WebSocket streams deltas then the stored messages."""
+    mock_stream(mock_openai, "Hello", " there")
+    token = normal_user_token_headers["Authorization"].split(" ")[1]
+    
+    with client.websocket_connect(
+        f"{settings.API_V1_STR}/chat/sessions/{test_session['id']}/ws?token={token}"
+    ) as websocket:
+        websocket.send_text("not json")
+        assert websocket.receive_json()["status"] == 400
+        
+        websocket.send_json({"type": "message", "content": "Hi"})
+        events = []
+        while not events or events[-1]["type"] != "message" or events[-1]["message"]["role"] != "assistant":
+            events.append(websocket.receive_json())
+    
+    deltas = [event["content"] for event in events if event["type"] == "delta"]
+    assert "".join(deltas) == "Hello there"
+    user_event, assistant_event = [event for event in events if event["type"] == "message"]
+    assert user_event["message"]["content"] == "Hi"
+    assert assistant_event["message"]["content"] == "Hello there"
+    assert assistant_event["turn_id"] == events[0]["turn_id"]
+    
+    stored = db.query(ChatMessage).filter(ChatMessage.id == assistant_event["message"]["id"]).first()
+    assert stored.content == "Hello there"
+    assert stored.tokens == 8
+
+def test_chat_websocket_requires_auth(client, test_session):
+    """Test the WebSocket is refused without a valid token."""
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(
+            f"{settings.API_V1_STR}/chat/sessions/{test_session['id']}/ws?token=invalid"
+        ) as websocket:
+            websocket.receive_json()
@@ -0,0 +1,38 @@
+from app.core.config import settings
+
+def test_llm_metrics_admin_only(client, superuser_token_headers, normal_user_token_headers):
+    """Test LLM scheduler and breaker metrics are exposed to admins only."""
+    response = client.get(
+        f"{settings.API_V1_STR}/metrics/llm",
+        headers=normal_user_token_headers
+    )
+    assert response.status_code == 403
+    
+    response = client.get(
+        f"{settings.API_V1_STR}/metrics/llm",
+        headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+    scheduler = response.json()["scheduler"]
+    assert "queue_depth" in scheduler
+    assert "wait_time" in scheduler
+    assert "circuit_breakers" in response.json()
+
+def test_prometheus_metrics(client, normal_user_token_headers, test_topic_with_agent):
+    """Test request latency and query counts are exported by route template."""
+    response = client.get(
+        f"{settings.API_V1_STR}/topics/{test_topic_with_agent.id}",
+        headers=normal_user_token_headers
+    )
+    assert response.status_code == 200
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    route = f"{settings.API_V1_STR}/topics/{{topic_id}}"
+    assert f'http_request_duration_seconds_count{{method="GET",route="{route}"}}' in body
+    assert f'http_requests_total{{method="GET",route="{route}",status="200"}}' in body
+    assert f'db_queries_per_request_count{{route="{route}"}}' in body
+    assert test_topic_with_agent.id not in body
+    assert "# TYPE llm_tokens_total counter" in body
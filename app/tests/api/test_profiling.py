@@ -0,0 +1,80 @@
+from app.core.config import settings
+
+def test_profiling_disabled_by_default(client, superuser_token_headers):
+    """Test the profiling API is hidden unless enabled."""
+    response = client.post(
+        f"{settings.API_V1_STR}/profiling/sample?seconds=0.1",
+        headers=superuser_token_headers
+    )
+    assert response.status_code == 404
+
+def test_sample_worker(client, superuser_token_headers, normal_user_token_headers, monkeypatch):
+    """Test admins can sample the worker and get collapsed stacks back."""
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    
+    response = client.post(
+        f"{settings.API_V1_STR}/profiling/sample?seconds=0.1",
+        headers=normal_user_token_headers
+    )
+    assert response.status_code == 403
+    
+    response = client.post(
+        f"{settings.API_V1_STR}/profiling/sample?seconds=0.1&include_idle=true",
+        headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    # "frame;frame;... count" lines
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack
+    assert int(count) > 0
+
+def test_profile_single_request(client, superuser_token_headers, normal_user_token_headers, monkeypatch):
+    """Test superusers can profile one request with the X-Profile header."""
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    
+    response = client.get(
+        f"{settings.API_V1_STR}/topics",
+        headers={**normal_user_token_headers, "X-Profile": "1"}
+    )
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    
+    response = client.get(
+        f"{settings.API_V1_STR}/topics",
+        headers={**superuser_token_headers, "X-Profile": "1"}
+    )
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    
+    response = client.get(
+        f"{settings.API_V1_STR}/profiling/requests/{profile_id}",
+        headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+
+def test_profile_check_runs_off_event_loop(client, superuser_token_headers, monkeypatch):
+    """Test the X-Profile superuser lookup does not block the event loop."""
+    import asyncio
+    from app.api import deps
+    
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    loops = []
+    authenticate = deps.authenticate
+    
+    def tracking_authenticate(db, token):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return authenticate(db, token)
+    
+    monkeypatch.setattr(deps, "authenticate", tracking_authenticate)
+    response = client.get(
+        f"{settings.API_V1_STR}/topics",
+        headers={**superuser_token_headers, "X-Profile": "1"}
+    )
+    assert response.status_code == 200
+    assert "X-Profile-Id" in response.headers
+    # The middleware lookup ran in a worker thread
+    assert None in loops
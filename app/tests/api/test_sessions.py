@@ -188,4 +188,29 @@ def test_disable_and_create_session(
     messages = db.query(ChatMessage)\
         .filter(ChatMessage.session_id == new_session["id"])\
         .all()
-    assert len(messages) >= 2  # Should have system and welcome messages 
\ No newline at end of file
+    assert len(messages) >= 2  # Should have system and welcome messages 
+def test_get_session_query_count(
+    client,
+    normal_user_token_headers,
+    test_topic_with_agent,
+    mock_openai,
+    assert_max_queries
+):
+    """Test fetching a session loads its topic title without extra queries."""
+    response = client.post(
+        f"{settings.API_V1_STR}/sessions",
+        headers=normal_user_token_headers,
+        json={"topic_id": test_topic_with_agent.id}
+    )
+    assert response.status_code == 200
+    session_id = response.json()["id"]
+    
+    # One query for the current user, one for the session and its topic
+    with assert_max_queries(2):
+        response = client.get(
+            f"{settings.API_V1_STR}/sessions/{session_id}",
+            headers=normal_user_token_headers
+        )
+    
+    assert response.status_code == 200
+    assert response.json()["topic_title"] == test_topic_with_agent.title
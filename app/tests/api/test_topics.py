@@ -189,4 +189,130 @@ def test_delete_topic_rollback(client, superuser_token_headers, db, test_agent):
     
     # Verify nothing was deleted (rollback worked)
     db.refresh(db.query(Topic).get(topic_id))
-    assert db.query(Topic).filter(Topic.id == topic_id).first() is not None 
\ No newline at end of file
+    assert db.query(Topic).filter(Topic.id == topic_id).first() is not None 
+def test_list_topics_query_count(client, db, test_agent, assert_max_queries):
+    """Test listing topics runs a fixed number of queries however many topics exist."""
+    for i in range(10):
+        root = Topic(id=str(uuid.uuid4()), title=f"Root {i}", content={}, agent_id=test_agent.id)
+        child = Topic(
+            id=str(uuid.uuid4()),
+            title=f"Child {i}",
+            content={},
+            agent_id=test_agent.id,
+            parent_id=root.id
+        )
+        db.add_all([root, child])
+    db.commit()
+    
+    with assert_max_queries(3):
+        response = client.get(f"{settings.API_V1_STR}/topics")
+    
+    assert response.status_code == 200
+    topics = response.json()
+    assert len(topics) == 10
+    assert all(topic["subtopic_count"] == 1 for topic in topics)
+
+def test_topic_catalog_cached(client, superuser_token_headers, db, test_agent, assert_max_queries):
+    """Test catalog responses are served from cache until an admin edits topics."""
+    topic = Topic(id=str(uuid.uuid4()), title="Cached Topic", content={}, agent_id=test_agent.id)
+    db.add(topic)
+    db.commit()
+    url = f"{settings.API_V1_STR}/topics"
+    
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"].startswith("public")
+    etag = response.headers["ETag"]
+    
+    # Hits never touch the database
+    with assert_max_queries(0):
+        cached = client.get(url)
+        not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert cached.json() == response.json()
+    assert not_modified.status_code == 304
+    
+    response = client.put(
+        f"{url}/{topic.id}",
+        headers=superuser_token_headers,
+        json={"title": "Renamed Topic"}
+    )
+    assert response.status_code == 200
+    
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["title"] == "Renamed Topic"
+    assert client.get(f"{url}/{topic.id}").json()["title"] == "Renamed Topic"
+
+def test_get_topic_tree(client, superuser_token_headers, db, test_agent, assert_max_queries):
+    """Test the whole hierarchy is served in one response and patched on edits."""
+    root = Topic(id=str(uuid.uuid4()), title="Root", content={}, agent_id=test_agent.id)
+    child = Topic(id=str(uuid.uuid4()), title="Child", content={}, agent_id=test_agent.id, parent_id=root.id)
+    leaf = Topic(id=str(uuid.uuid4()), title="Leaf", content={}, agent_id=test_agent.id, parent_id=child.id)
+    db.add_all([root, child, leaf])
+    db.commit()
+    url = f"{settings.API_V1_STR}/topics/tree"
+    
+    with assert_max_queries(2):
+        response = client.get(url)
+    assert response.status_code == 200
+    tree = response.json()
+    assert [node["title"] for node in tree] == ["Root"]
+    assert tree[0]["children"][0]["children"][0]["id"] == leaf.id
+    assert tree[0]["subtopic_count"] == 1
+    
+    tree = client.get(url, params={"root_id": child.id, "depth": 0}).json()
+    assert tree[0]["id"] == child.id
+    assert tree[0]["children"] == []
+    assert tree[0]["subtopic_count"] == 1
+    assert client.get(url, params={"root_id": str(uuid.uuid4())}).status_code == 404
+    
+    # Edits made through the API patch the index instead of rebuilding it
+    response = client.put(
+        f"{settings.API_V1_STR}/topics/{leaf.id}",
+        headers=superuser_token_headers,
+        json={"title": "Renamed Leaf"}
+    )
+    assert response.status_code == 200
+    with assert_max_queries(0):
+        tree = client.get(url).json()
+    assert tree[0]["children"][0]["children"][0]["title"] == "Renamed Leaf"
+    
+    response = client.delete(f"{settings.API_V1_STR}/topics/{child.id}", headers=superuser_token_headers)
+    assert response.status_code == 200
+    with assert_max_queries(0):
+        tree = client.get(url).json()
+    assert tree[0]["children"] == []
+    assert tree[0]["subtopic_count"] == 0
+
+def test_delete_topic_background(client, superuser_token_headers, db, test_agent):
+    """Test a background deletion returns a job whose progress can be polled."""
+    parent = Topic(id=str(uuid.uuid4()), title="Parent", content={}, agent_id=test_agent.id)
+    child = Topic(id=str(uuid.uuid4()), title="Child", content={}, agent_id=test_agent.id, parent_id=parent.id)
+    db.add_all([parent, child])
+    db.commit()
+    topic_ids = [parent.id, child.id]
+    
+    response = client.delete(
+        f"{settings.API_V1_STR}/topics/{parent.id}",
+        headers=superuser_token_headers,
+        params={"background": True}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    
+    # The test client runs background tasks before returning
+    response = client.get(f"{settings.API_V1_STR}/topics/purges/{job_id}", headers=superuser_token_headers)
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "completed"
+    assert job["deleted"]["topics"] == 2
+    
+    assert db.query(Topic).filter(Topic.id.in_(topic_ids)).count() == 0
+    assert client.get(f"{settings.API_V1_STR}/topics/{topic_ids[0]}").status_code == 404
+    
+    response = client.post(
+        f"{settings.API_V1_STR}/topics/purges/{job_id}/resume",
+        headers=superuser_token_headers
+    )
+    assert response.status_code == 409
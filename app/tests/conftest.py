@@ -1,5 +1,6 @@
 import pytest
 import uuid
+from contextlib import contextmanager
 from unittest.mock import AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -11,6 +12,12 @@ from app.api import deps
 from app.core.config import settings
 from app.models import User, Topic, Agent, UserRole, AgentType
 from app.core.security import create_access_token, get_password_hash
+from app.services.ai.providers import clear_providers
+from app.db.instrumentation import capture_queries, instrument_engine
+from app.core import tracing
+from app.core.store import InMemoryStore
+from app.services.response_cache import topic_cache
+from app.services.topic_tree import topic_index
 
 class MockOpenAIResponse:
     def __init__(self, content: str):
@@ -22,19 +29,22 @@ class MockOpenAIResponse:
                 )
             )
         ]
-        self.usage = MagicMock(total_tokens=10)
+        self.usage = MagicMock(prompt_tokens=6, completion_tokens=4, total_tokens=10)
 
 @pytest.fixture
 def mock_openai(monkeypatch):
     """Mock OpenAI API responses."""
     mock_client = MagicMock()
     mock_chat = MagicMock()
-    mock_chat.completions.create = MagicMock(
+    mock_chat.completions.create = AsyncMock(
         return_value=MockOpenAIResponse("Mocked AI response")
     )
-    mock_client.return_value = MagicMock(chat=mock_chat)
-    monkeypatch.setattr("openai.OpenAI", mock_client)
-    return mock_chat.completions.create
+    mock_client.return_value = MagicMock(chat=mock_chat, close=AsyncMock())
+    monkeypatch.setattr("openai.AsyncOpenAI", mock_client)
+    # Providers cache their clients; make sure the next one is built on the mock
+    clear_providers()
+    yield mock_chat.completions.create
+    clear_providers()
 
 # Create test database
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -44,8 +54,28 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+instrument_engine(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@pytest.fixture
+def assert_max_queries():
+    """Fail if a block runs more than the given number of SQL statements."""
+    @contextmanager
+    def check(limit: int):
+        with capture_queries(engine) as stats:
+            yield stats
+        assert stats.count <= limit, (
+            f"Expected at most {limit} statements, got {stats.summary()}"
+        )
+    return check
+
+@pytest.fixture
+def span_exporter(monkeypatch):
+    """Turn tracing on and collect finished spans in memory."""
+    exporter = tracing.MemoryExporter()
+    monkeypatch.setattr(tracing, "get_exporter", lambda: exporter)
+    return exporter
+
 @pytest.fixture(scope="function")
 def db():
     Base.metadata.create_all(bind=engine)
@@ -65,8 +95,17 @@ def client(db):
         finally:
             pass
     
+    def override_get_auth_db():
+        # Authentication closes its session, so it gets its own
+        yield TestingSessionLocal()
+    
     app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[deps.get_read_db] = override_get_db
+    app.dependency_overrides[deps.get_auth_db] = override_get_auth_db
     settings.REQUIRE_INVITE = False
+    # Cached topic responses must not leak between test databases
+    topic_cache.store = InMemoryStore()
+    topic_index.clear()
     client = TestClient(app=app)  # Initialize with keyword argument
     try:
         yield client
@@ -0,0 +1,157 @@
+import uuid
+import pytest
+from app.core import metrics
+from app.models import Agent, AgentType, Session, Topic, User
+from app.services.ai import AIService
+from app.services.ai.answer_cache import AnswerCache, AnswerCachePolicy, AnswerKey
+
+def make_sessions(db, config, students=2, system_prompt="Test prompt"):
+    agent = Agent(
+        id=str(uuid.uuid4()),
+        name=f"Cached Agent {uuid.uuid4().hex[:6]}",
+        type=AgentType.CHATGPT,
+        config={"model": "gpt-4", **config},
+        system_prompt=system_prompt,
+        welcome_message="Test welcome",
+        is_active=True
+    )
+    topic = Topic(id=str(uuid.uuid4()), title="Variables", content={}, agent_id=agent.id)
+    db.add_all([agent, topic])
+    sessions = []
+    for i in range(students):
+        user = User(
+            id=str(uuid.uuid4()),
+            email=f"student{i}-{uuid.uuid4().hex[:6]}@example.com",
+            full_name=f"Student {i}",
+            hashed_password="x"
+        )
+        session = Session(id=str(uuid.uuid4()), user_id=user.id, topic_id=topic.id, agent_id=agent.id)
+        db.add_all([user, session])
+        sessions.append(session)
+    db.commit()
+    return agent, sessions
+
+@pytest.mark.asyncio
+async def test_students_share_answers_to_the_same_question(db, mock_openai):
+    """Test an opted-in agent answers a repeated opening question from the cache."""
+    agent, sessions = make_sessions(db, {"response_cache": True}, students=3)
+    name = agent.name
+    service = AIService(db)
+
+    await service.process_message(sessions[0], "What is a variable?")
+    replies = await service.process_message(sessions[1], "  what is a VARIABLE ")
+    assert mock_openai.call_count == 1
+    assert replies[1].content == "Mocked AI response"
+    assert replies[1].tokens == 0
+
+    # A follow-up has a different context, so it is not answered from the opening question
+    await service.process_message(sessions[1], "What is a variable?")
+    assert mock_openai.call_count == 2
+    assert metrics.ANSWER_CACHE_LOOKUPS.value(agent=name, outcome="hit") == 1
+    assert metrics.ANSWER_CACHE_LOOKUPS.value(agent=name, outcome="miss") == 2
+
+    # Agents without the option always call the provider
+    _, others = make_sessions(db, {}, students=2)
+    await service.process_message(others[0], "What is a variable?")
+    await service.process_message(others[1], "What is a variable?")
+    assert mock_openai.call_count == 4
+
+@pytest.mark.asyncio
+async def test_rendered_prompts_share_answers_unless_personalized(db, mock_openai):
+    """Test students share answers under a topic-specific prompt but not under a personalized one."""
+    _, sessions = make_sessions(db, {"response_cache": True}, system_prompt="Teach {{topic.title}}")
+    service = AIService(db)
+    for session in sessions:
+        await service.initialize_session(session)
+    await service.process_message(sessions[0], "What is a variable?")
+    await service.process_message(sessions[1], "What is a variable?")
+    assert mock_openai.call_count == 1
+
+    _, sessions = make_sessions(db, {"response_cache": True}, system_prompt="Teach {{user.full_name}}")
+    for session in sessions:
+        await service.initialize_session(session)
+    await service.process_message(sessions[0], "What is a variable?")
+    await service.process_message(sessions[1], "What is a variable?")
+    assert mock_openai.call_count == 3
+
+@pytest.mark.asyncio
+async def test_similar_questions_match_by_embedding(monkeypatch):
+    """Test paraphrases above the similarity threshold hit, others miss."""
+    vectors = {
+        "what is a variable": [1.0, 0.0],
+        "what s a variable": [0.99, 0.1],
+        "what is a loop": [0.0, 1.0],
+    }
+
+    async def embed(question, policy):
+        return vectors[question]
+    cache = AnswerCache()
+    monkeypatch.setattr(cache, "embed", embed)
+    policy = AnswerCachePolicy.for_agent({"response_cache": {"similarity": 0.95}})
+    key = lambda question: AnswerKey.for_question("agent", "topic", question, [], ["Teach"])
+
+    _, embedding = await cache.get(key("What is a variable?"), policy, "agent")
+    cache.put(key("What is a variable?"), "A named value.", policy, embedding)
+    assert await cache.get(key("What's a variable?"), policy, "agent") == ("A named value.", [0.99, 0.1])
+    assert (await cache.get(key("What is a loop?"), policy, "agent"))[0] is None
+
+def test_answers_are_bounded_and_expire(monkeypatch):
+    """Test least recently used answers are evicted beyond the bounds and expired ones are not served."""
+    from types import SimpleNamespace
+    from app.services.ai import answer_cache as module
+
+    now = [1000.0]
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = AnswerCache(max_entries=2, max_bytes=1000)
+    policy = AnswerCachePolicy(ttl=60)
+    key = lambda question: AnswerKey.for_question("agent", "topic", question, [], ["Teach"])
+
+    cache.put(key("one"), "1", policy)
+    cache.put(key("two"), "2", policy)
+    assert cache._live(key("one").digest).content == "1"
+    cache.put(key("three"), "3", policy)
+    assert [e.content for e in cache._entries.values()] == ["1", "3"]
+
+    cache.put(key("four"), "x" * 2000, policy)
+    assert len(cache) == 2 and cache.size < 1000
+
+    now[0] += 61
+    assert cache._live(key("one").digest) is None
+    assert len(cache) == 1
+
+@pytest.mark.asyncio
+async def test_embedding_lookup_yields_to_busy_scheduler(monkeypatch, mock_openai):
+    """Test question embeddings queue as background work and give up instead of delaying replies."""
+    from app.services.ai import answer_cache as module
+    from app.services.ai.scheduler import LLMScheduler
+
+    scheduler = LLMScheduler(module.llm_scheduler.store, max_concurrency=1, rate_limits={})
+    monkeypatch.setattr(module, "llm_scheduler", scheduler)
+    monkeypatch.setattr(module.settings, "ANSWER_CACHE_EMBEDDING_WAIT_SECONDS", 0.05)
+    await scheduler.acquire("openai", "gpt-4")  # A reply holds the only slot
+
+    policy = AnswerCachePolicy.for_agent({"response_cache": {"similarity": 0.9}})
+    assert await AnswerCache().embed("what is a variable", policy) is None
+    assert scheduler.snapshot()["wait_time"]["background"]["count"] == 0
+    assert scheduler.timed_out == 1
+
+@pytest.mark.asyncio
+async def test_hung_embedding_call_gives_up(monkeypatch, mock_openai):
+    """Test a hung embeddings endpoint is abandoned after the wait and counts against the breaker."""
+    import asyncio
+    from app.services.ai import answer_cache as module
+    from app.services.ai.providers import get_provider
+    from app.services.ai.resilience import CircuitBreaker
+
+    provider = get_provider("openai")
+    breaker = CircuitBreaker("embeddings")
+    monkeypatch.setattr(module, "get_breaker", lambda name: breaker)
+
+    async def hang(texts, model=None):
+        await asyncio.sleep(60)
+    monkeypatch.setattr(provider, "embed", hang)
+    monkeypatch.setattr(module.settings, "ANSWER_CACHE_EMBEDDING_WAIT_SECONDS", 0.05)
+
+    policy = AnswerCachePolicy.for_agent({"response_cache": {"similarity": 0.9}})
+    assert await asyncio.wait_for(AnswerCache().embed("what is a variable", policy), 1) is None
+    assert breaker.failures == 1
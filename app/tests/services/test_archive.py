@@ -0,0 +1,102 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta, UTC
+from app.models import Topic, User, Session as DBSession, ChatMessage, MessageRole
+from app.services.archive import DATASETS, PARTITIONINGS, iter_chunks, export_dataset, read_watermark
+
+def add_messages(db, agent_id, topic_id, created_at, count, tokens=10):
+    user = User(id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex}@example.com", hashed_password="x")
+    session = DBSession(id=str(uuid.uuid4()), user_id=user.id, topic_id=topic_id, agent_id=agent_id)
+    db.add_all([user, session])
+    for i in range(count):
+        db.add(ChatMessage(
+            id=str(uuid.uuid4()),
+            session_id=session.id,
+            role=MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT,
+            content=f"Message {i}",
+            tokens=tokens,
+            created_at=created_at + timedelta(seconds=i)
+        ))
+    db.commit()
+    return session
+
+@pytest.fixture
+def archive_topics(db, test_agent):
+    topics = [Topic(id=str(uuid.uuid4()), title=f"Topic {i}", content={}, agent_id=test_agent.id) for i in range(2)]
+    db.add_all(topics)
+    db.commit()
+    return topics
+
+def test_iter_chunks_by_day_and_topic(db, test_agent, archive_topics):
+    """Test chunks hold one partition each, respect the size bound and the watermark window."""
+    day = datetime(2026, 10, 1)
+    first, second = archive_topics
+    add_messages(db, test_agent.id, first.id, day, 5)
+    add_messages(db, test_agent.id, second.id, day, 2)
+    add_messages(db, test_agent.id, first.id, day + timedelta(days=1), 3)
+
+    chunks = list(iter_chunks(
+        db, DATASETS["messages"], None, day + timedelta(days=2),
+        PARTITIONINGS["day-topic"], chunk_size=2, batch_size=3
+    ))
+    partitions = [partition for partition, _ in chunks]
+    assert all(len(rows) <= 2 for _, rows in chunks)
+    assert sum(len(rows) for _, rows in chunks) == 10
+    # Each partition is streamed contiguously
+    distinct = [p for i, p in enumerate(partitions) if i == 0 or p != partitions[i - 1]]
+    assert len(distinct) == 3
+    assert {"day": "2026-10-02", "topic_id": first.id} in distinct
+    assert chunks[0][1][0]["role"] == "user"
+
+    # Only rows after since and up to until
+    rows = [
+        row for _, chunk in iter_chunks(db, DATASETS["messages"], day + timedelta(seconds=1), day + timedelta(hours=1))
+        for row in chunk
+    ]
+    assert len(rows) == 3
+
+    usage = [row for _, chunk in iter_chunks(db, DATASETS["token_usage"], None, day + timedelta(days=2)) for row in chunk]
+    assert sum(row["tokens"] for row in usage) == 100
+    assert sum(row["messages"] for row in usage) == 10
+    assert {row["day"].isoformat() for row in usage} == {"2026-10-01", "2026-10-02"}
+
+def test_export_dataset_incremental(db, test_agent, archive_topics, tmp_path):
+    """Test exports write partitioned Parquet files and later runs only add new rows."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    now = datetime.now(UTC).replace(tzinfo=None)
+    topic = archive_topics[0]
+    add_messages(db, test_agent.id, topic.id, now - timedelta(days=2), 4)
+
+    result = export_dataset(db, DATASETS["messages"], tmp_path, partition_by=("day",), row_group_size=3, lag=0)
+    assert result["rows"] == 4
+    assert read_watermark(tmp_path / "messages") == result["until"]
+    table = pq.read_table(result["files"][0])
+    assert table.num_rows == 4
+    assert pq.ParquetFile(result["files"][0]).num_row_groups == 2
+
+    add_messages(db, test_agent.id, topic.id, now - timedelta(days=1), 2)
+    result = export_dataset(db, DATASETS["messages"], tmp_path, partition_by=("day",), lag=0)
+    assert result["rows"] == 2
+    assert result["files"][0].parent.name == f"day={(now - timedelta(days=1)).date().isoformat()}"
+
+def test_failed_export_publishes_no_files(db, test_agent, archive_topics, tmp_path, monkeypatch):
+    """Test a run failing midway removes its files and leaves the watermark in place."""
+    pytest.importorskip("pyarrow.parquet")
+    from app.services import archive
+
+    now = datetime.now(UTC).replace(tzinfo=None)
+    add_messages(db, test_agent.id, archive_topics[0].id, now - timedelta(days=2), 2)
+    add_messages(db, test_agent.id, archive_topics[0].id, now - timedelta(days=1), 2)
+    iter_all = archive.iter_chunks
+
+    def fail_midway(*args, **kwargs):
+        chunks = iter_all(*args, **kwargs)
+        yield next(chunks)
+        yield next(chunks)  # Opens the second day's file
+        raise RuntimeError("connection lost")
+    monkeypatch.setattr(archive, "iter_chunks", fail_midway)
+
+    with pytest.raises(RuntimeError):
+        export_dataset(db, DATASETS["messages"], tmp_path, partition_by=("day",), lag=0)
+    assert [p for p in (tmp_path / "messages").rglob("*") if p.is_file()] == []
+    assert read_watermark(tmp_path / "messages") is None
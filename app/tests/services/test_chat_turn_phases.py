@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from app.db.base import Base
+from app.models import Agent, AgentType, ChatMessage, MessageRole, Session, Topic, User
+from app.services.ai import AIService
+from app.services.ai.exceptions import LLMProviderError
+
+@pytest.fixture
+def small_pool(tmp_path):
+    """A file database behind a single-connection pool that fails fast when exhausted."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/turns.db",
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.2,
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def chat_session(small_pool):
+    db = sessionmaker(bind=small_pool, autoflush=False)()
+    user = User(id=str(uuid.uuid4()), email="pool@example.com", hashed_password="x")
+    agent = Agent(
+        id=str(uuid.uuid4()),
+        name="Pool Agent",
+        type=AgentType.CHATGPT,
+        config={"model": "gpt-4"},
+        system_prompt="Test prompt",
+        welcome_message="Test welcome",
+        is_active=True
+    )
+    topic = Topic(id=str(uuid.uuid4()), title="Pools", content={}, agent_id=agent.id)
+    session = Session(id=str(uuid.uuid4()), user_id=user.id, topic_id=topic.id, agent_id=agent.id)
+    db.add_all([user, agent, topic, session])
+    db.commit()
+    yield db, session
+    db.close()
+
+def count_user_messages(engine, session_id):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.count(ChatMessage.id)).where(
+                ChatMessage.session_id == session_id, ChatMessage.role == MessageRole.USER
+            )
+        ).scalar()
+
+@pytest.mark.asyncio
+async def test_connection_is_released_during_completion(small_pool, chat_session, mock_openai):
+    """Test the only pooled connection stays available while the provider is slow."""
+    db, session = chat_session
+    session_id = session.id
+    seen = []
+    reply = mock_openai.return_value
+
+    async def slow_completion(**kwargs):
+        await asyncio.sleep(0.05)
+        # Times out after 0.2s if the turn still holds the connection
+        seen.append(count_user_messages(small_pool, session_id))
+        return reply
+    mock_openai.side_effect = slow_completion
+
+    messages = await AIService(db).process_message(session, "Hello")
+    assert [m.content for m in messages] == ["Hello", "Mocked AI response"]
+    # The user message was committed before the completion started
+    assert seen == [1]
+    assert session.interaction_data["total_tokens"] == 10
+
+@pytest.mark.asyncio
+async def test_failed_completion_removes_user_message(small_pool, chat_session, mock_openai):
+    """Test a failed completion leaves no unanswered user message behind."""
+    db, session = chat_session
+    session_id = session.id
+    mock_openai.side_effect = LLMProviderError("provider down")
+
+    with pytest.raises(LLMProviderError):
+        await AIService(db).process_message(session, "Hello")
+    db.close()
+    assert count_user_messages(small_pool, session_id) == 0
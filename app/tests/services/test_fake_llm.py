@@ -0,0 +1,48 @@
+import httpx
+import openai
+import pytest
+from benchmarks.fake_llm import FakeLLMConfig, create_app
+from app.services.ai.providers import ChatRequest
+from app.services.ai.providers.openai_provider import OpenAIProvider
+
+def fake_provider(config: FakeLLMConfig):
+    """OpenAIProvider wired to the fake server in-process."""
+    app = create_app(config)
+    provider = OpenAIProvider(api_key="fake", base_url="http://fake-llm/v1")
+    provider.client = openai.AsyncOpenAI(
+        api_key="fake",
+        base_url="http://fake-llm/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    )
+    return provider, app.state.fake
+
+REQUEST = ChatRequest(model="fake-model", messages=[{"role": "user", "content": "What is a loop?"}])
+
+@pytest.mark.asyncio
+async def test_fake_llm_is_deterministic_and_streams():
+    """Replies depend only on prompt and seed; streaming matches non-streaming."""
+    config = FakeLLMConfig(latency_ms=0, tokens_per_second=0, completion_tokens=8)
+    provider, fake = fake_provider(config)
+    
+    first = await provider.complete(REQUEST)
+    second = await provider.complete(REQUEST)
+    chunks = [chunk async for chunk in provider.stream(REQUEST)]
+    
+    assert first.content == second.content
+    assert first.completion_tokens == 8
+    assert "".join(c.content for c in chunks) == first.content
+    assert chunks[-1].completion_tokens == 8
+    assert fake.stats["requests"] == 3
+    assert fake.stats["streams"] == 1
+
+@pytest.mark.asyncio
+async def test_fake_llm_injects_errors():
+    """Error injection returns the configured status with Retry-After on 429."""
+    config = FakeLLMConfig(latency_ms=0, tokens_per_second=0, error_rate=1.0, error_status=429)
+    provider, fake = fake_provider(config)
+    
+    with pytest.raises(openai.RateLimitError) as exc:
+        await provider.complete(REQUEST)
+    assert exc.value.response.headers["retry-after"] == "1"
+    assert fake.stats["errors"] == 1
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from app.core.store import InMemoryStore
+from app.services.idempotency import (
+    IdempotencyManager, IdempotencyConflictError, IdempotencyInProgressError
+)
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_execution():
+    """Concurrent requests with the same key wait on the single in-flight call."""
+    manager = IdempotencyManager(InMemoryStore())
+    calls = 0
+    
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+    
+    results = await asyncio.gather(*[
+        manager.run("scope", "key", "fp", work) for _ in range(5)
+    ])
+    
+    assert calls == 1
+    assert [r[0] for r in results] == [{"answer": 42}] * 5
+    assert sorted(r[1] for r in results) == [False, True, True, True, True]
+
+@pytest.mark.asyncio
+async def test_completed_result_is_replayed_from_store():
+    """A second manager sharing the store (another worker) replays the result."""
+    store = InMemoryStore()
+    
+    async def work():
+        return [1, 2]
+    
+    await IdempotencyManager(store).run("scope", "key", "fp", work)
+    result, replayed = await IdempotencyManager(store).run("scope", "key", "fp", work)
+    
+    assert result == [1, 2]
+    assert replayed is True
+
+@pytest.mark.asyncio
+async def test_failed_request_releases_key():
+    """A failed execution does not poison the key for retries."""
+    manager = IdempotencyManager(InMemoryStore())
+    
+    async def fail():
+        raise RuntimeError("provider down")
+    
+    async def work():
+        return "ok"
+    
+    with pytest.raises(RuntimeError):
+        await manager.run("scope", "key", "fp", fail)
+    assert await manager.run("scope", "key", "fp", work) == ("ok", False)
+
+@pytest.mark.asyncio
+async def test_failed_request_keeps_a_newer_claim():
+    """A request failing after its claim was taken over leaves the new claim in place."""
+    store = InMemoryStore()
+    manager = IdempotencyManager(store)
+    
+    async def fail_after_takeover():
+        await store.set("idempotency:scope:key", '{"status": "pending", "fingerprint": "fp", "claim": "other"}')
+        raise RuntimeError("provider down")
+    
+    with pytest.raises(RuntimeError):
+        await manager.run("scope", "key", "fp", fail_after_takeover)
+    assert "other" in await store.get("idempotency:scope:key")
+
+@pytest.mark.asyncio
+async def test_fingerprint_mismatch_and_pending_timeout():
+    """Key reuse with another payload conflicts; a stuck claim times out."""
+    store = InMemoryStore()
+    manager = IdempotencyManager(store, wait_timeout=0.05, poll_interval=0.01)
+    await store.set("idempotency:scope:key", '{"status": "pending", "fingerprint": "fp"}')
+    
+    async def work():
+        return None
+    
+    with pytest.raises(IdempotencyConflictError):
+        await manager.run("scope", "key", "other", work)
+    with pytest.raises(IdempotencyInProgressError):
+        await manager.run("scope", "key", "fp", work)
+
+@pytest.mark.asyncio
+async def test_claim_outlives_its_ttl_while_running():
+    """A request running longer than the claim TTL is not executed again by another worker."""
+    store = InMemoryStore()
+    calls = 0
+    
+    async def slow():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.3)
+        return "done"
+    
+    first = asyncio.create_task(IdempotencyManager(store, lock_ttl=0.1).run("scope", "key", "fp", slow))
+    await asyncio.sleep(0.2)
+    other_worker = IdempotencyManager(store, lock_ttl=0.1, poll_interval=0.01)
+    assert await other_worker.run("scope", "key", "fp", slow) == ("done", True)
+    assert await first == ("done", False)
+    assert calls == 1
@@ -0,0 +1,60 @@
+import logging
+from sqlalchemy import create_engine, text
+from app.db.instrumentation import instrument_engine, normalize_statement, track_queries
+
+def test_normalize_statement_collapses_in_lists():
+    """Test statements differing only in IN list length compare equal."""
+    assert normalize_statement("SELECT * FROM t WHERE id IN (?, ?, ?)") == \
+        normalize_statement("SELECT *\n FROM t WHERE id IN (?, ?)")
+
+def test_track_queries_flags_repeated_statements(caplog):
+    """Test an identical statement repeated in one block is reported with its call site."""
+    engine = instrument_engine(create_engine("sqlite:///:memory:"))
+    with caplog.at_level(logging.WARNING, logger="app.db.instrumentation"):
+        with track_queries("GET /things") as stats:
+            with engine.connect() as conn:
+                for i in range(6):
+                    conn.execute(text("SELECT :value"), {"value": i})
+    
+    assert stats.count == 6
+    assert len(stats.repeated) == 1
+    assert "Possible N+1 in GET /things" in caplog.text
+    assert "ran 6 times" in caplog.text
+
+def test_pool_metrics_count_checkouts_and_timeouts(tmp_path):
+    """Test pool checkouts, timeouts and checked out connections are recorded per pool."""
+    import pytest
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from app.core import metrics
+    from app.db.session import create_db_engine
+
+    engine = create_db_engine(
+        f"sqlite:///{tmp_path}/pool.db", name="test-pool", pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+    with engine.connect():
+        assert metrics.DB_POOL_CHECKED_OUT.value(pool="test-pool") == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    assert metrics.DB_POOL_CHECKED_OUT.value(pool="test-pool") == 0
+    assert metrics.DB_POOL_CHECKOUTS.value(pool="test-pool") == 1
+    assert metrics.DB_POOL_TIMEOUTS.value(pool="test-pool") == 1
+    # Waits that end in a timeout are observed too
+    assert metrics.DB_POOL_CHECKOUT_WAIT.count(pool="test-pool") == 2
+
+def test_maintenance_engines_skip_server_timeouts(monkeypatch):
+    """Test only engines with server_timeouts set Postgres statement and idle timeouts."""
+    from app.db import session as module
+
+    created = []
+    monkeypatch.setattr(module, "create_engine", lambda url, **options: created.append(options))
+    monkeypatch.setattr(module, "instrument_engine", lambda engine: engine)
+    monkeypatch.setattr(module.settings, "DB_PGBOUNCER", False)
+    monkeypatch.setattr(module.settings, "DB_STATEMENT_TIMEOUT_MS", 30000)
+    monkeypatch.setattr(module.settings, "DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", 60000)
+
+    module.create_db_engine("postgresql://localhost/app")
+    module.create_db_engine("postgresql://localhost/app", name="maintenance", server_timeouts=False)
+    assert created[0]["connect_args"]["options"] == (
+        "-c statement_timeout=30000 -c idle_in_transaction_session_timeout=60000"
+    )
+    assert "connect_args" not in created[1]
@@ -0,0 +1,30 @@
+from datetime import datetime
+from app.db.partitions import (
+    Partition, add_months, archivable_partitions, ensure_partitions, parse_bound, partition_name
+)
+
+def test_parse_bound():
+    """Test pg_get_expr partition bounds are parsed into ranges."""
+    assert parse_bound("p", "FOR VALUES FROM ('2026-10-01 00:00:00') TO ('2026-11-01 00:00:00')") == \
+        Partition("p", datetime(2026, 10, 1), datetime(2026, 11, 1))
+    assert parse_bound("legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')") == \
+        Partition("legacy", None, datetime(2026, 11, 1))
+    assert parse_bound("default", "DEFAULT").default
+
+def test_archivable_partitions():
+    """Test only partitions ending before the cutoff are archived, never the default one."""
+    legacy = Partition("chat_messages_legacy", None, datetime(2025, 11, 1))
+    months = [
+        Partition(partition_name("chat_messages", month), month, add_months(month, 1))
+        for month in (add_months(datetime(2025, 11, 1), i) for i in range(13))
+    ]
+    default = Partition("chat_messages_default", None, None, default=True)
+
+    old = archivable_partitions([legacy, *months, default], cutoff=datetime(2026, 1, 1))
+    assert [p.name for p in old] == ["chat_messages_legacy", "chat_messages_p2025_11", "chat_messages_p2025_12"]
+    assert add_months(datetime(2026, 11, 1), 2) == datetime(2027, 1, 1)
+    assert months[0].covers(datetime(2025, 11, 30)) and not months[0].covers(datetime(2025, 12, 1))
+
+def test_ensure_partitions_skips_unpartitioned(db):
+    """Test partition upkeep is a no-op outside Postgres."""
+    assert ensure_partitions(db) == []
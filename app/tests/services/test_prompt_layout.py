@@ -0,0 +1,53 @@
+import uuid
+import pytest
+from app.core import metrics
+from app.core.config import settings
+from app.models import Agent, AgentType, ChatMessage, MessageRole, Session, Topic, User
+from app.services.ai import AIService
+
+@pytest.fixture
+def chat_session(db):
+    user = User(id=str(uuid.uuid4()), email="layout@example.com", hashed_password="x")
+    agent = Agent(
+        id=str(uuid.uuid4()),
+        name="Layout Agent",
+        type=AgentType.CHATGPT,
+        config={"model": "gpt-4"},
+        system_prompt="Test prompt",
+        welcome_message="Test welcome",
+        is_active=True
+    )
+    topic = Topic(id=str(uuid.uuid4()), title="Layout", content={}, agent_id=agent.id)
+    session = Session(id=str(uuid.uuid4()), user_id=user.id, topic_id=topic.id, agent_id=agent.id)
+    system = ChatMessage(id=str(uuid.uuid4()), session_id=session.id, role=MessageRole.SYSTEM, content="Teach")
+    db.add_all([user, agent, topic, session, system])
+    db.commit()
+    return session
+
+@pytest.mark.asyncio
+async def test_prompt_prefix_is_stable_between_turns(db, chat_session, mock_openai, monkeypatch):
+    """Test the system prompt leads every prompt and the history window only moves in chunks."""
+    monkeypatch.setattr(settings, "PROMPT_CACHE_HISTORY_CHUNK", 4)
+    service = AIService(db)
+    prompts = []
+    for turn in range(5):
+        await service.process_message(chat_session, f"Question {turn}", context_window=4)
+        prompts.append(mock_openai.call_args[1]["messages"])
+
+    assert all(prompt[0] == {"role": MessageRole.SYSTEM, "content": "Teach"} for prompt in prompts)
+    assert [prompt[-1]["content"] for prompt in prompts] == [f"Question {turn}" for turn in range(5)]
+    # History counts 0, 2, 4, 6 and 8: the window starts at message 0 until it would exceed
+    # context_window + chunk - 1 messages, then jumps to message 4
+    assert [len(prompt) for prompt in prompts] == [2, 4, 6, 8, 6]
+    for previous, current in zip(prompts[:3], prompts[1:4]):
+        assert current[:len(previous) - 1] == previous[:-1]
+    assert prompts[4][1]["content"] == "Question 2"
+
+@pytest.mark.asyncio
+async def test_cached_tokens_are_counted(db, chat_session, mock_openai):
+    """Test cached prompt tokens reported by the provider are recorded per agent."""
+    mock_openai.return_value.usage.prompt_tokens_details.cached_tokens = 4
+    before = metrics.LLM_PROMPT_CACHE_TOKENS.value(agent="Layout Agent", model="gpt-4", operation="read")
+    await AIService(db).process_message(chat_session, "Hello")
+    after = metrics.LLM_PROMPT_CACHE_TOKENS.value(agent="Layout Agent", model="gpt-4", operation="read")
+    assert after - before == 4
@@ -0,0 +1,147 @@
+import json
+import httpx
+import pytest
+from app.core.config import settings
+from app.models import Agent, AgentType
+from app.services.ai.providers import (
+    ChatRequest, get_agent_model, get_agent_provider, resolve_provider_name
+)
+from app.services.ai.exceptions import LLMStreamError
+from app.services.ai.providers.anthropic_provider import AnthropicProvider
+from app.services.ai.resilience import is_retryable
+
+def make_agent(**kwargs):
+    defaults = {"type": AgentType.CHATGPT, "ai_service": "openai", "config": {}}
+    return Agent(**{**defaults, **kwargs})
+
+def test_resolve_provider_name():
+    assert resolve_provider_name(make_agent()) == "openai"
+    assert resolve_provider_name(make_agent(ai_service="claude")) == "anthropic"
+    assert resolve_provider_name(make_agent(ai_service="", type=AgentType.CLAUDE)) == "anthropic"
+    assert resolve_provider_name(make_agent(ai_service="custom", type=AgentType.CUSTOM)) == "openai"
+    with pytest.raises(ValueError):
+        resolve_provider_name(make_agent(ai_service="unknown"))
+
+def test_agent_model_and_endpoint_selection(mock_openai, monkeypatch):
+    """agent.config picks the model and, for custom agents, the endpoint."""
+    agent = make_agent(config={"model": "gpt-4o-mini"})
+    provider = get_agent_provider(agent)
+    assert get_agent_model(agent, provider) == "gpt-4o-mini"
+    assert get_agent_provider(agent) is provider  # One shared pool per endpoint
+    
+    custom = make_agent(ai_service="custom", config={"base_url": "http://localhost:9000/v1"})
+    with pytest.raises(ValueError):
+        get_agent_provider(custom)  # The global key is not sent to another endpoint
+
+    monkeypatch.setattr(settings, "LLM_ENDPOINT_API_KEYS", {"http://localhost:9000/v1": "local-key"})
+    assert get_agent_provider(custom) is not provider
+    assert get_agent_provider(custom).base_url == "http://localhost:9000/v1"
+    assert get_agent_provider(custom).api_key == "local-key"
+
+@pytest.mark.asyncio
+async def test_anthropic_provider_complete_and_stream():
+    """System prompts move to the system parameter; usage is reported."""
+    requests = []
+    
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        if body.get("stream"):
+            events = [
+                {"type": "message_start", "message": {"usage": {"input_tokens": 12}}},
+                {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Hel"}},
+                {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "lo"}},
+                {"type": "message_delta", "usage": {"output_tokens": 2}},
+            ]
+            text = "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+            return httpx.Response(200, text=text)
+        return httpx.Response(200, json={
+            "content": [{"type": "text", "text": "Hello"}],
+            "usage": {"input_tokens": 12, "output_tokens": 2}
+        })
+    
+    provider = AnthropicProvider(api_key="key", base_url="http://anthropic.local")
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    request = ChatRequest(
+        model="claude-test",
+        messages=[
+            {"role": "system", "content": "Be brief"},
+            {"role": "user", "content": "Hi"},
+        ]
+    )
+    
+    completion = await provider.complete(request)
+    assert completion.content == "Hello"
+    assert completion.total_tokens == 14
+    assert requests[0]["system"] == [{"type": "text", "text": "Be brief"}]
+    assert requests[0]["messages"] == [{"role": "user", "content": "Hi"}]
+    
+    chunks = [chunk async for chunk in provider.stream(request)]
+    assert "".join(c.content for c in chunks) == "Hello"
+    assert chunks[-1].prompt_tokens == 12
+    assert chunks[-1].completion_tokens == 2
+    await provider.close()
+
+@pytest.mark.asyncio
+async def test_anthropic_stream_error_event():
+    """An error event in the stream raises, and overload errors are retryable."""
+    def handler(request):
+        events = [
+            {"type": "message_start", "message": {"usage": {"input_tokens": 12}}},
+            {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+        ]
+        text = "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+        return httpx.Response(200, text=text)
+
+    provider = AnthropicProvider(api_key="key", base_url="http://anthropic.local")
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    request = ChatRequest(model="claude-test", messages=[{"role": "user", "content": "Hi"}])
+    with pytest.raises(LLMStreamError) as error:
+        [chunk async for chunk in provider.stream(request)]
+    assert is_retryable(error.value)
+    assert not is_retryable(LLMStreamError("invalid_request_error"))
+    await provider.close()
+
+@pytest.mark.asyncio
+async def test_anthropic_provider_prompt_cache():
+    """Cache breakpoints become cache_control blocks; cache reads and writes are reported."""
+    requests = []
+    
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={
+            "content": [{"type": "text", "text": "Hello"}],
+            "usage": {
+                "input_tokens": 3,
+                "cache_read_input_tokens": 100,
+                "cache_creation_input_tokens": 20,
+                "output_tokens": 2
+            }
+        })
+    
+    provider = AnthropicProvider(api_key="key", base_url="http://anthropic.local")
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    request = ChatRequest(
+        model="claude-test",
+        messages=[
+            {"role": "system", "content": "Be brief"},
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello"},
+            {"role": "user", "content": "Again"},
+        ],
+        cache_breakpoints=[0, 2]
+    )
+    
+    completion = await provider.complete(request)
+    assert completion.prompt_tokens == 123
+    assert completion.cached_tokens == 100
+    assert completion.cache_write_tokens == 20
+    assert requests[0]["system"] == [{"type": "text", "text": "Be brief", "cache_control": {"type": "ephemeral"}}]
+    assert requests[0]["messages"] == [
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": [
+            {"type": "text", "text": "Hello", "cache_control": {"type": "ephemeral"}}
+        ]},
+        {"role": "user", "content": "Again"},
+    ]
+    await provider.close()
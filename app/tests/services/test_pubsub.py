@@ -0,0 +1,29 @@
+import pytest
+from app.core.pubsub import InMemoryPubSub, Subscription
+
+@pytest.mark.asyncio
+async def test_publish_fans_out_to_subscribers():
+    """Test every subscriber of a channel receives each event."""
+    pubsub = InMemoryPubSub()
+    async with pubsub.subscribe("chat:1") as first, pubsub.subscribe("chat:1") as second:
+        async with pubsub.subscribe("chat:2") as other:
+            await pubsub.publish("chat:1", {"type": "message"})
+            assert await first.get(timeout=1) == {"type": "message"}
+            assert await second.get(timeout=1) == {"type": "message"}
+            assert await other.get(timeout=0.01) is None
+    
+    # Unsubscribed channels are cleaned up
+    await pubsub.publish("chat:1", {"type": "message"})
+    assert not pubsub._subscribers
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_deltas_then_overflows():
+    """Test deltas are dropped for slow subscribers but other events mark overflow."""
+    subscription = Subscription(max_size=1)
+    subscription.put({"type": "delta"})
+    subscription.put({"type": "delta"})
+    assert subscription.dropped == 1
+    assert not subscription.overflowed
+    
+    subscription.put({"type": "message"})
+    assert subscription.overflowed
@@ -0,0 +1,141 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta, UTC
+from sqlalchemy.orm import sessionmaker
+from app.core.store import InMemoryStore
+from app.models import Topic, User, Session as DBSession, ChatMessage, MessageRole, UserAnalytics
+from app.services.purge import PurgeEngine, PurgeJobBusyError, STATUS_COMPLETED, STATUS_FAILED
+
+def add_sessions(db, agent_id, topic_id, count, messages_per_session=2):
+    user = User(id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex}@example.com", hashed_password="x")
+    db.add(user)
+    for _ in range(count):
+        session = DBSession(id=str(uuid.uuid4()), user_id=user.id, topic_id=topic_id, agent_id=agent_id)
+        db.add(session)
+        for _ in range(messages_per_session):
+            db.add(ChatMessage(id=str(uuid.uuid4()), session_id=session.id, role=MessageRole.USER, content="Hi"))
+    db.commit()
+
+@pytest.mark.asyncio
+async def test_topic_purge_resumes_after_failure(db, test_agent, monkeypatch):
+    """Test a purge deletes in batches and a failed job resumes where it stopped."""
+    root = Topic(id=str(uuid.uuid4()), title="Root", content={}, agent_id=test_agent.id)
+    child = Topic(id=str(uuid.uuid4()), title="Child", content={}, agent_id=test_agent.id, parent_id=root.id)
+    other = Topic(id=str(uuid.uuid4()), title="Other", content={}, agent_id=test_agent.id)
+    db.add_all([root, child, other])
+    db.commit()
+    add_sessions(db, test_agent.id, child.id, count=3)
+    add_sessions(db, test_agent.id, other.id, count=1)
+    
+    engine = PurgeEngine(InMemoryStore(), batch_size=2, pause=0)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    job = await engine.create("topic", {"topic_id": root.id})
+    
+    # Fail on the second batch of chat messages
+    original_delete = engine._delete
+    calls = []
+    def failing_delete(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return original_delete(*args)
+    monkeypatch.setattr(engine, "_delete", failing_delete)
+    
+    with pytest.raises(RuntimeError):
+        await engine.run(job["id"], session_factory)
+    job = await engine.get(job["id"])
+    assert job["status"] == STATUS_FAILED
+    assert job["running_steps"] == ["chat_messages"]
+    assert job["deleted"]["chat_messages"] == 2
+    
+    job = await engine.run(job["id"], session_factory)
+    assert job["status"] == STATUS_COMPLETED
+    assert job["deleted"] == {
+        "chat_messages": 6,
+        "session_analytics": 0,
+        "sessions": 3,
+        "topic_analytics": 0,
+        "topics": 2
+    }
+    with pytest.raises(PurgeJobBusyError):
+        await engine.claim(job["id"])
+    
+    db.expire_all()
+    assert [topic.id for topic in db.query(Topic).all()] == [other.id]
+    assert db.query(DBSession).count() == 1
+    assert db.query(ChatMessage).count() == 2
+
+@pytest.mark.asyncio
+async def test_resumed_purge_deletes_rows_added_behind_it(db, test_agent, monkeypatch):
+    """Test rows added after a step finished are deleted on resume, and foreign key failures start over."""
+    from sqlalchemy.exc import IntegrityError
+    topic = Topic(id=str(uuid.uuid4()), title="Live", content={}, agent_id=test_agent.id)
+    db.add(topic)
+    db.commit()
+    add_sessions(db, test_agent.id, topic.id, count=1)
+    session_id = db.query(DBSession.id).scalar()
+    
+    engine = PurgeEngine(InMemoryStore(), batch_size=10, pause=0)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    job = await engine.create("topic", {"topic_id": topic.id})
+    
+    original_delete = engine._delete
+    def failing_delete(db_, step, ids):
+        if step.name == "sessions":
+            raise RuntimeError("connection lost")
+        return original_delete(db_, step, ids)
+    monkeypatch.setattr(engine, "_delete", failing_delete)
+    with pytest.raises(RuntimeError):
+        await engine.run(job["id"], session_factory)
+    
+    # The student keeps chatting after the messages step finished
+    db.add(ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role=MessageRole.USER, content="Still here"))
+    db.commit()
+    
+    # The sessions step first hits the new message's foreign key, then succeeds after starting over
+    conflicts = []
+    def conflicting_delete(db_, step, ids):
+        if step.name == "sessions" and not conflicts:
+            conflicts.append(step)
+            raise IntegrityError("DELETE FROM sessions", {}, Exception("foreign key"))
+        return original_delete(db_, step, ids)
+    monkeypatch.setattr(engine, "_delete", conflicting_delete)
+    job = await engine.run(job["id"], session_factory)
+    assert job["status"] == STATUS_COMPLETED
+    assert job["deleted"]["chat_messages"] == 3
+    
+    db.expire_all()
+    assert db.query(ChatMessage).count() == 0
+    assert db.query(DBSession).count() == 0
+
+@pytest.mark.asyncio
+async def test_inactive_sessions_purge(db, test_agent):
+    """Test stale sessions go with their messages, then analytics of users left without sessions."""
+    topic = Topic(id=str(uuid.uuid4()), title="Topic", content={}, agent_id=test_agent.id)
+    db.add(topic)
+    db.commit()
+    add_sessions(db, test_agent.id, topic.id, count=3)
+    old = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=60)
+    for session in db.query(DBSession).all():
+        session.created_at = old
+    stale_user_id = db.query(DBSession.user_id).distinct().scalar()
+    db.add(UserAnalytics(id=str(uuid.uuid4()), user_id=stale_user_id, created_at=old))
+    # A recent session keeps its user's analytics
+    add_sessions(db, test_agent.id, topic.id, count=1)
+    recent_user_id = db.query(DBSession.user_id).filter(DBSession.created_at > old).scalar()
+    db.add(UserAnalytics(id=str(uuid.uuid4()), user_id=recent_user_id, created_at=old))
+    db.commit()
+    
+    engine = PurgeEngine(InMemoryStore(), batch_size=2, pause=0)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    params = {"cutoff": (old + timedelta(days=1)).isoformat()}
+    
+    estimate = await engine.estimate("inactive_sessions", params, session_factory)
+    assert estimate["sessions"] == 3
+    assert estimate["chat_messages"] == 6
+    assert db.query(DBSession).count() == 4
+    
+    job = await engine.create("inactive_sessions", params)
+    job = await engine.run(job["id"], session_factory)
+    assert job["deleted"] == {"chat_messages": 6, "session_analytics": 0, "sessions": 3, "user_analytics": 1}
+    assert db.query(UserAnalytics).one().user_id == recent_user_id
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import create_engine
+from starlette.requests import Request
+from app.api import deps
+from app.core.security import create_access_token
+from app.core.store import InMemoryStore
+from app.db.routing import ReplicaRouter, ReadYourWrites, token_subject
+from app.services.response_cache import ResponseCache
+
+def make_router(lags, **kwargs):
+    engines = [create_engine("sqlite://") for _ in lags]
+    router = ReplicaRouter(engines, **kwargs)
+    checks = []
+
+    def measure_lag(engine):
+        checks.append(engine)
+        return lags[engines.index(engine)]
+    router.measure_lag = measure_lag
+    return router, engines, checks
+
+def test_replica_router_skips_lagging_replicas():
+    """Test replicas are used round robin while within the lag budget."""
+    router, engines, checks = make_router([0.1, 30.0, None, 0.5], max_lag=5.0, check_interval=60)
+    picked = [router.pick() for _ in range(4)]
+    assert picked == [engines[0], engines[3], engines[3], engines[3]]
+    # Lags are measured once per check interval
+    assert len(checks) == 4
+
+    router, _, _ = make_router([30.0, None], max_lag=5.0)
+    assert router.pick() is None
+
+def request_with(token=None):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "headers": headers})
+
+@pytest.mark.asyncio
+async def test_get_read_db_sticks_to_primary_after_write(monkeypatch):
+    """Test reads go to a replica unless the user wrote recently."""
+    router, engines, _ = make_router([0.0], max_lag=5.0)
+    tracker = ReadYourWrites(InMemoryStore(), ttl=30)
+    monkeypatch.setattr(deps, "replica_router", router)
+    monkeypatch.setattr(deps, "read_your_writes", tracker)
+    token = create_access_token("user-1")
+    assert token_subject(f"Bearer {token}") == "user-1"
+
+    async def bind_of(request):
+        dependency = deps.get_read_db(request)
+        db = await dependency.__anext__()
+        bind = db.get_bind()
+        await dependency.aclose()
+        return bind
+
+    assert await bind_of(request_with(token)) is engines[0]
+    await tracker.mark("user-1")
+    assert await bind_of(request_with(token)) is not engines[0]
+    # Anonymous and other users' reads are unaffected
+    assert await bind_of(request_with()) is engines[0]
+    assert await bind_of(request_with(create_access_token("user-2"))) is engines[0]
+
+@pytest.mark.asyncio
+async def test_response_cache_does_not_cache_while_settling():
+    """Test bodies loaded right after an invalidation are not cached."""
+    cache = ResponseCache(InMemoryStore(), "test", ttl=60, max_age=0, settle=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return b"[]"
+
+    await cache.get_or_load("key", load)
+    await cache.get_or_load("key", load)
+    assert len(loads) == 1
+
+    await cache.invalidate()
+    await cache.get_or_load("key", load)
+    await cache.get_or_load("key", load)
+    assert len(loads) == 3
+
+    cache.settle = 0
+    await cache.get_or_load("key", load)
+    await cache.get_or_load("key", load)
+    assert len(loads) == 4
+
+@pytest.mark.asyncio
+async def test_user_lookup_releases_its_connection(db):
+    """Test authentication returns its connection before the endpoint runs."""
+    import uuid
+    from sqlalchemy.orm import sessionmaker
+    from app.models import User, UserPreference
+
+    user = User(id=str(uuid.uuid4()), email="auth@example.com", hashed_password="x", is_active=True)
+    db.add_all([user, UserPreference(id=str(uuid.uuid4()), user_id=user.id)])
+    db.commit()
+
+    auth_db = sessionmaker(bind=db.get_bind())()
+    current_user = await deps.get_current_user(auth_db, create_access_token(user.id))
+    assert not auth_db.in_transaction()
+    # Preferences are loaded up front, so they are usable without a session
+    assert current_user.id == user.id and current_user.preferences is not None
@@ -0,0 +1,132 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from app.services.ai.exceptions import LLMProviderError, LLMRateLimitedError, LLMTimeoutError, LLMUnavailableError
+from app.services.ai.resilience import (
+    CircuitBreaker, CircuitState, RetryPolicy, call_with_retries, get_retry_after
+)
+
+REQUEST = httpx.Request("POST", "http://llm.local/v1/chat/completions")
+
+def status_error(error_class, status_code, headers=None):
+    response = httpx.Response(status_code, headers=headers or {}, request=REQUEST)
+    return error_class("error", response=response, body=None)
+
+def flaky(errors, result="ok"):
+    """Return a callable that raises the given errors in turn, then succeeds."""
+    calls = []
+    
+    async def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    
+    return func, calls
+
+@pytest.fixture
+def fast_policy():
+    return RetryPolicy(timeout=1, max_retries=2, base_delay=0.001, max_delay=0.001)
+
+@pytest.mark.asyncio
+async def test_retries_retryable_errors(fast_policy):
+    """429s, 5xx responses and timeouts are retried until success."""
+    func, calls = flaky([
+        status_error(openai.RateLimitError, 429, {"retry-after": "0"}),
+        openai.APITimeoutError(request=REQUEST),
+    ])
+    breaker = CircuitBreaker("test", failure_threshold=5)
+    
+    assert await call_with_retries(func, fast_policy, breaker) == "ok"
+    assert len(calls) == 3
+    assert breaker.state == CircuitState.CLOSED
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(fast_policy):
+    """Exhausted retries surface as a fast 502/504 error."""
+    func, calls = flaky([status_error(openai.InternalServerError, 500)] * 5)
+    with pytest.raises(LLMProviderError) as exc:
+        await call_with_retries(func, fast_policy, CircuitBreaker("test", failure_threshold=10))
+    assert len(calls) == 3
+    assert exc.value.status_code == 502
+    
+    func, _ = flaky([openai.APITimeoutError(request=REQUEST)] * 5)
+    with pytest.raises(LLMTimeoutError):
+        await call_with_retries(func, fast_policy, CircuitBreaker("test", failure_threshold=10))
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_are_not_retried(fast_policy):
+    """Client errors such as 400 propagate immediately and do not trip the breaker."""
+    func, calls = flaky([status_error(openai.BadRequestError, 400)])
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    with pytest.raises(openai.BadRequestError):
+        await call_with_retries(func, fast_policy, breaker)
+    assert len(calls) == 1
+    assert breaker.state == CircuitState.CLOSED
+
+@pytest.mark.asyncio
+async def test_breaker_opens_then_recovers(fast_policy):
+    """The breaker fails fast while open and closes after a successful probe."""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    func, calls = flaky([status_error(openai.InternalServerError, 503)] * 5)
+    
+    with pytest.raises(LLMUnavailableError):
+        await call_with_retries(func, fast_policy, breaker)
+    assert breaker.state == CircuitState.OPEN
+    assert len(calls) == 2
+    
+    # Open circuit: no provider call is made
+    with pytest.raises(LLMUnavailableError) as exc:
+        await call_with_retries(func, fast_policy, breaker)
+    assert len(calls) == 2
+    assert exc.value.headers["Retry-After"]
+    
+    # After the reset timeout a probe is let through and closes the circuit
+    breaker.reset_timeout = 0
+    ok, _ = flaky([])
+    assert await call_with_retries(ok, fast_policy, breaker) == "ok"
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.snapshot()["times_opened"] == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_releases_half_open_breaker(fast_policy):
+    """A half-open probe cancelled by a client disconnect lets the next call probe."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.sleep(60)
+    probe = asyncio.create_task(call_with_retries(hang, fast_policy, breaker))
+    await started.wait()
+    assert breaker.state == CircuitState.HALF_OPEN
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    ok, _ = flaky([])
+    assert await call_with_retries(ok, fast_policy, breaker) == "ok"
+    assert breaker.state == CircuitState.CLOSED
+
+def test_retry_after_parsing():
+    assert get_retry_after(status_error(openai.RateLimitError, 429, {"retry-after": "3"})) == 3.0
+    assert get_retry_after(status_error(openai.RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+    assert get_retry_after(status_error(openai.RateLimitError, 429)) is None
+    
+def test_backoff_honors_retry_after():
+    policy = RetryPolicy(base_delay=0.1, max_delay=1)
+    assert policy.backoff(5) <= 1
+    assert policy.backoff(0, retry_after=4) == 4
+
+@pytest.mark.asyncio
+async def test_long_retry_after_fails_fast(fast_policy):
+    """A Retry-After beyond max_delay is passed to the client instead of slept through."""
+    func, calls = flaky([status_error(openai.RateLimitError, 429, {"retry-after": "300"})])
+    breaker = CircuitBreaker("test", failure_threshold=5)
+    
+    with pytest.raises(LLMRateLimitedError) as exc:
+        await call_with_retries(func, fast_policy, breaker)
+    assert len(calls) == 1
+    assert exc.value.headers == {"Retry-After": "300"}
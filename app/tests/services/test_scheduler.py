@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from app.core.store import InMemoryStore
+from app.services.ai.exceptions import LLMOverloadedError, LLMQueueTimeoutError
+from app.services.ai.scheduler import LLMScheduler, Priority
+
+@pytest.mark.asyncio
+async def test_higher_priority_is_admitted_first():
+    """Queued interactive calls are admitted before background calls."""
+    scheduler = LLMScheduler(InMemoryStore(), max_concurrency=1, rate_limits={})
+    order = []
+    
+    async def call(name, priority):
+        async with scheduler.slot("openai", "model", priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+    
+    await scheduler.acquire("openai", "model")  # Occupy the only slot
+    tasks = [
+        asyncio.create_task(call("background", Priority.BACKGROUND)),
+        asyncio.create_task(call("interactive", Priority.INTERACTIVE)),
+    ]
+    await asyncio.sleep(0.01)
+    assert scheduler.snapshot()["queue_depth"] == {
+        "interactive": 1, "background": 1
+    }
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    
+    assert order == ["interactive", "background"]
+    assert scheduler.snapshot()["wait_time"]["background"]["count"] == 1
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected():
+    """Calls beyond the queue bound fail immediately with a 429."""
+    scheduler = LLMScheduler(InMemoryStore(), max_concurrency=1, max_queue_size=1, rate_limits={})
+    await scheduler.acquire("openai", "model")
+    waiting = asyncio.create_task(scheduler.acquire("openai", "model", timeout=1))
+    await asyncio.sleep(0.01)
+    
+    with pytest.raises(LLMOverloadedError) as exc:
+        await scheduler.acquire("openai", "model")
+    assert exc.value.status_code == 429
+    
+    waiting.cancel()
+    scheduler.release()
+
+@pytest.mark.asyncio
+async def test_shared_budget_fails_fast_past_deadline():
+    """Workers sharing a store share the requests/min budget."""
+    store = InMemoryStore()
+    limits = {"openai:model": {"rpm": 2}}
+    worker_a = LLMScheduler(store, rate_limits=limits)
+    worker_b = LLMScheduler(store, rate_limits=limits)
+    
+    async with worker_a.slot("openai", "model"):
+        pass
+    async with worker_b.slot("openai", "model"):
+        pass
+    
+    # The next token refills in 30s, beyond the queue deadline
+    with pytest.raises(LLMQueueTimeoutError) as exc:
+        await worker_a.acquire("openai", "model", timeout=1)
+    assert exc.value.status_code == 503
+    assert int(exc.value.headers["Retry-After"]) > 1
+    assert worker_a.snapshot()["timed_out"] == 1
+    
+    # Other models have their own budget
+    async with worker_a.slot("openai", "other-model"):
+        pass
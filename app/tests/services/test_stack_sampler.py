@@ -0,0 +1,37 @@
+import threading
+import pytest
+from app.core import profiling
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampler_collapses_stacks():
+    """Test stacks are folded root-first with the thread name as the root frame."""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        sampler = profiling.StackSampler(interval=0.001)
+        for _ in range(20):
+            sampler.sample()
+    finally:
+        stop.set()
+        worker.join()
+    
+    assert sampler.samples == 20
+    busy = [line for line in sampler.collapsed().splitlines() if line.startswith("busy-worker;")]
+    assert busy
+    assert any("busy_loop (test_stack_sampler.py" in line for line in busy)
+
+@pytest.mark.asyncio
+async def test_one_profile_at_a_time():
+    """Test a second profile is refused while one is running."""
+    sampler = profiling.start_sampler()
+    try:
+        with pytest.raises(profiling.ProfilerBusyError):
+            await profiling.profile_for(0.01)
+    finally:
+        profiling.stop_sampler(sampler)
+    
+    assert isinstance(await profiling.profile_for(0.01), str)
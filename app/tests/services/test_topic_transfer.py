@@ -0,0 +1,56 @@
+import random
+import uuid
+from app.models import Topic
+from app.services.topic_transfer import TopicImporter, iter_topics
+
+def make_records(count, roots=3):
+    """Topic records forming a random forest, parents listed first."""
+    rng = random.Random(0)
+    records = []
+    for i in range(count):
+        parent = rng.choice(records)["id"] if i >= roots else None
+        records.append({"id": str(uuid.uuid4()), "title": f"Topic {i}", "content": {"i": i}, "parent_id": parent})
+    return records
+
+def test_import_out_of_order_then_export(db, assert_max_queries):
+    """Test shuffled records are upserted in batches and exported parents first."""
+    records = make_records(50)
+    shuffled = random.Random(1).sample(records, len(records))
+    
+    # One existence check and one INSERT per batch of 20
+    with assert_max_queries(3 * 2 + 3):
+        stats = TopicImporter(db, batch_size=20).run(shuffled)
+    assert stats == {"created": 50, "updated": 0, "skipped": 0, "orphaned": 0}
+    
+    exported = list(iter_topics(db, batch_size=7))
+    assert len(exported) == 50
+    position = {record["id"]: i for i, record in enumerate(exported)}
+    for record in exported:
+        if record["parent_id"] is not None:
+            assert position[record["parent_id"]] < position[record["id"]]
+    assert {record["id"]: record["content"] for record in exported} == \
+        {record["id"]: record["content"] for record in records}
+    
+    stats = TopicImporter(db, batch_size=20).run(exported)
+    assert stats["skipped"] == 50
+    
+    exported[0]["title"] = "Renamed"
+    stats = TopicImporter(db, update=True, batch_size=20).run(exported)
+    assert stats["updated"] == 50
+    db.expire_all()
+    assert db.query(Topic).filter(Topic.id == exported[0]["id"]).one().title == "Renamed"
+
+def test_import_skips_orphans(db):
+    """Test records whose parent exists neither in the input nor the database are skipped."""
+    root = Topic(id=str(uuid.uuid4()), title="Existing", content={})
+    db.add(root)
+    db.commit()
+    records = [
+        {"id": str(uuid.uuid4()), "title": "Child of existing", "parent_id": root.id},
+        {"id": str(uuid.uuid4()), "title": "Orphan", "parent_id": str(uuid.uuid4())}
+    ]
+    
+    stats = TopicImporter(db).run(records)
+    assert stats["created"] == 1
+    assert stats["orphaned"] == 1
+    assert db.query(Topic).count() == 2
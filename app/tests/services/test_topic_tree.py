@@ -0,0 +1,94 @@
+import uuid
+import pytest
+from app.core.store import InMemoryStore
+from app.models import Topic, User, Session as DBSession, ChatMessage, MessageRole
+from app.services.response_cache import ResponseCache
+from app.services.topic_tree import (
+    TopicHierarchyIndex, count_subtree, delete_subtree, get_subtree, get_subtree_ids
+)
+
+def add_tree(db, agent_id, depth=3, width=2):
+    """Add a complete tree and return its root id."""
+    root = Topic(id=str(uuid.uuid4()), title="Root", content={}, agent_id=agent_id)
+    db.add(root)
+    level = [root]
+    for d in range(1, depth + 1):
+        children = []
+        for parent in level:
+            for i in range(width):
+                children.append(Topic(
+                    id=str(uuid.uuid4()),
+                    title=f"Topic {d}.{i}",
+                    content={},
+                    agent_id=agent_id,
+                    parent_id=parent.id
+                ))
+        db.add_all(children)
+        level = children
+    db.commit()
+    return root.id
+
+def test_subtree_queries(db, test_agent, assert_max_queries):
+    """Test subtree ids, counts and depth-limited fetches each take one query."""
+    root_id = add_tree(db, test_agent.id)
+    other_id = add_tree(db, test_agent.id, depth=1)
+    
+    with assert_max_queries(1):
+        ids = get_subtree_ids(db, root_id)
+    assert len(ids) == 1 + 2 + 4 + 8
+    assert root_id in ids and other_id not in ids
+    
+    assert count_subtree(db, root_id) == 15
+    assert count_subtree(db, "missing") == 0
+    
+    with assert_max_queries(1):
+        subtree = get_subtree(db, root_id, max_depth=1)
+    assert [depth for _, depth in subtree] == [0, 1, 1]
+    assert subtree[0][0].id == root_id
+
+def test_delete_subtree(db, test_agent, assert_max_queries):
+    """Test a subtree is deleted with its sessions and messages in three statements."""
+    user = User(id=str(uuid.uuid4()), email="learner@example.com", hashed_password="x")
+    db.add(user)
+    root_id = add_tree(db, test_agent.id)
+    other_id = add_tree(db, test_agent.id, depth=1)
+    leaf = db.query(Topic).filter(Topic.id.in_(get_subtree_ids(db, root_id)), Topic.title == "Topic 3.1").first()
+    for topic_id in (leaf.id, other_id):
+        session = DBSession(id=str(uuid.uuid4()), user_id=user.id, topic_id=topic_id, agent_id=test_agent.id)
+        db.add(session)
+        db.add(ChatMessage(id=str(uuid.uuid4()), session_id=session.id, role=MessageRole.USER, content="Hi"))
+    db.commit()
+    
+    with assert_max_queries(3):
+        result = delete_subtree(db, root_id)
+    db.commit()
+    
+    assert result == {"deleted_topics": 15, "deleted_sessions": 1, "deleted_messages": 1}
+    assert db.query(Topic).count() == 3
+    assert db.query(DBSession).count() == 1
+    assert db.query(ChatMessage).count() == 1
+
+@pytest.mark.asyncio
+async def test_index_rebuilds_after_concurrent_edit(db, test_agent):
+    """Test local edits are patched in only directly after the indexed version."""
+    cache = ResponseCache(InMemoryStore(), "test", ttl=60, max_age=0)
+    index = TopicHierarchyIndex(cache)
+    root_id = add_tree(db, test_agent.id, depth=0)
+    await index.ensure(db)
+
+    topic = Topic(id=str(uuid.uuid4()), title="Local", content={}, agent_id=test_agent.id)
+    db.add(topic)
+    db.commit()
+    index.upsert(topic, *await cache.invalidate())
+    assert topic.id in index and index._version == await cache.version()
+
+    # Another worker edits in between, so this worker's next edit is not one step ahead
+    other = Topic(id=str(uuid.uuid4()), title="Other", content={}, agent_id=test_agent.id)
+    db.add(other)
+    db.commit()
+    await cache.invalidate()
+    index.remove(root_id, *await cache.invalidate())
+    assert root_id in index and index._version is None
+
+    await index.ensure(db)
+    assert other.id in index
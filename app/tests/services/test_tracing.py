@@ -0,0 +1,38 @@
+import json
+from app.core import tracing
+
+def test_traceparent_round_trip():
+    """Test W3C traceparent headers are parsed and rendered."""
+    header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    context = tracing.SpanContext.from_traceparent(header)
+    assert context.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert context.span_id == "00f067aa0ba902b7"
+    assert context.sampled
+    assert context.traceparent == header
+    
+    assert tracing.SpanContext.from_traceparent("garbage") is None
+    assert tracing.SpanContext.from_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
+    assert not tracing.SpanContext.from_traceparent(header[:-2] + "00").sampled
+
+def test_spans_nest_and_export_to_file(tmp_path, monkeypatch):
+    """Test child spans share the trace and are written as JSON lines."""
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "get_exporter", lambda: tracing.FileExporter(str(path)))
+    
+    with tracing.start_span("parent") as parent:
+        with tracing.start_span("child", {"key": "value"}) as child:
+            assert tracing.current_span() is child
+            assert child.parent_id == parent.context.span_id
+    
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["child", "parent"]
+    assert lines[0]["trace_id"] == lines[1]["trace_id"]
+    assert lines[0]["span_id"] == child.context.span_id
+    assert lines[0]["parent_id"] == parent.context.span_id
+    assert lines[0]["attributes"] == {"key": "value"}
+    assert tracing.current_span() is None
+
+def test_tracing_off_by_default():
+    """Test no spans are created without an exporter."""
+    with tracing.start_span("ignored") as span:
+        assert span is None
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from app.core.locks import DistributedLock
+from app.core.store import InMemoryStore
+from app.services.turns import SessionTurnQueue, TurnPolicy, TurnRejectedError
+
+@pytest.mark.asyncio
+async def test_turns_run_in_order_and_locks_are_evicted():
+    """Overlapping turns of one session run sequentially in arrival order."""
+    queue = SessionTurnQueue(InMemoryStore(), policy=TurnPolicy.QUEUE)
+    history = []
+    
+    async def run(content):
+        # Each turn sees every earlier turn's write
+        seen = list(history)
+        await asyncio.sleep(0.01)
+        history.append(content)
+        return seen
+    
+    results = await asyncio.gather(*[
+        queue.submit("session", str(i), run) for i in range(3)
+    ])
+    
+    assert history == ["0", "1", "2"]
+    assert results == [[], ["0"], ["0", "1"]]
+    assert len(queue.locks) == 0
+
+@pytest.mark.asyncio
+async def test_reject_policy_refuses_overlapping_turn():
+    """The reject policy refuses a turn while another is running."""
+    queue = SessionTurnQueue(InMemoryStore(), policy=TurnPolicy.REJECT)
+    
+    async def run(content):
+        await asyncio.sleep(0.05)
+        return content
+    
+    first = asyncio.create_task(queue.submit("session", "a", run))
+    await asyncio.sleep(0)
+    with pytest.raises(TurnRejectedError):
+        await queue.submit("session", "b", run)
+    assert await first == "a"
+    # Other sessions are not affected
+    assert await queue.submit("other", "c", run) == "c"
+
+@pytest.mark.asyncio
+async def test_merge_policy_folds_waiting_turns():
+    """Turns waiting behind a running one are merged into a single turn."""
+    queue = SessionTurnQueue(InMemoryStore(), policy=TurnPolicy.MERGE)
+    calls = []
+    
+    async def run(content):
+        calls.append(content)
+        await asyncio.sleep(0.02)
+        return content
+    
+    results = await asyncio.gather(
+        queue.submit("session", "a", run),
+        queue.submit("session", "b", run),
+        queue.submit("session", "c", run),
+    )
+    
+    assert calls == ["a", "b\n\nc"]
+    assert results == ["a", "b\n\nc", "b\n\nc"]
+
+@pytest.mark.asyncio
+async def test_queue_limit_counts_waiting_turns():
+    """max_queued turns may wait behind the running one; the next is refused."""
+    queue = SessionTurnQueue(InMemoryStore(), policy=TurnPolicy.QUEUE, max_queued=2)
+    
+    async def run(content):
+        await asyncio.sleep(0.02)
+        return content
+    
+    turns = [asyncio.create_task(queue.submit("session", str(i), run)) for i in range(3)]
+    await asyncio.sleep(0)
+    with pytest.raises(TurnRejectedError):
+        await queue.submit("session", "3", run)
+    assert await asyncio.gather(*turns) == ["0", "1", "2"]
+
+@pytest.mark.asyncio
+async def test_cancelled_merge_turn_is_not_merged_into():
+    """A message arriving after the waiting turn was cancelled starts a new turn."""
+    queue = SessionTurnQueue(InMemoryStore(), policy=TurnPolicy.MERGE)
+    calls = []
+    
+    async def run(content):
+        calls.append(content)
+        await asyncio.sleep(0.02)
+        return content
+    
+    first = asyncio.create_task(queue.submit("session", "a", run))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(queue.submit("session", "b", run))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.sleep(0)
+    assert await queue.submit("session", "c", run) == "c"
+    assert await first == "a"
+    assert calls == ["a", "c"]
+
+@pytest.mark.asyncio
+async def test_distributed_lock_excludes_other_workers():
+    """A second holder of the same store key waits until release."""
+    store = InMemoryStore()
+    first = DistributedLock(store, "key", ttl=10)
+    second = DistributedLock(store, "key", ttl=10, timeout=0)
+    
+    assert await first.acquire()
+    assert not await second.acquire()
+    await second.release()  # Not the owner; must not free the lock
+    assert not await second.acquire()
+    await first.release()
+    assert await second.acquire()
+
+@pytest.mark.asyncio
+async def test_turn_lock_is_renewed_while_a_turn_runs():
+    """A turn running longer than the lock TTL keeps other workers out."""
+    store = InMemoryStore()
+    worker = SessionTurnQueue(store, policy=TurnPolicy.QUEUE, lock_ttl=0.1)
+    other_worker = SessionTurnQueue(store, policy=TurnPolicy.REJECT, lock_ttl=0.1)
+    
+    async def run(content):
+        await asyncio.sleep(0.3)
+        return content
+    
+    turn = asyncio.create_task(worker.submit("session", "slow", run))
+    await asyncio.sleep(0.2)
+    with pytest.raises(TurnRejectedError):
+        await other_worker.submit("session", "overlap", run)
+    assert await turn == "slow"
+    assert await other_worker.submit("session", "next", run) == "next"
@@ -0,0 +1,160 @@
+"""
+Benchmark for sizing the per-worker database pool.
+
+Simulates one uvicorn worker: --concurrency threads (the threadpool that runs
+sync endpoint code) each repeatedly check out a connection, run a query and
+keep the connection for --hold-ms, as a request with that much database time
+would, then spend --think-ms without a connection. For every --sizes value it
+reports throughput, checkout wait p50/p95 and pool timeouts, then suggests the
+smallest pool that keeps the p95 wait under --max-wait-ms and checks the total
+against the server's budget:
+
+    python -m benchmarks.db_pool --concurrency 40 --hold-ms 20 --workers 4 --max-connections 100
+
+Sizing follows the usual guidance for Postgres: a pool only needs about
+throughput x hold time connections (Little's law), and the server is fastest
+with roughly (2 x CPU cores + disks) active connections in total, so
+workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) should stay under
+max_connections minus superuser and maintenance reserves. When the workers
+need more than that, run PgBouncer in transaction mode and set DB_PGBOUNCER.
+
+Pass --database-url to measure against Postgres instead of a temporary SQLite file.
+"""
+import sys
+import os
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Settings requires these; the benchmark uses its own database
+for _name, _value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "benchmark",
+    "SECRET_KEY": "benchmark-secret",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import tempfile
+import threading
+import time
+import click
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Connections kept free for superusers, migrations and maintenance
+RESERVED_CONNECTIONS = 10
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(database_url: str, size: int, overflow: int, concurrency: int, hold: float, think: float,
+        duration: float, timeout: float) -> Dict[str, float]:
+    """Drive one pool configuration for duration seconds."""
+    from app.db.session import create_db_engine
+
+    engine = create_db_engine(
+        database_url,
+        name=f"bench{size}",
+        pool_size=size,
+        max_overflow=overflow,
+        pool_timeout=timeout,
+        pool_pre_ping=False
+    )
+    waits: List[float] = []
+    timeouts = [0]
+    lock = threading.Lock()
+
+    def worker(deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    wait = time.perf_counter() - started
+                    connection.execute(text("SELECT 1"))
+                    time.sleep(hold)
+            except PoolTimeoutError:
+                with lock:
+                    timeouts[0] += 1
+                continue
+            with lock:
+                waits.append(wait)
+            # Other work of the request; also lets waiting threads get the connection
+            time.sleep(think)
+
+    # Open the pool's connections before measuring
+    with ThreadPoolExecutor(size) as warmup:
+        list(warmup.map(lambda _: worker(time.perf_counter() + hold), range(size)))
+    waits.clear()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker, started + duration) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return {
+        "size": size,
+        "rps": len(waits) / elapsed,
+        "p50": percentile(waits, 0.5) * 1000,
+        "p95": percentile(waits, 0.95) * 1000,
+        "mean": (statistics.fmean(waits) if waits else 0.0) * 1000,
+        "timeouts": timeouts[0]
+    }
+
+@click.command()
+@click.option("--concurrency", default=40, help="Threads issuing requests (anyio's threadpool defaults to 40)")
+@click.option("--hold-ms", default=20.0, help="Database time per request")
+@click.option("--think-ms", default=20.0, help="Time per request spent without a connection")
+@click.option("--sizes", default="2,5,10,20,40", help="Comma-separated pool sizes to try")
+@click.option("--overflow", default=0, help="max_overflow for every run")
+@click.option("--duration", default=5.0, help="Seconds per pool size")
+@click.option("--timeout", default=5.0, help="pool_timeout in seconds")
+@click.option("--max-wait-ms", default=5.0, help="Acceptable p95 checkout wait")
+@click.option("--workers", default=4, help="Worker processes sharing the database")
+@click.option("--max-connections", default=100, help="Postgres max_connections")
+@click.option("--database-url", default=None, help="Database to use (default: temporary SQLite)")
+def main(concurrency, hold_ms, think_ms, sizes, overflow, duration, timeout, max_wait_ms, workers, max_connections,
+         database_url):
+    """Measure checkout waits per pool size and suggest DB_POOL_SIZE."""
+    database_url = database_url or f"sqlite:///{tempfile.mkdtemp()}/db_pool.db"
+    hold = hold_ms / 1000
+
+    results = []
+    click.echo(f"{'pool':>6}{'req/s':>10}{'wait p50':>11}{'wait p95':>11}{'timeouts':>10}")
+    for size in (int(value) for value in sizes.split(",")):
+        result = run(database_url, size, overflow, concurrency, hold, think_ms / 1000, duration, timeout)
+        results.append(result)
+        click.echo(f"{size:>6}{result['rps']:>10.0f}{result['p50']:>9.1f}ms{result['p95']:>9.1f}ms"
+                   f"{result['timeouts']:>10}")
+
+    best_rps = max(result["rps"] for result in results)
+    # Little's law: connections busy on average at the best measured throughput
+    busy = best_rps * hold
+    click.echo(f"\nLittle's law: {best_rps:.0f} req/s x {hold_ms:.0f}ms ≈ {busy:.1f} connections busy per worker")
+
+    fitting = [r for r in results if r["p95"] <= max_wait_ms and not r["timeouts"]]
+    budget = (max_connections - RESERVED_CONNECTIONS) // workers
+    if not fitting:
+        click.echo(f"⚠️  No tried size keeps the p95 wait under {max_wait_ms}ms; try larger --sizes")
+        return
+    size = fitting[0]["size"]
+    click.echo(f"✅ Suggested DB_POOL_SIZE={size} (p95 wait {fitting[0]['p95']:.1f}ms)")
+    total = workers * (size + overflow)
+    if total > max_connections - RESERVED_CONNECTIONS:
+        click.echo(f"⚠️  {workers} workers x {size + overflow} = {total} connections exceeds the budget of "
+                   f"{max_connections - RESERVED_CONNECTIONS}; keep DB_POOL_SIZE + DB_MAX_OVERFLOW <= {budget} "
+                   f"per worker or set DB_PGBOUNCER=true behind PgBouncer")
+    else:
+        click.echo(f"ℹ️  {workers} workers use up to {total} of {max_connections - RESERVED_CONNECTIONS} "
+                   f"available connections; DB_MAX_OVERFLOW can be up to {budget - size}")
+
+if __name__ == "__main__":
+    main()
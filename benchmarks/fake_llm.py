@@ -0,0 +1,204 @@
+"""
+Deterministic OpenAI-compatible chat completion server for load tests.
+
+Serves POST /v1/chat/completions (streaming and non-streaming) with
+configurable time to first token, token rate, reply length and error
+injection. Replies depend only on the prompt and the seed, so runs are
+repeatable and need no network access.
+
+    python -m benchmarks.fake_llm --port 9100 --latency-ms 300 --tokens-per-second 50
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from typing import Any, Dict, List
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import click
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+WORDS = (
+    "variable function loop value list index string number object class "
+    "method return input output example explain step result error test"
+).split()
+
+class FakeLLMConfig:
+    """Behaviour of the fake provider."""
+
+    def __init__(
+        self,
+        latency_ms: float = 200,
+        tokens_per_second: float = 100,
+        completion_tokens: int = 60,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+class FakeLLM:
+    """Request handlers and counters for the fake provider."""
+
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+        self.errors = random.Random(config.seed)
+        self.stats = {"requests": 0, "streams": 0, "errors": 0, "completion_tokens": 0}
+
+    def reply_tokens(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """Reply words derived from the prompt and seed only."""
+        prompt = json.dumps(messages, sort_keys=True)
+        digest = hashlib.sha256(f"{self.config.seed}:{prompt}".encode()).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+        return [rng.choice(WORDS) for _ in range(self.config.completion_tokens)]
+
+    @staticmethod
+    def prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+        return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+    def injected_error(self):
+        if self.config.error_rate and self.errors.random() < self.config.error_rate:
+            self.stats["errors"] += 1
+            headers = {"Retry-After": "1"} if self.config.error_status == 429 else {}
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "fake_error"}},
+                status_code=self.config.error_status,
+                headers=headers
+            )
+        return None
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        self.stats["requests"] += 1
+        error = self.injected_error()
+        if error is not None:
+            return error
+
+        messages = body.get("messages", [])
+        tokens = self.reply_tokens(messages)[:body.get("max_tokens") or None]
+        usage = {
+            "prompt_tokens": self.prompt_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": self.prompt_tokens(messages) + len(tokens)
+        }
+        self.stats["completion_tokens"] += len(tokens)
+        model = body.get("model") or "fake-model"
+        created = int(time.time())
+        completion_id = f"chatcmpl-{hashlib.md5(json.dumps(messages).encode()).hexdigest()[:12]}"
+        token_delay = 1 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+
+        if body.get("stream"):
+            self.stats["streams"] += 1
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+            async def events():
+                await asyncio.sleep(self.config.latency_ms / 1000)
+                for i, token in enumerate(tokens):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": token if i == 0 else f" {token}"},
+                            "finish_reason": None
+                        }]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(token_delay)
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                if include_usage:
+                    usage_chunk = {**final, "choices": [], "usage": usage}
+                    yield f"data: {json.dumps(usage_chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(self.config.latency_ms / 1000 + token_delay * len(tokens))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(tokens)},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    async def get_stats(self, request: Request):
+        return JSONResponse(self.stats)
+
+def create_app(config: FakeLLMConfig) -> Starlette:
+    """Build the fake provider ASGI app."""
+    fake = FakeLLM(config)
+    app = Starlette(routes=[
+        Route("/v1/chat/completions", fake.chat_completions, methods=["POST"]),
+        Route("/stats", fake.get_stats, methods=["GET"]),
+    ])
+    app.state.fake = fake
+    return app
+
+class BackgroundServer:
+    """Run the fake provider on a local port in a background thread."""
+
+    def __init__(self, config: FakeLLMConfig, host: str = "127.0.0.1", port: int = 0):
+        self.app = create_app(config)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        sock = self.server.servers[0].sockets[0]
+        host, port = sock.getsockname()[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "BackgroundServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+@click.command()
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=9100, type=int)
+@click.option("--latency-ms", default=200.0, help="Time to first token")
+@click.option("--tokens-per-second", default=100.0, help="Generation speed, 0 for instant")
+@click.option("--completion-tokens", default=60, type=int, help="Reply length in tokens")
+@click.option("--error-rate", default=0.0, help="Fraction of requests that fail")
+@click.option("--error-status", default=503, type=int, help="Status code of injected failures")
+@click.option("--seed", default=0, type=int)
+def main(host, port, latency_ms, tokens_per_second, completion_tokens, error_rate, error_status, seed):
+    """Serve the fake OpenAI-compatible API."""
+    config = FakeLLMConfig(latency_ms, tokens_per_second, completion_tokens, error_rate, error_status, seed)
+    uvicorn.run(create_app(config), host=host, port=port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
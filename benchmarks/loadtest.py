@@ -0,0 +1,326 @@
+"""
+End-to-end load test for the tutoring API.
+
+Drives realistic learner traffic (login, list topics, get-or-create session,
+chat turns, history polling) against the app and reports RPS, p50/p95/p99
+latency and DB queries per endpoint. By default the app runs in-process on a
+local SQLite database with the deterministic fake LLM from
+benchmarks/fake_llm.py, so a run needs one Linux box and no network.
+
+    python -m benchmarks.loadtest --users 50 --turns 5 --json run.json
+    python -m benchmarks.loadtest --users 50 --turns 5 --compare run.json
+
+Pass --database-url to run against Postgres instead, and --base-url to drive
+an already running deployment (queries are then not counted). SQLite allows
+a single writer, so concurrent chat turns that keep a transaction open
+across the LLM call show up as "database is locked" errors there; use
+Postgres for representative numbers.
+"""
+import sys
+import os
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Settings requires these; the in-process run replaces the database anyway
+for _name, _value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "loadtest",
+    "SECRET_KEY": "loadtest-secret",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from typing import Any, Dict, List, Optional
+from contextvars import ContextVar
+import asyncio
+import json
+import random
+import tempfile
+import time
+import uuid
+import click
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from benchmarks.fake_llm import BackgroundServer, FakeLLMConfig
+
+PASSWORD = "loadtest-password"
+
+# Mutable per-request counter, shared with the threads the app runs sync code in
+_query_counter: ContextVar[Optional[List[int]]] = ContextVar("loadtest_query_counter", default=None)
+
+class Sample:
+    """One measured request."""
+
+    def __init__(self, label: str, seconds: float, status: int, queries: Optional[int]):
+        self.label = label
+        self.seconds = seconds
+        self.status = status
+        self.queries = queries
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(samples: List[Sample], wall_seconds: float) -> Dict[str, Dict[str, Any]]:
+    """Per-endpoint request rate, latency percentiles and query counts."""
+    by_label: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_label.setdefault(sample.label, []).append(sample)
+    report = {}
+    for label, group in sorted(by_label.items()):
+        latencies = [s.seconds * 1000 for s in group]
+        queries = [s.queries for s in group if s.queries is not None]
+        report[label] = {
+            "requests": len(group),
+            "errors": sum(1 for s in group if s.status >= 400),
+            "rps": len(group) / wall_seconds,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "avg_queries": sum(queries) / len(queries) if queries else None,
+        }
+    return report
+
+def print_report(report: Dict[str, Dict[str, Any]], wall_seconds: float) -> None:
+    total = sum(r["requests"] for r in report.values())
+    click.echo(f"\n📊 {total} requests in {wall_seconds:.1f}s ({total / wall_seconds:.1f} req/s)")
+    click.echo(f"{'endpoint':<34}{'reqs':>7}{'errs':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+    for label, r in report.items():
+        queries = f"{r['avg_queries']:.1f}" if r["avg_queries"] is not None else "-"
+        click.echo(
+            f"{label:<34}{r['requests']:>7}{r['errors']:>6}{r['rps']:>8.1f}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{queries:>9}"
+        )
+
+def compare(report: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """List regressions in p95 latency or query count against a baseline run."""
+    regressions = []
+    for label, r in report.items():
+        base = baseline.get(label)
+        if not base:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {base['p95_ms']:.1f}ms -> {r['p95_ms']:.1f}ms")
+        if r["avg_queries"] is not None and base.get("avg_queries") is not None \
+                and r["avg_queries"] > base["avg_queries"] + 0.5:
+            regressions.append(f"{label}: queries {base['avg_queries']:.1f} -> {r['avg_queries']:.1f}")
+        if r["errors"] > base["errors"]:
+            regressions.append(f"{label}: errors {base['errors']} -> {r['errors']}")
+    return regressions
+
+def seed_database(session_factory, users: int, root_topics: int, subtopics: int) -> Dict[str, List[str]]:
+    """Create learners, an agent and a topic tree; returns emails and topic IDs."""
+    from app.core.security import get_password_hash
+    from app.models import Agent, AgentType, Topic, User
+    db = session_factory()
+    try:
+        hashed = get_password_hash(PASSWORD)
+        run_id = uuid.uuid4().hex[:8]
+        emails = [f"learner{i}-{run_id}@loadtest.local" for i in range(users)]
+        db.add_all([
+            User(id=str(uuid.uuid4()), email=email, hashed_password=hashed,
+                 full_name=f"Learner {i}", is_active=True)
+            for i, email in enumerate(emails)
+        ])
+        agent = Agent(
+            id=str(uuid.uuid4()),
+            name="Load Test Tutor",
+            type=AgentType.CHATGPT,
+            ai_service="openai",
+            config={"model": "fake-model", "max_tokens": 256},
+            system_prompt="You are a tutor helping {{user.full_name}} with {{topic.title}}.",
+            welcome_message="Hello {{user.full_name}}, let's learn {{topic.title}}!",
+            is_active=True
+        )
+        db.add(agent)
+        topic_ids = []
+        for r in range(root_topics):
+            root = Topic(id=str(uuid.uuid4()), title=f"Course {r}", content={"level": r},
+                         agent_id=agent.id, difficulty_level=1)
+            db.add(root)
+            for c in range(subtopics):
+                child = Topic(id=str(uuid.uuid4()), title=f"Course {r} lesson {c}",
+                              content={"lesson": c}, agent_id=agent.id, parent_id=root.id)
+                db.add(child)
+                topic_ids.append(child.id)
+            topic_ids.append(root.id)
+        db.commit()
+        return {"emails": emails, "topic_ids": topic_ids}
+    finally:
+        db.close()
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    email: str,
+    topic_ids: List[str],
+    turns: int,
+    polls_per_turn: int,
+    samples: List[Sample],
+    rng: random.Random
+) -> None:
+    """One learner: log in, browse, open a session and chat."""
+    api = "/api/v1"
+
+    async def call(label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        counter = [0]
+        _query_counter.set(counter)
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        samples.append(Sample(label, time.perf_counter() - started, response.status_code, counter[0]))
+        return response
+
+    response = await call("POST /auth/login", "POST", f"{api}/auth/login",
+                          data={"username": email, "password": PASSWORD})
+    if response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    await call("GET /topics", "GET", f"{api}/topics")
+    topic_id = rng.choice(topic_ids)
+    await call("GET /topics/{id}", "GET", f"{api}/topics/{topic_id}")
+    response = await call("GET /topics/{id}/session", "GET", f"{api}/topics/{topic_id}/session",
+                          headers=headers)
+    if response.status_code != 200:
+        return
+    session_id = response.json()["id"]
+
+    for turn in range(turns):
+        await call("POST /chat/sessions/{id}/chat", "POST", f"{api}/chat/sessions/{session_id}/chat",
+                   headers=headers, json={"content": f"Question {turn}: can you explain step {rng.randint(1, 9)}?"})
+        for _ in range(polls_per_turn):
+            await call("GET /chat/sessions/{id}/chat", "GET", f"{api}/chat/sessions/{session_id}/chat",
+                       headers=headers)
+
+async def run_load(
+    client: httpx.AsyncClient,
+    seeded: Dict[str, List[str]],
+    concurrency: int,
+    turns: int,
+    polls_per_turn: int,
+    seed: int
+) -> List[Sample]:
+    samples: List[Sample] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int, email: str):
+        async with semaphore:
+            await virtual_user(client, email, seeded["topic_ids"], turns, polls_per_turn,
+                               samples, random.Random(seed + index))
+
+    await asyncio.gather(*[limited(i, email) for i, email in enumerate(seeded["emails"])])
+    return samples
+
+@click.command()
+@click.option("--users", default=20, help="Number of learners to simulate")
+@click.option("--concurrency", default=20, help="Learners active at the same time")
+@click.option("--turns", default=3, help="Chat turns per learner")
+@click.option("--polls-per-turn", default=2, help="History polls after each turn")
+@click.option("--root-topics", default=5)
+@click.option("--subtopics", default=4, help="Subtopics per root topic")
+@click.option("--llm-latency-ms", default=200.0, help="Fake LLM time to first token")
+@click.option("--llm-tokens-per-second", default=200.0, help="Fake LLM generation speed")
+@click.option("--llm-error-rate", default=0.0, help="Fraction of fake LLM calls that fail")
+@click.option("--database-url", default=None, help="Database to use (default: temporary SQLite)")
+@click.option("--base-url", default=None, help="Drive a running server instead of the in-process app")
+@click.option("--seed", default=0, type=int)
+@click.option("--json", "json_path", default=None, type=click.Path(), help="Write the report as JSON")
+@click.option("--compare", "baseline_path", default=None, type=click.Path(exists=True),
+              help="Fail if p95, queries or errors regressed against this JSON report")
+@click.option("--tolerance", default=0.2, help="Allowed p95 regression for --compare")
+def main(users, concurrency, turns, polls_per_turn, root_topics, subtopics, llm_latency_ms,
+         llm_tokens_per_second, llm_error_rate, database_url, base_url, seed, json_path,
+         baseline_path, tolerance):
+    """Run the load test and print per-endpoint statistics."""
+    from app.core.config import settings
+    from app.db.base import Base
+
+    database_url = database_url or f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    connect_args = {"check_same_thread": False, "timeout": 5} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    if database_url.startswith("sqlite"):
+        @event.listens_for(engine, "connect")
+        def enable_wal(dbapi_connection, connection_record):
+            # Let readers and the single writer proceed concurrently
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+    seeded = seed_database(session_factory, users, root_topics, subtopics)
+    llm_config = FakeLLMConfig(
+        latency_ms=llm_latency_ms,
+        tokens_per_second=llm_tokens_per_second,
+        error_rate=llm_error_rate,
+        seed=seed
+    )
+
+    with BackgroundServer(llm_config) as fake_llm:
+        if base_url:
+            transport = None
+        else:
+            from app.api import deps
+            from app.main import app
+            from app.services.ai.providers import clear_providers
+
+            settings.OPENAI_BASE_URL = fake_llm.base_url
+            settings.OPENAI_API_KEY = "fake-key"
+            clear_providers()
+
+            def get_loadtest_db():
+                db = session_factory()
+                try:
+                    yield db
+                finally:
+                    db.close()
+
+            app.dependency_overrides[deps.get_db] = get_loadtest_db
+            app.dependency_overrides[deps.get_read_db] = get_loadtest_db
+            app.dependency_overrides[deps.get_auth_db] = get_loadtest_db
+            transport = httpx.ASGITransport(app=app)
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport, base_url=base_url or "http://loadtest",
+                                         timeout=120) as client:
+                return await run_load(client, seeded, concurrency, turns, polls_per_turn, seed)
+
+        started = time.perf_counter()
+        samples = asyncio.run(run())
+        wall_seconds = time.perf_counter() - started
+        llm_stats = fake_llm.app.state.fake.stats
+
+    if base_url:
+        for sample in samples:
+            sample.queries = None
+    report = summarize(samples, wall_seconds)
+    print_report(report, wall_seconds)
+    click.echo(f"Fake LLM: {llm_stats}")
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"wall_seconds": wall_seconds, "endpoints": report}, f, indent=2)
+        click.echo(f"✅ Report written to {json_path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["endpoints"]
+        regressions = compare(report, baseline, tolerance)
+        if regressions:
+            click.echo("❌ Regressions against baseline:")
+            for line in regressions:
+                click.echo(f"  {line}")
+            sys.exit(1)
+        click.echo("✅ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark for topic subtree operations on a generated curriculum tree.
+
+Builds a tree of --nodes topics (--branching children per topic) and compares
+collecting a subtree one query per node, as delete_topic used to, with the
+recursive CTE in app/services/topic_tree.py, then times deleting the whole
+tree with its sessions and messages.
+
+    python -m benchmarks.topic_tree --nodes 10000 --branching 8
+
+Pass --database-url to run against Postgres instead of a temporary SQLite file.
+"""
+import sys
+import os
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Settings requires these; the benchmark uses its own database
+for _name, _value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "benchmark",
+    "SECRET_KEY": "benchmark-secret",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from typing import Callable, List, Set, Tuple
+import tempfile
+import time
+import uuid
+import click
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+def build_tree(db: Session, nodes: int, branching: int, sessions_per_leaf: int) -> str:
+    """Insert a breadth-first tree of nodes topics and return the root id."""
+    from app.models import Agent, AgentType, Topic, User, Session as DBSession, ChatMessage, MessageRole
+
+    agent = Agent(
+        id=str(uuid.uuid4()),
+        name="Benchmark Agent",
+        type=AgentType.CHATGPT,
+        config={},
+        system_prompt="Benchmark prompt",
+        welcome_message="Welcome"
+    )
+    user = User(id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex}@example.com", hashed_password="x")
+    db.add_all([agent, user])
+
+    ids = [str(uuid.uuid4()) for _ in range(nodes)]
+    topics = [
+        Topic(
+            id=topic_id,
+            title=f"Topic {i}",
+            content={},
+            agent_id=agent.id,
+            parent_id=ids[(i - 1) // branching] if i else None
+        )
+        for i, topic_id in enumerate(ids)
+    ]
+    db.add_all(topics)
+
+    # Leaves are the topics without children
+    for topic_id in ids[(nodes - 1) // branching + 1:]:
+        for _ in range(sessions_per_leaf):
+            session_id = str(uuid.uuid4())
+            db.add(DBSession(id=session_id, user_id=user.id, topic_id=topic_id, agent_id=agent.id))
+            db.add(ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role=MessageRole.USER, content="Hi"))
+    db.commit()
+    return ids[0]
+
+def legacy_subtree_ids(db: Session, topic_id: str, ids: Set[str] = None) -> Set[str]:
+    """The former per-node recursion from delete_topic."""
+    from app.models import Topic
+
+    if ids is None:
+        ids = set()
+    ids.add(topic_id)
+    for subtopic in db.query(Topic).filter(Topic.parent_id == topic_id).all():
+        legacy_subtree_ids(db, subtopic.id, ids)
+    return ids
+
+def measure(counter: List[int], func: Callable) -> Tuple[float, int, object]:
+    """Run func and return (milliseconds, statements, result)."""
+    counter[0] = 0
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, counter[0], result
+
+@click.command()
+@click.option("--nodes", default=10000, help="Topics in the generated tree")
+@click.option("--branching", default=8, help="Children per topic")
+@click.option("--sessions-per-leaf", default=1, help="Sessions (with one message each) per leaf topic")
+@click.option("--database-url", default=None, help="Database to use (default: temporary SQLite)")
+def main(nodes, branching, sessions_per_leaf, database_url):
+    """Compare per-node and recursive CTE subtree operations."""
+    from app.db.base import Base
+    from app.services import topic_tree
+
+    database_url = database_url or f"sqlite:///{tempfile.mkdtemp()}/topic_tree.db"
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    counter = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    click.echo(f"Building a tree of {nodes} topics (branching {branching})...")
+    root_id = build_tree(db, nodes, branching, sessions_per_leaf)
+
+    rows = []
+    ms, queries, ids = measure(counter, lambda: legacy_subtree_ids(db, root_id))
+    rows.append(("collect ids, per node", ms, queries, len(ids)))
+    db.expire_all()
+    ms, queries, ids = measure(counter, lambda: topic_tree.get_subtree_ids(db, root_id))
+    rows.append(("collect ids, recursive CTE", ms, queries, len(ids)))
+    ms, queries, count = measure(counter, lambda: topic_tree.count_subtree(db, root_id))
+    rows.append(("count subtree", ms, queries, count))
+    ms, queries, subtree = measure(counter, lambda: topic_tree.get_subtree(db, root_id, max_depth=2))
+    rows.append(("fetch subtree, depth 2", ms, queries, len(subtree)))
+
+    def delete() -> int:
+        result = topic_tree.delete_subtree(db, root_id)
+        db.commit()
+        return sum(result.values())
+
+    ms, queries, deleted = measure(counter, delete)
+    rows.append(("delete subtree", ms, queries, deleted))
+
+    click.echo(f"\n{'operation':<30}{'ms':>10}{'queries':>10}{'rows':>8}")
+    for label, ms, queries, count in rows:
+        click.echo(f"{label:<30}{ms:>10.1f}{queries:>10}{count:>8}")
+    db.close()
+
+if __name__ == "__main__":
+    main()